@@ -1,9 +1,16 @@
 import pickle
 import gzip
-import re
+import sys
+from pathlib import Path
 from typing import Any, Dict, List
 from collections import defaultdict
 
+# 文本清洗与后端索引、目录脚本共用 web/backend/text_normalize.py
+_BACKEND_DIR = Path(__file__).resolve().parents[2] / "web" / "backend"
+if str(_BACKEND_DIR) not in sys.path:
+    sys.path.append(str(_BACKEND_DIR))
+from text_normalize import clean_text_for_search  # noqa: E402
+
 class CacheService:
     """
     负责存储、索引和缓存所有从 structured_data 解析后的数据。
@@ -32,16 +39,7 @@ class CacheService:
 
     def _clean_text_for_search(self, text: str) -> str:
         """清洗文本，移除标点符号、特殊字符，并转换为小写。"""
-        if not text: return ""
-        # A more aggressive cleaning for user-generated content
-        text = re.sub(r'<[^>]+>', '', text) # Remove HTML tags
-        text = re.sub(r'#+\s?', '', text) # Remove markdown headers
-        text = re.sub(r'(\*\*|__)(.*?)(\*\*|__)', r'\2', text) # Bold
-        text = re.sub(r'(\*|_)(.*?)(\*|_)', r'\2', text) # Italic
-        text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text) # Links
-        text = re.sub(r'[^\u4e00-\u9fa5\u3040-\u30ff\uac00-\ud7a3a-zA-Z0-9\s]', '', text)
-        text = re.sub(r'\s+', '', text)
-        return text.lower()
+        return clean_text_for_search(text)
 
     def _generate_ngrams(self, text: str, n: int = 2):
         """为给定的文本生成二元词条集合。"""
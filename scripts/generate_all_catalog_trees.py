@@ -19,6 +19,12 @@ from collections import defaultdict
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
+BACKEND_DIR = project_root / "web" / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# 与后端索引共用的文本清洗（预编译正则，结果与原实现一致）
+from text_normalize import clean_text_for_search  # noqa: E402
 
 # 游戏配置
 GAME_CONFIGS = {
@@ -62,28 +68,6 @@ def delta_encode(sorted_ids):
     return deltas
 
 
-def clean_text_for_search(text: str) -> str:
-    """清洗文本，移除标点符号、特殊字符，并转换为小写"""
-    if not text:
-        return ""
-
-    # 移除HTML标签
-    text = re.sub(r'<[^>]+>', '', text)
-    # 移除markdown标题
-    text = re.sub(r'#+\s?', '', text)
-    # 移除粗体标记
-    text = re.sub(r'(\*\*|__)(.*?)(\*\*|__)', r'\2', text)
-    # 移除斜体标记
-    text = re.sub(r'(\*|_)(.*?)(\*|_)', r'\2', text)
-    # 移除链接，保留文本
-    text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text)
-    # 只保留中文、日文、韩文、英文、数字和空格
-    text = re.sub(r'[^\u4e00-\u9fa5\u3040-\u30ff\uac00-\ud7a3a-zA-Z0-9\s]', '', text)
-    # 移除所有空格
-    text = re.sub(r'\s+', '', text)
-    return text.lower()
-
-
 def generate_ngrams(text: str, n: int = 2) -> Set[str]:
     """为给定的文本生成二元词条集合"""
     if len(text) < n:
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""搜索延迟基准：生成合成 CJK 语料并建索引，回放查询日志，输出可对比的 JSON 报告。
+
+示例：
+    uv run python web/backend/bench_search.py --docs 20000 --output bench.json
+    uv run python web/backend/bench_search.py --docs 20000 --reuse --baseline bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import config
+
+BENCH_DOMAIN = "gi"
+
+_COMMON_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞"
+)
+_NAME_CHARS = "派蒙钟离胡桃雷电将军温迪可莉甘雨刻晴北斗凝光魈达达利亚神里绫华宵宫优菈申鹤夜兰纳西妲艾尔海森那维莱特芙宁娜仆人希诺宁"
+_CATEGORIES = {
+    "角色": ["角色故事", "语音", "命之座"],
+    "武器": ["单手剑", "双手剑", "长柄武器", "法器", "弓"],
+    "任务": ["魔神任务", "传说任务", "世界任务", "邀约事件"],
+    "书籍": ["书籍", "信件"],
+    "圣遗物": [],
+    "地区": ["蒙德", "璃月", "稻妻", "须弥", "枫丹", "纳塔"],
+}
+_DECORATIONS = ["", " **{w}** ", " [{w}](https://example.com) ", " `{w}`", " <span>{w}</span>"]
+
+
+def _random_word(rng: random.Random, alphabet: str, low: int, high: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+
+def generate_corpus(root: Path, docs: int, seed: int) -> dict:
+    """在 root/{domain}/ 下生成 docs 篇 Markdown 与对应的 metadata/index.json。"""
+    rng = random.Random(seed)
+    docs_dir = root / BENCH_DOMAIN / "docs"
+    metadata_dir = root / BENCH_DOMAIN / "metadata"
+    metadata_dir.mkdir(parents=True, exist_ok=True)
+
+    # 名称池：少量高频名称 + 大量长尾名称，模拟真实目录的重名与前缀分布
+    head_names = [_random_word(rng, _NAME_CHARS, 2, 4) for _ in range(50)]
+    index: list[dict] = []
+    total_bytes = 0
+    for i in range(docs):
+        category = rng.choice(list(_CATEGORIES))
+        subcategories = _CATEGORIES[category]
+        parts = [category]
+        if subcategories:
+            parts.append(rng.choice(subcategories))
+        if rng.random() < 0.3:
+            name = rng.choice(head_names) + _random_word(rng, _COMMON_CHARS, 0, 3)
+        else:
+            name = _random_word(rng, _NAME_CHARS + _COMMON_CHARS, 2, 8)
+        relative = "/".join(parts + [f"{name}-{i}"])
+
+        lines = [f"# {name}", ""]
+        for _ in range(rng.randint(5, 120)):
+            line = _random_word(rng, _COMMON_CHARS, 8, 60)
+            if rng.random() < 0.2:
+                line += rng.choice(_DECORATIONS).format(w=rng.choice(head_names))
+            if rng.random() < 0.05:
+                line = f"## {line[:12]}"
+            lines.append(line)
+        content = "\n".join(lines)
+        md_path = docs_dir / f"{relative}.md"
+        md_path.parent.mkdir(parents=True, exist_ok=True)
+        md_path.write_text(content, encoding="utf-8")
+        total_bytes += len(content.encode("utf-8"))
+        index.append({
+            "id": 100000 + i,
+            "name": name,
+            "type": category,
+            "category": category,
+            "path": f"/v2/{BENCH_DOMAIN}/category/{relative}",
+        })
+
+    (metadata_dir / "index.json").write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    return {"docs": docs, "seed": seed, "bytes": total_bytes, "headNames": head_names}
+
+
+def generate_queries(corpus: dict, count: int, seed: int) -> list[dict]:
+    """生成混合查询日志：目录/文档两种模式，长短 CJK 查询与路径过滤。"""
+    rng = random.Random(seed + 1)
+    head_names = corpus["headNames"]
+    queries: list[dict] = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.35:
+            query = rng.choice(head_names)
+        elif kind < 0.55:
+            query = rng.choice(head_names)[:2]
+        elif kind < 0.75:
+            query = _random_word(rng, _COMMON_CHARS, 2, 3)
+        elif kind < 0.9:
+            query = _random_word(rng, _COMMON_CHARS, 6, 12)
+        else:
+            query = f"{rng.choice(head_names)} {_random_word(rng, _COMMON_CHARS, 2, 4)}"
+        if rng.random() < 0.5:
+            queries.append({"mode": "catalog", "query": query, "maxResults": rng.choice([20, 50, 200])})
+        else:
+            entry = {"mode": "docs", "query": query, "maxResults": rng.choice([10, 20, 50])}
+            if rng.random() < 0.3:
+                entry["path"] = rng.choice(list(_CATEGORIES))
+            queries.append(entry)
+    return queries
+
+
+def load_queries(path: Path) -> list[dict]:
+    """读取查询日志：JSON 数组或 NDJSON，每项含 mode/query/path/maxResults。"""
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _run_query(entry: dict) -> None:
+    from search_service import search_catalog, search_docs
+
+    if entry.get("mode") == "docs":
+        search_docs(
+            BENCH_DOMAIN,
+            entry["query"],
+            doc_path=entry.get("path"),
+            max_results=int(entry.get("maxResults", 50)),
+            generate_summary=bool(entry.get("generateSummary", False)),
+        )
+    else:
+        search_catalog(BENCH_DOMAIN, entry["query"], max_results=int(entry.get("maxResults", 50)))
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[rank]
+
+
+def _summarize(latencies: list[float]) -> dict:
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "meanMs": round(statistics.fmean(values) * 1000, 3),
+        "p50Ms": round(_percentile(values, 50) * 1000, 3),
+        "p90Ms": round(_percentile(values, 90) * 1000, 3),
+        "p99Ms": round(_percentile(values, 99) * 1000, 3),
+        "maxMs": round(values[-1] * 1000, 3),
+    }
+
+
+def replay(queries: list[dict], concurrency: int, rounds: int) -> dict:
+    """回放查询日志 rounds 轮；concurrency > 1 时由线程池并发执行。"""
+    latencies: dict[str, list[float]] = {"catalog": [], "docs": []}
+    errors = 0
+    lock = threading.Lock()
+
+    def _timed(entry: dict) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            _run_query(entry)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies["docs" if entry.get("mode") == "docs" else "catalog"].append(elapsed)
+
+    workload = [entry for _ in range(rounds) for entry in queries]
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for entry in workload:
+            _timed(entry)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(_timed, workload))
+    wall = time.perf_counter() - started
+
+    all_latencies = latencies["catalog"] + latencies["docs"]
+    return {
+        "concurrency": concurrency,
+        "rounds": rounds,
+        "wallSeconds": round(wall, 3),
+        "qps": round(len(all_latencies) / wall, 2) if wall > 0 else 0.0,
+        "errors": errors,
+        "all": _summarize(all_latencies),
+        "catalog": _summarize(latencies["catalog"]),
+        "docs": _summarize(latencies["docs"]),
+    }
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _memory_stats() -> dict:
+    stats: dict[str, Any] = {}
+    try:
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 计，macOS 以字节计
+        stats["maxRssMB"] = round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        rss_pages = int(statm.read_text().split()[1])
+        stats["rssMB"] = round(rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    return stats
+
+
+def _print_comparison(report: dict, baseline: dict) -> None:
+    """打印与基线报告的 p50/p99/QPS 差异。"""
+    base_runs = {run["concurrency"]: run for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        base = base_runs.get(run["concurrency"])
+        if not base:
+            continue
+        for mode in ("catalog", "docs"):
+            cur, old = run.get(mode, {}), base.get(mode, {})
+            if not cur.get("count") or not old.get("count"):
+                continue
+            print(
+                f"并发 {run['concurrency']:>2} {mode:<7} "
+                f"p50 {old['p50Ms']:.2f} -> {cur['p50Ms']:.2f}ms, "
+                f"p99 {old['p99Ms']:.2f} -> {cur['p99Ms']:.2f}ms"
+            )
+        print(f"并发 {run['concurrency']:>2} QPS {base['qps']:.1f} -> {run['qps']:.1f}")
+    old_size = baseline.get("index", {}).get("sizeBytes")
+    if old_size:
+        print(f"索引大小 {old_size / 1048576:.1f}MB -> {report['index']['sizeBytes'] / 1048576:.1f}MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="搜索延迟基准（合成 CJK 语料）")
+    parser.add_argument("--docs", type=int, default=10000, help="合成文档数（默认 10000）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--work-dir", default=None, help="语料与索引目录（默认系统临时目录）")
+    parser.add_argument("--reuse", action="store_true", help="复用 work-dir 中已有的语料与索引")
+    parser.add_argument("--workers", type=int, default=None, help="建索引的预处理进程数")
+    parser.add_argument("--queries", default=None, help="回放的查询日志（JSON 数组或 NDJSON），默认自动生成")
+    parser.add_argument("--query-count", type=int, default=500, help="自动生成的查询条数")
+    parser.add_argument("--dump-queries", default=None, help="把实际使用的查询日志写到该文件")
+    parser.add_argument("--rounds", type=int, default=1, help="每种并发度回放的轮数")
+    parser.add_argument("--concurrency", default="1,4,16", help="并发度列表，逗号分隔")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径（默认打印到标准输出）")
+    parser.add_argument("--baseline", default=None, help="与之对比的历史 JSON 报告")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir or Path(tempfile.gettempdir()) / f"genshinstory-bench-{args.docs}-{args.seed}")
+    # 所有路径都指向基准目录，不触碰真实文档与索引
+    config.DOCS_ROOT = work_dir / "domains"
+    config.INDEX_ROOT = work_dir / "tantivy_index"
+
+    from indexer import build_index_for_domain, read_index_manifest, resolve_active_index_dir
+    from search_service import invalidate_index
+
+    corpus_meta_path = work_dir / "corpus.json"
+    if args.reuse and corpus_meta_path.exists():
+        corpus = json.loads(corpus_meta_path.read_text(encoding="utf-8"))
+        print(f"[bench] 复用语料: {work_dir}（{corpus['docs']} 篇）", file=sys.stderr)
+    else:
+        print(f"[bench] 生成 {args.docs} 篇合成文档: {work_dir}", file=sys.stderr)
+        started = time.perf_counter()
+        corpus = generate_corpus(config.DOCS_ROOT, args.docs, args.seed)
+        corpus["generateSeconds"] = round(time.perf_counter() - started, 3)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        corpus_meta_path.write_text(json.dumps(corpus, ensure_ascii=False), encoding="utf-8")
+
+    build_seconds = None
+    if not (args.reuse and resolve_active_index_dir(BENCH_DOMAIN) is not None):
+        print("[bench] 构建索引", file=sys.stderr)
+        started = time.perf_counter()
+        build_index_for_domain(BENCH_DOMAIN, full=True, workers=args.workers)
+        build_seconds = round(time.perf_counter() - started, 3)
+    invalidate_index(BENCH_DOMAIN)
+    index_dir = resolve_active_index_dir(BENCH_DOMAIN)
+    if index_dir is None:
+        raise SystemExit("索引构建失败")
+
+    if args.queries:
+        queries = load_queries(Path(args.queries))
+    else:
+        queries = generate_queries(corpus, args.query_count, args.seed)
+    if args.dump_queries:
+        Path(args.dump_queries).write_text(
+            "\n".join(json.dumps(q, ensure_ascii=False) for q in queries) + "\n",
+            encoding="utf-8",
+        )
+
+    # 预热：打开索引、内容存储并填充操作系统页缓存
+    replay(queries[: min(len(queries), 50)], concurrency=1, rounds=1)
+
+    runs = []
+    for level in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+        print(f"[bench] 回放 {len(queries)} 条查询 x {args.rounds} 轮，并发 {level}", file=sys.stderr)
+        runs.append(replay(queries, concurrency=level, rounds=args.rounds))
+
+    report = {
+        "meta": {
+            "createdAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "workDir": str(work_dir),
+        },
+        "corpus": {key: value for key, value in corpus.items() if key != "headNames"},
+        "index": {
+            "generation": read_index_manifest(BENCH_DOMAIN).get("generation"),
+            "docCount": read_index_manifest(BENCH_DOMAIN).get("docCount"),
+            "buildSeconds": build_seconds,
+            "sizeBytes": _dir_size(index_dir),
+        },
+        "queries": {
+            "count": len(queries),
+            "catalog": sum(1 for q in queries if q.get("mode") != "docs"),
+            "docs": sum(1 for q in queries if q.get("mode") == "docs"),
+        },
+        "runs": runs,
+        "memory": _memory_stats(),
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"[bench] 报告已写入 {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        _print_comparison(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
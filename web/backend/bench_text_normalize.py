@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""文本规范化基准与一致性校验：对比 text_normalize 与原先各处的正则级联实现。
+
+在真实文档（默认 DOCS_ROOT 下全部 Markdown）、构造的边界用例与随机生成的标记串上
+逐一比对输出，任何不一致都会打印并以非零状态退出；随后报告各函数的耗时与加速比。
+
+示例：
+    uv run python web/backend/bench_text_normalize.py
+    uv run python web/backend/bench_text_normalize.py --limit 2000 --repeat 5 --fuzz 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import config
+from text_normalize import clean_markdown, clean_text_for_search, normalize_search_text, strip_markdown
+
+
+# --- 原实现（对照用，逐字保留） ---
+
+def _legacy_strip_markdown(text: str) -> str:
+    text = re.sub(r"<[^>]+>", "", text)
+    text = re.sub(r"#+\s?", "", text)
+    text = re.sub(r"(\*\*|__)(.*?)(\*\*|__)", r"\2", text)
+    text = re.sub(r"(\*|_)(.*?)(\*|_)", r"\2", text)
+    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)
+    text = re.sub(r"!\[.*?\]\(.*?\)", "", text)
+    text = re.sub(r"`([^`]+)`", r"\1", text)
+    return text
+
+
+def _legacy_clean_markdown(text: str) -> str:
+    if not text:
+        return ""
+    text = re.sub(r"<[^>]+>", "", text)
+    text = re.sub(r"#+\s?", "", text)
+    text = re.sub(r"(\*\*|__)(.*?)(\*\*|__)", r"\2", text)
+    text = re.sub(r"(\*|_)(.*?)(\*|_)", r"\2", text)
+    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)
+    text = re.sub(r"!\[.*?\]\(.*?\)", "", text)
+    text = re.sub(r"```[\s\S]*?```", "", text)
+    text = re.sub(r"`([^`]+)`", r"\1", text)
+    text = re.sub(r"^[-*+]\s+", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^\d+\.\s+", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^>\s+", "", text, flags=re.MULTILINE)
+    text = re.sub(r"---+", "", text)
+    text = re.sub(r"\|", " ", text)
+    return text.strip()
+
+
+def _legacy_clean_text_for_search(text: str) -> str:
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'#+\s?', '', text)
+    text = re.sub(r'(\*\*|__)(.*?)(\*\*|__)', r'\2', text)
+    text = re.sub(r'(\*|_)(.*?)(\*|_)', r'\2', text)
+    text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text)
+    text = re.sub(r'[^\u4e00-\u9fa5\u3040-\u30ff\uac00-\ud7a3a-zA-Z0-9\s]', '', text)
+    text = re.sub(r'\s+', '', text)
+    return text.lower()
+
+
+def _legacy_prepare_text_for_index(text: str) -> str:
+    normalized = str(text or "").strip()
+    if not normalized:
+        return ""
+    normalized = normalized.lower()
+    normalized = re.sub(
+        r"[\uff01-\uff5e]",
+        lambda ch: chr(ord(ch.group(0)) - 0xFEE0),
+        normalized,
+    )
+    normalized = normalized.replace("\u3000", " ")
+    return normalized
+
+
+# (名称, 原实现, 新实现)
+PAIRS: list[tuple[str, Callable[[str], str], Callable[[str], str]]] = [
+    ("strip_markdown", _legacy_strip_markdown, strip_markdown),
+    ("clean_markdown", _legacy_clean_markdown, clean_markdown),
+    ("clean_text_for_search", _legacy_clean_text_for_search, clean_text_for_search),
+    ("normalize_search_text", _legacy_prepare_text_for_index, normalize_search_text),
+]
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "# 标题\n正文 **粗体** 与 *斜体* 和 __下划线__ _单下划线_",
+    "[![徽章](badge.svg)](https://example.com) 嵌套图片链接",
+    "![图](a.png) [链接](b) [未闭合](c",
+    "#\n[跨行](链接)",
+    "[a#\n](b)",
+    "```python\nprint('代码')\n```\n行内 `code` 与 ``双反引号``",
+    "- 列表\n* 星号\n+ 加号\n1. 有序\n> 引用\n- > 嵌套\n> - 反向\n1.\n- 换行",
+    "| 表头 | 值 |\n|---|---|\n| 甲 | 乙 |",
+    "<div class=\"x\">HTML <b>粗</b></div><br/>",
+    "ＡＢＣａｂｃ１２３！？　全角空格　Ｚ",
+    "  首尾空白　",
+    "*a_b*c_ **x__ __y** ***z***",
+    "İstanbul ß ΣΑΣ",
+    # 粗体/斜体步骤删掉 ] 与 ( 之间的标记后才构成链接
+    "[a]*(b)*",
+    "[名字]_(链接)_",
+    "[甲]**(乙)** [丙]__(丁)__",
+]
+
+_FUZZ_ALPHABET = list("<>#*_[]()!`-+.|\n\n  　ＡＢａ１AbZ9中文字あア한") + ["**", "__", "```", "](", "]*(", "]_(", "![", "---", "1. ", "- ", "> "]
+
+
+def _load_docs(docs_root: Path, limit: int) -> list[str]:
+    texts: list[str] = []
+    for md_file in sorted(docs_root.rglob("*.md")):
+        try:
+            texts.append(md_file.read_text(encoding="utf-8"))
+        except (OSError, UnicodeDecodeError):
+            continue
+        if limit and len(texts) >= limit:
+            break
+    return texts
+
+
+def _fuzz_cases(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_FUZZ_ALPHABET) for _ in range(rng.randint(1, 40))) for _ in range(count)]
+
+
+def check_parity(texts: list[str], max_report: int = 5) -> dict[str, int]:
+    """逐函数比对输出，返回各函数的不一致数。"""
+    mismatches: dict[str, int] = {}
+    for name, legacy, current in PAIRS:
+        count = 0
+        for text in texts:
+            expected, actual = legacy(text), current(text)
+            if expected != actual:
+                count += 1
+                if count <= max_report:
+                    print(f"[不一致] {name}: 输入={text[:80]!r}\n  原实现={expected[:80]!r}\n  新实现={actual[:80]!r}")
+        mismatches[name] = count
+    return mismatches
+
+
+def _time(func: Callable[[str], str], texts: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="文本规范化基准与一致性校验")
+    parser.add_argument("--docs-root", default=str(config.DOCS_ROOT), help="文档根目录（递归读取 *.md）")
+    parser.add_argument("--limit", type=int, default=0, help="最多读取的文档数（0 表示不限）")
+    parser.add_argument("--repeat", type=int, default=3, help="计时轮数（取最快一轮）")
+    parser.add_argument("--fuzz", type=int, default=20000, help="随机标记串用例数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径（默认打印到标准输出）")
+    args = parser.parse_args()
+
+    docs = _load_docs(Path(args.docs_root), args.limit)
+    cases = EDGE_CASES + _fuzz_cases(args.fuzz, args.seed)
+    mismatches = check_parity(docs + cases)
+
+    total_chars = sum(len(text) for text in docs)
+    timings = {}
+    for name, legacy, current in PAIRS:
+        before = _time(legacy, docs, args.repeat)
+        after = _time(current, docs, args.repeat)
+        timings[name] = {
+            "legacySeconds": round(before, 4),
+            "currentSeconds": round(after, 4),
+            "speedup": round(before / after, 2) if after > 0 else None,
+            "currentMBps": round(total_chars / after / 1e6, 1) if after > 0 else None,
+        }
+
+    report = {
+        "docs": len(docs),
+        "chars": total_chars,
+        "cases": len(cases),
+        "mismatches": mismatches,
+        "timings": timings,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+    if any(mismatches.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""世界树记忆召回基准：在临时 SQLite 库中批量生成合成记忆，测量不同规模下的召回延迟。
+
+每个规模单独建库（不触碰 world_tree.db），按 --backends 逐个测量召回后端：启动耗时（memory 为
+加载内存索引；fts5 首次打开含全文表填充，之后无需预热）、召回 p50/p90/p99、索引规模与库文件大小；
+规模不超过 --legacy-max 时同时回放两种旧实现作为对照：字符串 id 集合倒排表（setIndexRecall）
+与其上每次查询 list_records 全表读取的最初实现（legacyRecall）。当前实现按 BM25 排序，
+与旧实现的 idf 累加排序不同，因此只对比延迟，不校验结果一致。
+
+示例：
+    uv run python web/backend/bench_world_tree.py --sizes 10000,100000
+    uv run python web/backend/bench_world_tree.py --sizes 10000,100000,1000000 --output bench-wt.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+import recall_fts
+from world_tree_service import WorldTreeMemoryService, _safe_text
+
+_COMMON_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但"
+)
+_NAME_CHARS = "派蒙钟离胡桃雷电将军温迪可莉甘雨刻晴北斗凝光魈达达利亚神里绫华宵宫优菈申鹤夜兰纳西妲艾尔海森那维莱特芙宁娜仆人希诺宁"
+_RELATIONS = ["的朋友", "来自", "守护", "曾经拜访", "与", "委托", "调查", "隶属于"]
+
+
+def _random_word(rng: random.Random, alphabet: str, low: int, high: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+
+def populate(service: WorldTreeMemoryService, db_path: Path, size: int, seed: int) -> List[str]:
+    """直接批量写入 size 条合成记忆（绕过逐条 upsert），返回名称池供生成查询。"""
+    rng = random.Random(seed)
+    names = [_random_word(rng, _NAME_CHARS, 2, 4) for _ in range(max(50, size // 200))]
+    tag_names = sorted({name.lower() for name in names})
+    now = "2026-01-01T00:00:00Z"
+    conn = sqlite3.connect(str(db_path))
+    try:
+        conn.executemany("INSERT OR IGNORE INTO world_tree_tag(name) VALUES (?)", [(name,) for name in tag_names])
+        tag_ids = {str(name): int(tag_id) for tag_id, name in conn.execute("SELECT id, name FROM world_tree_tag")}
+        batch_memory: list[tuple] = []
+        batch_tags: list[tuple] = []
+        for i in range(size):
+            subject, target = rng.choice(names), rng.choice(names)
+            judgment = f"{subject}{rng.choice(_RELATIONS)}{target}，{_random_word(rng, _COMMON_CHARS, 4, 12)}"
+            memory_id = f"m{i:07d}"
+            updated_at = f"2026-01-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00Z"
+            batch_memory.append((memory_id, judgment, "", now, updated_at, json.dumps({"seq": i})))
+            for name in {subject.lower(), target.lower()}:
+                batch_tags.append((memory_id, tag_ids[name]))
+            if len(batch_memory) >= 50000:
+                _flush(conn, batch_memory, batch_tags)
+        _flush(conn, batch_memory, batch_tags)
+        conn.commit()
+    finally:
+        conn.close()
+    return names
+
+
+def _flush(conn: sqlite3.Connection, memory_rows: list[tuple], tag_rows: list[tuple]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO world_tree_memory(id, judgment, memory_type, reasoning, created_at, updated_at, metadata_json)
+        VALUES (?, ?, 'world_tree', ?, ?, ?, ?)
+        """,
+        memory_rows,
+    )
+    conn.executemany("INSERT OR IGNORE INTO world_tree_memory_tag(memory_id, tag_id) VALUES (?, ?)", tag_rows)
+    memory_rows.clear()
+    tag_rows.clear()
+
+
+def generate_queries(names: List[str], count: int, seed: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    queries: List[str] = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            queries.append(rng.choice(names))
+        elif kind < 0.8:
+            queries.append(f"{rng.choice(names)}{rng.choice(_RELATIONS)}{rng.choice(names)}")
+        else:
+            queries.append(f"{rng.choice(names)} {_random_word(rng, _COMMON_CHARS, 2, 4)}")
+    return queries
+
+
+def build_legacy_index(service: WorldTreeMemoryService) -> Dict[str, Set[str]]:
+    """原实现的倒排表：token -> 记录 id 集合（对照用）。"""
+    index: Dict[str, Set[str]] = {}
+    for record in service.list_records():
+        raw_text = f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
+        for token in service._tokenize(raw_text):
+            index.setdefault(token, set()).add(str(record["id"]))
+    return index
+
+
+def set_index_recall(
+    service: WorldTreeMemoryService,
+    index: Dict[str, Set[str]],
+    updated_at: Dict[str, str],
+    query: str,
+    top_k: int,
+) -> List[dict]:
+    """字符串 id 集合倒排表 + idf 累加打分，只读取前 top_k 条（BM25 引擎之前的实现，对照用）。"""
+    q_tokens = service._tokenize(_safe_text(query))
+    scores: Dict[str, float] = {}
+    total_docs = max(1, len(updated_at))
+    for token in q_tokens:
+        hits = index.get(token, set())
+        if not hits:
+            continue
+        idf = max(0.1, (total_docs / (1 + len(hits))))
+        for rid in hits:
+            scores[rid] = scores.get(rid, 0.0) + idf
+    ranked = sorted(scores, key=lambda rid: (-scores[rid], updated_at[rid]))[: max(1, int(top_k))]
+    return service._fetch_records(ranked)
+
+
+def legacy_recall(service: WorldTreeMemoryService, index: Dict[str, Set[str]], query: str, top_k: int) -> List[dict]:
+    """原实现：每次查询 list_records 全表读取后再按 idf 累加打分（对照用）。"""
+    q = _safe_text(query)
+    if not q:
+        return []
+    q_tokens = service._tokenize(q)
+    if not q_tokens:
+        return []
+    records = service.list_records()
+    by_id = {str(record["id"]): record for record in records}
+    scores: Dict[str, float] = {}
+    total_docs = max(1, len(by_id))
+    for token in q_tokens:
+        hits = index.get(token, set())
+        if not hits:
+            continue
+        idf = max(0.1, (total_docs / (1 + len(hits))))
+        for rid in hits:
+            scores[rid] = scores.get(rid, 0.0) + idf
+    ranked = sorted(
+        scores.keys(),
+        key=lambda rid: (-scores[rid], str(by_id.get(rid, {}).get("updatedAt", ""))),
+    )[: max(1, int(top_k))]
+    return [by_id[rid] for rid in ranked if rid in by_id]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _measure(func: Callable[[str], List[dict]], queries: List[str]) -> dict:
+    latencies: List[float] = []
+    for query in queries:
+        started = time.perf_counter()
+        func(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "queries": len(latencies),
+        "p50Ms": round(_percentile(latencies, 50), 3),
+        "p90Ms": round(_percentile(latencies, 90), 3),
+        "p99Ms": round(_percentile(latencies, 99), 3),
+        "meanMs": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+    }
+
+
+def _open_service(db_path: Path, backend: str) -> tuple[WorldTreeMemoryService, float]:
+    started = time.perf_counter()
+    service = WorldTreeMemoryService(db_path=db_path, legacy_json=None, recall_backend=backend)
+    return service, time.perf_counter() - started
+
+
+def run_backend(db_path: Path, backend: str, queries: List[str], args: argparse.Namespace) -> dict:
+    """打开指定召回后端并回放查询；fts5 首次打开包含全文表的创建与填充，再打开一次测启动耗时。"""
+    service, first_open = _open_service(db_path, backend)
+    result: dict = {"firstOpenSeconds": round(first_open, 2)}
+    if backend == recall_fts.BACKEND_FTS5:
+        del service
+        service, startup = _open_service(db_path, backend)
+        result["startupSeconds"] = round(startup, 3)
+    else:
+        result["startupSeconds"] = result["firstOpenSeconds"]
+        result["index"] = service._index.stats()
+    result["recall"] = _measure(lambda q: service.recall(q, args.top_k), queries)
+    result["dbMB"] = round(db_path.stat().st_size / (1024 * 1024), 1)
+    return result
+
+
+def run_size(work_dir: Path, size: int, args: argparse.Namespace) -> dict:
+    db_path = work_dir / f"world_tree_bench_{size}.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+    started = time.perf_counter()
+    service = WorldTreeMemoryService(db_path=db_path, legacy_json=None, recall_backend=recall_fts.BACKEND_MEMORY)
+    names = populate(service, db_path, size, args.seed)
+    populate_seconds = time.perf_counter() - started
+
+    queries = generate_queries(names, args.queries, args.seed)
+    result: dict = {"size": size, "populateSeconds": round(populate_seconds, 2)}
+
+    if size <= args.legacy_max:
+        legacy_index = build_legacy_index(service)
+        updated_at = {str(record["id"]): str(record["updatedAt"]) for record in service.list_records()}
+        result["setIndexRecall"] = _measure(
+            lambda q: set_index_recall(service, legacy_index, updated_at, q, args.top_k), queries
+        )
+        legacy_queries = queries[: args.legacy_queries]
+        result["legacyRecall"] = _measure(lambda q: legacy_recall(service, legacy_index, q, args.top_k), legacy_queries)
+        del legacy_index, updated_at
+    del service
+
+    # 依次测量各后端（切回 memory 会删除全文表，因此每个后端测完再打开下一个）
+    result["backends"] = {}
+    for backend in args.backends:
+        print(f"[bench] 规模 {size} 后端 {backend} ...", file=sys.stderr)
+        result["backends"][backend] = run_backend(db_path, backend, queries, args)
+
+    if "legacyRecall" in result:
+        legacy_p50 = result["legacyRecall"]["p50Ms"]
+        result["p50Speedup"] = {
+            backend: round(legacy_p50 / item["recall"]["p50Ms"], 1) if item["recall"]["p50Ms"] > 0 else None
+            for backend, item in result["backends"].items()
+        }
+
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="世界树记忆召回基准")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="逗号分隔的记忆条数")
+    parser.add_argument("--queries", type=int, default=500, help="每个规模的查询数")
+    parser.add_argument("--top-k", type=int, default=5, help="召回条数")
+    parser.add_argument("--backends", default="memory,fts5", help="逗号分隔的召回后端（memory/fts5）")
+    parser.add_argument("--legacy-max", type=int, default=100000, help="不超过该规模时对照原实现（原实现随规模线性变慢）")
+    parser.add_argument("--legacy-queries", type=int, default=50, help="原实现回放的查询数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--work-dir", default=None, help="临时库目录（默认系统临时目录）")
+    parser.add_argument("--keep", action="store_true", help="保留生成的数据库")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径（默认打印到标准输出）")
+    args = parser.parse_args()
+    args.backends = [part.strip() for part in args.backends.split(",") if part.strip()]
+    if recall_fts.BACKEND_FTS5 in args.backends and not recall_fts.fts5_available():
+        print("[bench] 当前 SQLite 不支持 FTS5，跳过 fts5 后端", file=sys.stderr)
+        args.backends.remove(recall_fts.BACKEND_FTS5)
+
+    work_dir = Path(args.work_dir or tempfile.gettempdir())
+    work_dir.mkdir(parents=True, exist_ok=True)
+    sizes = [int(part) for part in args.sizes.split(",") if part.strip()]
+    results = []
+    for size in sizes:
+        results.append(run_size(work_dir, size, args))
+
+    report = {"topK": args.top_k, "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
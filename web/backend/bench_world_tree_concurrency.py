@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""世界树存储并发基准：多个读线程持续召回的同时，写线程持续 upsert，对比连接池与原连接方式。
+
+pooled 为当前实现（每线程长连接、WAL、读不取写锁）；legacy 在同样的数据上复现原先的做法
+（每次操作新建连接、回滚日志、读也持有全局锁）。每种方式各自建库，按 --readers 逐档测量
+读吞吐、读延迟分位与写吞吐。
+
+示例：
+    uv run python web/backend/bench_world_tree_concurrency.py --size 20000 --readers 1,4,8 --writers 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import recall_fts
+from bench_world_tree import _COMMON_CHARS, _percentile, _random_word, generate_queries, populate
+from world_tree_service import WorldTreeMemoryService
+
+
+class LegacyConnectionService(WorldTreeMemoryService):
+    """原连接方式：每次操作新建连接（回滚日志、默认同步级别），召回与标签读取也持有全局锁（对照用）。"""
+
+    def _get_conn(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._db_path))
+        recall_fts.register_functions(conn)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def recall(self, query: str, top_k: int = 5) -> List[dict]:
+        with self._lock:
+            return super().recall(query, top_k)
+
+    def list_tags(self) -> List[dict]:
+        with self._lock:
+            return super().list_tags()
+
+
+def _remove_db(db_path: Path) -> None:
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+
+def _open(mode: str, db_path: Path, size: int, args: argparse.Namespace) -> tuple[WorldTreeMemoryService, List[str]]:
+    _remove_db(db_path)
+    cls = LegacyConnectionService if mode == "legacy" else WorldTreeMemoryService
+    # 先以内存后端建表，批量写入后再按目标后端重新打开
+    service = cls(db_path=db_path, legacy_json=None, recall_backend=recall_fts.BACKEND_MEMORY)
+    names = populate(service, db_path, size, args.seed)
+    del service
+    return cls(db_path=db_path, legacy_json=None, recall_backend=args.backend), names
+
+
+def run_round(
+    service: WorldTreeMemoryService,
+    size: int,
+    names: List[str],
+    queries: List[str],
+    readers: int,
+    writers: int,
+    duration: float,
+    seed: int,
+) -> dict:
+    stop = threading.Event()
+    read_latencies: List[List[float]] = [[] for _ in range(readers)]
+    write_counts = [0] * writers
+    errors: List[str] = []
+
+    def _reader(slot: int) -> None:
+        rng = random.Random(seed * 1000 + slot)
+        latencies = read_latencies[slot]
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                service.recall(rng.choice(queries), 5)
+                latencies.append((time.perf_counter() - started) * 1000)
+        except Exception as exc:  # noqa: BLE001 - 记录后结束该线程
+            errors.append(f"reader: {exc}")
+
+    def _writer(slot: int) -> None:
+        rng = random.Random(seed * 2000 + slot)
+        try:
+            while not stop.is_set():
+                subject, target = rng.choice(names), rng.choice(names)
+                # 一半改写已有记录，一半新增
+                if rng.random() < 0.5:
+                    record_id = f"m{rng.randrange(size):07d}"
+                else:
+                    record_id = f"w{slot}-{write_counts[slot]}"
+                service.upsert(
+                    {
+                        "id": record_id,
+                        "judgment": f"{subject}与{target}，{_random_word(rng, _COMMON_CHARS, 4, 12)}",
+                        "keywords": [subject, target],
+                    }
+                )
+                write_counts[slot] += 1
+        except Exception as exc:  # noqa: BLE001
+            errors.append(f"writer: {exc}")
+
+    threads = [threading.Thread(target=_reader, args=(i,), daemon=True) for i in range(readers)]
+    threads += [threading.Thread(target=_writer, args=(i,), daemon=True) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(value for bucket in read_latencies for value in bucket)
+    return {
+        "readers": readers,
+        "writers": writers,
+        "reads": len(latencies),
+        "readQps": round(len(latencies) / elapsed, 1),
+        "readP50Ms": round(_percentile(latencies, 50), 3),
+        "readP99Ms": round(_percentile(latencies, 99), 3),
+        "writesPerSecond": round(sum(write_counts) / elapsed, 1),
+        "errors": errors[:5],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="世界树存储并发基准")
+    parser.add_argument("--size", type=int, default=20000, help="初始记忆条数")
+    parser.add_argument("--readers", default="1,4,8", help="逗号分隔的读线程数（逐档测量）")
+    parser.add_argument("--writers", type=int, default=2, help="写线程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每档持续秒数")
+    parser.add_argument("--modes", default="pooled,legacy", help="逗号分隔：pooled（当前）/legacy（原连接方式）")
+    parser.add_argument("--backend", default=recall_fts.BACKEND_MEMORY, help="召回后端（memory/fts5）")
+    parser.add_argument("--queries", type=int, default=500, help="查询池大小")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--work-dir", default=None, help="临时库目录（默认系统临时目录）")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径（默认打印到标准输出）")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir or tempfile.gettempdir())
+    work_dir.mkdir(parents=True, exist_ok=True)
+    reader_levels = [int(part) for part in args.readers.split(",") if part.strip()]
+    modes = [part.strip() for part in args.modes.split(",") if part.strip()]
+
+    report: dict = {"size": args.size, "backend": args.backend, "duration": args.duration, "modes": {}}
+    for mode in modes:
+        db_path = work_dir / f"world_tree_concurrency_{mode}.db"
+        rounds = []
+        for readers in reader_levels:
+            # 每档重新建库，避免上一档的写入影响下一档
+            print(f"[bench] {mode} readers={readers} ...", file=sys.stderr)
+            service, names = _open(mode, db_path, args.size, args)
+            queries = generate_queries(names, args.queries, args.seed)
+            rounds.append(run_round(service, args.size, names, queries, readers, args.writers, args.duration, args.seed))
+            del service
+        _remove_db(db_path)
+        report["modes"][mode] = rounds
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
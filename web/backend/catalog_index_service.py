@@ -0,0 +1,51 @@
+"""目录索引（metadata/index.json）响应缓存：预序列化并预压缩，文件变化时才重新生成"""
+
+import hashlib
+import json
+import logging
+import threading
+
+from config import get_metadata_dir
+from http_cache import CachedPayload, encode_json
+
+logger = logging.getLogger(__name__)
+
+# 域 -> (index.json 的 stat 签名, 预序列化响应)
+_payloads: dict[str, tuple[tuple[int, int, int], CachedPayload]] = {}
+_payloads_lock = threading.Lock()
+# 串行化重新生成，避免文件更新后的并发请求重复解析大文件
+_regenerate_lock = threading.Lock()
+
+
+def _serialize(raw: bytes) -> bytes:
+    return encode_json(json.loads(raw.decode("utf-8")))
+
+
+def get_catalog_index_payload(domain: str) -> CachedPayload:
+    """返回目录索引的预序列化响应；index.json 不存在时抛 FileNotFoundError。"""
+    index_path = get_metadata_dir(domain) / "index.json"
+    st = index_path.stat()
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _payloads_lock:
+        cached = _payloads.get(domain)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    with _regenerate_lock:
+        with _payloads_lock:
+            cached = _payloads.get(domain)
+            if cached and cached[0] == signature:
+                return cached[1]
+        body = _serialize(index_path.read_bytes())
+        # 弱 ETag：同一内容的原文与各压缩变体共用
+        etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+        payload = CachedPayload.build(etag, body, last_modified=st.st_mtime)
+        with _payloads_lock:
+            _payloads[domain] = (signature, payload)
+        logger.info(
+            "域 %s 目录索引响应已重新生成: %d 字节（变体 %s）",
+            domain,
+            len(body),
+            ", ".join(f"{name}={len(data)}" for name, data in payload.variants.items()) or "无",
+        )
+        return payload
@@ -11,6 +11,64 @@ DOCS_ROOT = PROJECT_ROOT / "web" / "docs-site" / "public" / "domains"
 # Tantivy 索引存储路径
 INDEX_ROOT = Path(__file__).parent / "tantivy_index"
 
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+# 索引新鲜度后台轮询间隔（秒），0 表示关闭，改为查询时检查清单文件
+INDEX_WATCH_INTERVAL = max(0.0, _env_float("INDEX_WATCH_INTERVAL", 0.0))
+
+# 搜索执行线程池：线程数、每个域允许排队的请求数、单次请求超时（秒，0 表示不限）
+SEARCH_WORKERS = max(1, _env_int("SEARCH_WORKERS", min(8, (os.cpu_count() or 1) + 2)))
+SEARCH_QUEUE_LIMIT = max(1, _env_int("SEARCH_QUEUE_LIMIT", 32))
+SEARCH_TIMEOUT = max(0.0, _env_float("SEARCH_TIMEOUT", 30.0))
+
+# 批量搜索：单次请求最多查询数、批内并行线程数
+SEARCH_BATCH_MAX_QUERIES = max(1, _env_int("SEARCH_BATCH_MAX_QUERIES", 32))
+SEARCH_BATCH_WORKERS = max(1, _env_int("SEARCH_BATCH_WORKERS", 4))
+
+# 搜索结果缓存：总字节预算（0 表示关闭）、单条上限、存活秒数（0 表示仅按 LRU 淘汰）
+SEARCH_CACHE_MAX_BYTES = max(0, _env_int("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+SEARCH_CACHE_MAX_ENTRY_BYTES = max(0, _env_int("SEARCH_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+SEARCH_CACHE_TTL = max(0.0, _env_float("SEARCH_CACHE_TTL", 600.0))
+
+# 文档读取缓存：已解析文档（原文、行偏移表、去 Markdown 文本）的总字节预算，0 表示关闭
+DOC_CACHE_MAX_BYTES = max(0, _env_int("DOC_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# 构建索引时为每篇文档生成 gzip/br 预压缩变体，供 /doc/raw 直接返回（0 表示关闭）
+DOC_PRECOMPRESS = _env_int("DOC_PRECOMPRESS", 1) > 0
+
+# 索引构建时文档预处理（读取/清洗/bigram）的进程数，1 表示在主进程内顺序处理
+INDEX_WORKERS = max(1, _env_int("INDEX_WORKERS", min(4, os.cpu_count() or 1)))
+
+# 索引整理：段数超过阈值或已删除文档占比超过比例时重写为紧凑代际；后台检查间隔（秒，0 表示关闭）
+INDEX_COMPACT_SEGMENT_THRESHOLD = max(1, _env_int("INDEX_COMPACT_SEGMENT_THRESHOLD", 8))
+INDEX_COMPACT_DELETED_RATIO = max(0.0, _env_float("INDEX_COMPACT_DELETED_RATIO", 0.2))
+INDEX_COMPACT_INTERVAL = max(0.0, _env_float("INDEX_COMPACT_INTERVAL", 6 * 60 * 60))
+# 整理是单线程逐篇重新预处理全部文档（并非段合并），文档数超过该值时不自动整理，只能手动执行（0 表示不限）
+INDEX_COMPACT_MAX_DOCS = max(0, _env_int("INDEX_COMPACT_MAX_DOCS", 5000))
+
+# 链接库：每次解析只检查目录与 categories.json 的 mtime，另按该间隔（秒）逐个 stat 链接文件以发现原地改写（0 表示不做）
+LINK_RESCAN_INTERVAL = max(0.0, _env_float("LINK_RESCAN_INTERVAL", 60.0))
+
+# 世界树召回后端：memory（内存 BM25 倒排索引，启动时从数据库加载）或 fts5（SQLite 全文表，由触发器维护，无需预热）
+WORLD_TREE_RECALL_BACKEND = os.getenv("WORLD_TREE_RECALL_BACKEND", "memory").strip().lower() or "memory"
+
+# 世界树 SQLite：每个连接的页缓存（KiB）与内存映射大小（MiB，0 表示不使用 mmap）
+WORLD_TREE_SQLITE_CACHE_KB = max(0, _env_int("WORLD_TREE_SQLITE_CACHE_KB", 16 * 1024))
+WORLD_TREE_SQLITE_MMAP_MB = max(0, _env_int("WORLD_TREE_SQLITE_MMAP_MB", 256))
+
 # 支持的游戏域
 SUPPORTED_DOMAINS = ["gi", "hsr", "zzz"]
 SUPPORTED_LINK_DOMAINS = ["gi", "hsr"]
@@ -43,6 +101,16 @@ def get_index_dir(domain: str) -> Path:
     return INDEX_ROOT / domain
 
 
+def get_index_manifest_path(domain: str) -> Path:
+    """获取指定域的索引清单文件路径（记录索引代际 generation）"""
+    return get_index_dir(domain) / "index_manifest.json"
+
+
+def get_doc_variants_dir(domain: str) -> Path:
+    """获取指定域的文档预压缩变体目录（按文档相对路径存放 .gz/.br）"""
+    return get_index_dir(domain) / "doc_variants"
+
+
 def get_link_dir(domain: str) -> Path:
     """获取指定域的链接数据库目录"""
     if domain == "gi":
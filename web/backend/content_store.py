@@ -0,0 +1,215 @@
+"""文档内容存储：索引构建时落盘原文与小写副本及行偏移表，搜索时内存映射读取片段"""
+
+import json
+import logging
+import mmap
+import os
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CONTENT_STORE_DATA = "content_store.bin"
+CONTENT_STORE_LINES = "content_store.lines"
+CONTENT_STORE_META = "content_store.json"
+CONTENT_STORE_VERSION = 1
+
+# docs 条目字段下标：[数据偏移, 原文字节数, 小写字节数, 行表起始下标, 行数, 字符数]
+_DATA_OFFSET, _RAW_LEN, _LOWER_LEN, _LINES_OFFSET, _LINE_COUNT, _CHAR_LEN = range(6)
+
+
+def _line_starts(data: bytes) -> array:
+    """计算每一行起始字节偏移（相对文档块起点）。"""
+    starts = array("I", [0])
+    pos = data.find(b"\n")
+    while pos >= 0:
+        starts.append(pos + 1)
+        pos = data.find(b"\n", pos + 1)
+    return starts
+
+
+def prepare_content_block(content: str) -> tuple | None:
+    """计算文档块：(原文+小写字节, 行表字节, 原文字节数, 小写字节数, 行数, 字符数)。
+
+    理论上 lower() 不会增删换行；行数不一致时返回 None，由调用方跳过该文档（搜索时回退读文件）。
+    """
+    raw = content.encode("utf-8")
+    lower = content.lower().encode("utf-8")
+    raw_starts = _line_starts(raw)
+    lower_starts = _line_starts(lower)
+    if len(raw_starts) != len(lower_starts):
+        return None
+    return (
+        raw + lower,
+        raw_starts.tobytes() + lower_starts.tobytes(),
+        len(raw),
+        len(lower),
+        len(raw_starts),
+        len(content),
+    )
+
+
+class ContentStoreWriter:
+    """顺序写入内容存储；close() 时才原子发布元数据。"""
+
+    def __init__(self, index_dir: Path) -> None:
+        self._index_dir = Path(index_dir)
+        self._docs: dict[str, list[int]] = {}
+        self._data_offset = 0
+        self._lines_count = 0
+        self._data_file = open(self._index_dir / f"{CONTENT_STORE_DATA}.tmp", "wb")
+        self._lines_file = open(self._index_dir / f"{CONTENT_STORE_LINES}.tmp", "wb")
+
+    def add_prepared(self, physical_path: str, block: tuple) -> None:
+        """写入由 prepare_content_block 预先计算好的文档块（可在工作进程中计算）。"""
+        if physical_path in self._docs:
+            return
+        self._write(physical_path, *block)
+
+    def copy_from(self, store: "ContentStore", physical_path: str) -> None:
+        """从旧内容存储原样复制一篇文档（增量构建复用未变化的文档）。"""
+        if physical_path in self._docs:
+            return
+        entry = store._docs[physical_path]
+        data_start = entry[_DATA_OFFSET]
+        data = store._data[data_start:data_start + entry[_RAW_LEN] + entry[_LOWER_LEN]]
+        lines = store._lines[entry[_LINES_OFFSET]:entry[_LINES_OFFSET] + entry[_LINE_COUNT] * 2]
+        self._write(
+            physical_path,
+            data,
+            bytes(lines),
+            entry[_RAW_LEN],
+            entry[_LOWER_LEN],
+            entry[_LINE_COUNT],
+            entry[_CHAR_LEN],
+        )
+
+    def _write(
+        self,
+        physical_path: str,
+        data: bytes,
+        lines: bytes,
+        raw_len: int,
+        lower_len: int,
+        line_count: int,
+        char_len: int,
+    ) -> None:
+        self._data_file.write(data)
+        self._lines_file.write(lines)
+        self._docs[physical_path] = [
+            self._data_offset,
+            raw_len,
+            lower_len,
+            self._lines_count,
+            line_count,
+            char_len,
+        ]
+        self._data_offset += raw_len + lower_len
+        self._lines_count += line_count * 2
+
+    def close(self) -> None:
+        self._data_file.close()
+        self._lines_file.close()
+        os.replace(self._index_dir / f"{CONTENT_STORE_DATA}.tmp", self._index_dir / CONTENT_STORE_DATA)
+        os.replace(self._index_dir / f"{CONTENT_STORE_LINES}.tmp", self._index_dir / CONTENT_STORE_LINES)
+        meta_tmp = self._index_dir / f"{CONTENT_STORE_META}.tmp"
+        meta_tmp.write_text(
+            json.dumps({"version": CONTENT_STORE_VERSION, "docs": self._docs}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(meta_tmp, self._index_dir / CONTENT_STORE_META)
+
+
+def _map_file(path: Path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ContentStore:
+    """只读内容存储，数据与行表均为内存映射，查询时不打开 Markdown 文件。"""
+
+    def __init__(self, docs: dict[str, list[int]], data, lines) -> None:
+        self._docs = docs
+        self._data = data
+        self._lines = memoryview(lines).cast("B").cast("I") if len(lines) else []
+
+    @classmethod
+    def open(cls, index_dir: Path) -> Optional["ContentStore"]:
+        """打开索引目录下的内容存储；缺失或版本不符时返回 None。"""
+        index_dir = Path(index_dir)
+        meta_path = index_dir / CONTENT_STORE_META
+        if not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("version") != CONTENT_STORE_VERSION:
+                return None
+            data = _map_file(index_dir / CONTENT_STORE_DATA)
+            lines = _map_file(index_dir / CONTENT_STORE_LINES)
+        except (OSError, ValueError) as e:
+            logger.warning("打开内容存储失败 %s: %s", index_dir, e)
+            return None
+        return cls(meta.get("docs") or {}, data, lines)
+
+    def __contains__(self, physical_path: str) -> bool:
+        return physical_path in self._docs
+
+    def doc_stats(self, physical_path: str) -> tuple[int, int]:
+        """返回 (总行数, 总字符数)。"""
+        entry = self._docs[physical_path]
+        return entry[_LINE_COUNT], entry[_CHAR_LEN]
+
+    def read_text(self, physical_path: str) -> str:
+        entry = self._docs[physical_path]
+        start = entry[_DATA_OFFSET]
+        return bytes(self._data[start:start + entry[_RAW_LEN]]).decode("utf-8")
+
+    def find_snippets(
+        self,
+        physical_path: str,
+        terms: list[str],
+        max_snippets: int = 3,
+        snippet_max_len: int = 80,
+    ) -> list[dict]:
+        """在预计算的小写缓冲区中定位命中行，按词条顺序去重后返回前 max_snippets 条。"""
+        entry = self._docs[physical_path]
+        data_start = entry[_DATA_OFFSET]
+        raw_len = entry[_RAW_LEN]
+        lower_start = data_start + raw_len
+        lower_end = lower_start + entry[_LOWER_LEN]
+        line_count = entry[_LINE_COUNT]
+        raw_lines = self._lines[entry[_LINES_OFFSET]:entry[_LINES_OFFSET] + line_count]
+        lower_lines = self._lines[entry[_LINES_OFFSET] + line_count:entry[_LINES_OFFSET] + 2 * line_count]
+
+        hits: list[dict] = []
+        seen_lines: set[int] = set()
+        for term in terms:
+            if not term or "\n" in term:
+                continue
+            needle = term.lower().encode("utf-8")
+            term_hits = 0
+            pos = self._data.find(needle, lower_start, lower_end)
+            while pos >= 0 and term_hits < max_snippets:
+                line_idx = bisect_right(lower_lines, pos - lower_start) - 1
+                term_hits += 1
+                if line_idx not in seen_lines:
+                    seen_lines.add(line_idx)
+                    hits.append(self._snippet(data_start, raw_len, raw_lines, line_idx, snippet_max_len))
+                    if len(hits) >= max_snippets:
+                        return hits
+                if line_idx + 1 >= line_count:
+                    break
+                pos = self._data.find(needle, lower_start + lower_lines[line_idx + 1], lower_end)
+        return hits
+
+    def _snippet(self, data_start: int, raw_len: int, raw_lines, line_idx: int, snippet_max_len: int) -> dict:
+        line_start = raw_lines[line_idx]
+        line_end = raw_lines[line_idx + 1] - 1 if line_idx + 1 < len(raw_lines) else raw_len
+        text = bytes(self._data[data_start + line_start:data_start + line_end]).decode("utf-8").strip()
+        if len(text) > snippet_max_len:
+            text = text[:snippet_max_len] + "..."
+        return {"line": line_idx + 1, "snippet": text}
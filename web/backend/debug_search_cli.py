@@ -75,7 +75,7 @@ def main() -> None:
 
     if args.rebuild_index:
         print(f"[debug] 重建索引: {args.domain}")
-        build_index_for_domain(args.domain)
+        build_index_for_domain(args.domain, full=True)
         invalidate_index(args.domain)
         print("[debug] 索引重建完成，已清理缓存")
 
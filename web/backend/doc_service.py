@@ -1,15 +1,26 @@
 """文档读取服务：读取 Markdown 文件并返回内容"""
 
-import re
+import sys
+import hashlib
 import logging
+import threading
+from array import array
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 from urllib.parse import unquote
 
-from config import get_docs_dir, SUPPORTED_DOMAINS
+from config import get_docs_dir, get_doc_variants_dir, SUPPORTED_DOMAINS, DOC_CACHE_MAX_BYTES, DOC_PRECOMPRESS
+from doc_variants import load_doc_variants
+from http_cache import CachedPayload, encode_json
+from text_normalize import strip_markdown
 
 logger = logging.getLogger(__name__)
 
+# 每篇文档最多缓存的 /doc 响应种数（不同行范围/preserve_markdown 各算一种）
+DOC_JSON_PAYLOADS_PER_DOC = 8
+_json_payload_lock = threading.Lock()
+
 
 def _normalize_path(raw_path: str, domain: str) -> str:
     """规范化文档路径，剥离已知前缀"""
@@ -63,43 +74,195 @@ def _resolve_safe_doc_path(docs_dir: Path, normalized_path: str) -> Optional[Pat
     return md_file
 
 
-def _apply_line_ranges(content: str, line_ranges: list[str]) -> str:
-    """应用行范围选择"""
-    if not line_ranges:
-        return content
-
-    lines = content.split("\n")
-    selected = set()
-
+class _ParsedDoc:
+    """已读取的文档：原文、行起始偏移表，以及按需计算的去 Markdown 文本。"""
+
+    __slots__ = ("key", "signature", "text", "line_starts", "_stripped", "_payload", "_json_payloads", "size")
+
+    def __init__(self, key: str, signature: tuple[int, int], text: str) -> None:
+        self.key = key
+        self.signature = signature
+        self.text = text
+        # 第 i 行（0 起）在 text 中的起始字符偏移，行划分与 text.split("\n") 一致
+        starts = array("I", [0])
+        pos = text.find("\n")
+        while pos >= 0:
+            starts.append(pos + 1)
+            pos = text.find("\n", pos + 1)
+        self.line_starts = starts
+        self._stripped: Optional[str] = None
+        self._payload: Optional[CachedPayload] = None
+        # /doc 的 JSON 响应：(行范围, 是否保留 Markdown) -> 已编码并压缩的响应，最近使用的在末尾
+        self._json_payloads: "OrderedDict[tuple, CachedPayload]" = OrderedDict()
+        self.size = sys.getsizeof(text) + len(starts) * starts.itemsize
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    def line(self, line_no: int) -> str:
+        """返回第 line_no 行（1 起）的内容，不含换行符。"""
+        start = self.line_starts[line_no - 1]
+        if line_no < len(self.line_starts):
+            return self.text[start:self.line_starts[line_no] - 1]
+        return self.text[start:]
+
+    def slice_lines(self, start: int, end: int) -> str:
+        """返回第 start..end 行（1 起、闭区间）的原文，末行之前的行保留换行符，分页拼接即为全文。"""
+        begin = self.line_starts[start - 1]
+        if end < len(self.line_starts):
+            return self.text[begin:self.line_starts[end]]
+        return self.text[begin:]
+
+    @property
+    def stripped(self) -> str:
+        if self._stripped is None:
+            self._stripped = strip_markdown(self.text)
+            _doc_cache.grow(self, sys.getsizeof(self._stripped))
+        return self._stripped
+
+    @property
+    def etag(self) -> str:
+        # 与 nginx 相同，以 mtime 与大小作为强 ETag
+        mtime_ns, size = self.signature
+        return f'"{mtime_ns:x}-{size:x}"'
+
+    @property
+    def last_modified(self) -> float:
+        return self.signature[0] / 1e9
+
+    def raw_payload(self, variant_base: Path) -> CachedPayload:
+        """原文响应：优先使用构建时生成的预压缩变体，缺失时临时生成 gzip。"""
+        if self._payload is None:
+            body = self.text.encode("utf-8")
+            variants = load_doc_variants(variant_base, self.signature[0]) if DOC_PRECOMPRESS else {}
+            if variants:
+                payload = CachedPayload(self.etag, body, self.last_modified, variants)
+            else:
+                payload = CachedPayload.build(self.etag, body, self.last_modified, encodings=("gzip",))
+            self._payload = payload
+            _doc_cache.grow(self, payload.size)
+        return self._payload
+
+    def json_payload(self, params: tuple, build) -> CachedPayload:
+        """/doc 的 JSON 响应，按参数缓存在文档上（文档变化时随文档条目一并失效），每篇最多保留若干种参数。"""
+        with _json_payload_lock:
+            payload = self._json_payloads.get(params)
+            if payload is not None:
+                self._json_payloads.move_to_end(params)
+                return payload
+        payload = build()
+        evicted = 0
+        with _json_payload_lock:
+            self._json_payloads[params] = payload
+            while len(self._json_payloads) > DOC_JSON_PAYLOADS_PER_DOC:
+                evicted += self._json_payloads.popitem(last=False)[1].size
+        _doc_cache.grow(self, payload.size - evicted)
+        return payload
+
+
+class _DocCache:
+    """按绝对路径缓存已解析文档的 LRU，以 (mtime_ns, size) 校验新鲜度，按字节预算淘汰。"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _ParsedDoc]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, md_file: Path) -> _ParsedDoc:
+        """返回文档（必要时读取并解析）；文件不存在时抛 FileNotFoundError，读取失败抛 OSError/UnicodeError。"""
+        key = str(md_file)
+        st = md_file.stat()
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            doc = self._entries.get(key)
+            if doc is not None and doc.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return doc
+            self.misses += 1
+
+        doc = _ParsedDoc(key, signature, md_file.read_text(encoding="utf-8"))
+        if doc.size > self._max_bytes:
+            return doc
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = doc
+            self._bytes += doc.size
+            self._evict()
+        return doc
+
+    def grow(self, doc: _ParsedDoc, delta: int) -> None:
+        """文档懒计算出新数据后追加其占用。"""
+        with self._lock:
+            doc.size += delta
+            if self._entries.get(doc.key) is doc:
+                self._bytes += delta
+                self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self._max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_doc_cache = _DocCache(DOC_CACHE_MAX_BYTES)
+
+
+def get_doc_cache_stats() -> dict:
+    """文档读取缓存指标：条目数、占用字节与命中次数。"""
+    return _doc_cache.stats()
+
+
+def _select_line_ranges(doc: _ParsedDoc, line_ranges: list[str]) -> tuple[str, Optional[tuple[int, int]]]:
+    """应用行范围选择，返回 (带行号的内容, (首行, 末行))；只访问被选中的行。"""
+    total = doc.line_count
+    intervals: list[tuple[int, int]] = []
     for r in line_ranges:
         parts = r.split("-")
         if len(parts) == 2:
             try:
                 start, end = int(parts[0]), int(parts[1])
-                if start > len(lines):
-                    continue
-                for i in range(max(1, start), min(len(lines), end) + 1):
-                    selected.add(i)
             except ValueError:
                 continue
+            if start > total:
+                continue
+            start, end = max(1, start), min(total, end)
+            if start <= end:
+                intervals.append((start, end))
+
+    if not intervals:
+        return "[通知] 指定的行号范围无效或完全超出文件范围。", None
+
+    # 合并重叠/相邻区间，等价于对所选行号去重排序
+    intervals.sort()
+    merged = [intervals[0]]
+    for start, end in intervals[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
 
-    if not selected:
-        return "[通知] 指定的行号范围无效或完全超出文件范围。"
-
-    sorted_lines = sorted(selected)
-    return "\n".join(f"{ln} | {lines[ln - 1]}" for ln in sorted_lines)
-
-
-def _strip_markdown(text: str) -> str:
-    """简单的 Markdown 剥离"""
-    text = re.sub(r"<[^>]+>", "", text)
-    text = re.sub(r"#+\s?", "", text)
-    text = re.sub(r"(\*\*|__)(.*?)(\*\*|__)", r"\2", text)
-    text = re.sub(r"(\*|_)(.*?)(\*|_)", r"\2", text)
-    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)
-    text = re.sub(r"!\[.*?\]\(.*?\)", "", text)
-    text = re.sub(r"`([^`]+)`", r"\1", text)
-    return text
+    content = "\n".join(
+        f"{ln} | {doc.line(ln)}" for start, end in merged for ln in range(start, end + 1)
+    )
+    return content, (merged[0][0], merged[-1][1])
 
 
 def read_doc(
@@ -121,18 +284,24 @@ def read_doc(
     if md_file is None:
         return {"path": path, "error": "路径无效"}
 
-    if not md_file.exists():
-        return {"path": path, "error": f"文档不存在: {normalized}"}
-
     try:
-        full_content = md_file.read_text(encoding="utf-8")
+        doc = _doc_cache.get(md_file)
+    except FileNotFoundError:
+        return {"path": path, "error": f"文档不存在: {normalized}"}
     except Exception as e:
         logger.error(f"读取文件失败 {md_file}: {e}")
         return {"path": path, "error": "读取失败"}
+    return _build_doc_result(normalized, doc, line_ranges, preserve_markdown)
 
-    lines = full_content.split("\n")
-    total_lines = len(lines)
-    total_tokens = len(full_content) // 2  # 粗略估算 token 数
+
+def _build_doc_result(
+    normalized: str,
+    doc: _ParsedDoc,
+    line_ranges: Optional[list[str]],
+    preserve_markdown: bool,
+) -> dict:
+    total_lines = doc.line_count
+    total_tokens = len(doc.text) // 2  # 粗略估算 token 数
 
     result: dict = {
         "path": normalized,
@@ -141,22 +310,17 @@ def read_doc(
     }
 
     if line_ranges:
-        content = _apply_line_ranges(full_content, line_ranges)
+        content, selected = _select_line_ranges(doc, line_ranges)
         result["content"] = content
-        actual_lines = [l for l in content.split("\n") if l.strip()]
-        if actual_lines:
-            import re as _re
-            first = _re.match(r"^(\d+)\s*\|", actual_lines[0])
-            last = _re.match(r"^(\d+)\s*\|", actual_lines[-1])
-            if first and last:
-                result["lineRange"] = f"{first.group(1)}-{last.group(1)}"
+        if selected:
+            result["lineRange"] = f"{selected[0]}-{selected[1]}"
         result["returnedTokens"] = len(content) // 2
         result["remainingTokens"] = max(0, total_tokens - result["returnedTokens"])
     else:
         if preserve_markdown:
-            content = full_content
+            content = doc.text
         else:
-            content = _strip_markdown(full_content)
+            content = doc.stripped
         result["content"] = content
         result["returnedTokens"] = len(content) // 2
         result["remainingTokens"] = max(0, total_tokens - result["returnedTokens"])
@@ -164,8 +328,8 @@ def read_doc(
     return result
 
 
-def read_raw_markdown(domain: str, path: str) -> str:
-    """读取原始 Markdown 内容（用于前端 fetchMarkdownContent 替代）"""
+def _open_raw_doc(domain: str, path: str) -> tuple[str, _ParsedDoc]:
+    """解析路径并取出文档；域不支持、路径无效或文档不存在时抛 FileNotFoundError。"""
     if domain not in SUPPORTED_DOMAINS:
         raise FileNotFoundError(f"不支持的域: {domain}")
 
@@ -178,7 +342,69 @@ def read_raw_markdown(domain: str, path: str) -> str:
     if md_file is None:
         raise FileNotFoundError(f"路径无效: {path}")
 
-    if not md_file.exists():
-        raise FileNotFoundError(f"文档不存在: {normalized}")
+    try:
+        return normalized, _doc_cache.get(md_file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"文档不存在: {normalized}") from None
+
 
-    return md_file.read_text(encoding="utf-8")
+def read_raw_markdown(domain: str, path: str) -> str:
+    """读取原始 Markdown 内容（用于前端 fetchMarkdownContent 替代）"""
+    return _open_raw_doc(domain, path)[1].text
+
+
+def get_raw_doc_payload(domain: str, path: str) -> CachedPayload:
+    """原始 Markdown 的响应体、ETag 与压缩变体，供 /doc/raw 做条件请求与 Range 响应。"""
+    normalized, doc = _open_raw_doc(domain, path)
+    return doc.raw_payload(get_doc_variants_dir(domain) / normalized)
+
+
+def get_raw_doc_lines(domain: str, path: str, lines: str) -> tuple[Optional[CachedPayload], dict[str, str]]:
+    """按行范围（"起-止" 或 "起-"，1 起闭区间）截取原始 Markdown。
+
+    返回 (响应, 附加响应头)；起始行超出总行数时响应为 None。范围格式无效时抛 ValueError。
+    """
+    first, sep, last = lines.strip().partition("-")
+    if not sep:
+        raise ValueError(f"行范围格式应为 起-止: {lines}")
+    start = int(first)
+    _, doc = _open_raw_doc(domain, path)
+    total = doc.line_count
+    end = int(last) if last.strip() else total
+    if end < start:
+        raise ValueError(f"行范围无效: {lines}")
+    headers = {"X-Total-Lines": str(total)}
+    if start > total:
+        return None, headers
+    start, end = max(1, start), min(total, end)
+    headers["X-Line-Range"] = f"{start}-{end}"
+    body = doc.slice_lines(start, end).encode("utf-8")
+    etag = f'{doc.etag[:-1]}-L{start}-{end}"'
+    return CachedPayload.build(etag, body, doc.last_modified, encodings=("gzip",)), headers
+
+
+def get_doc_payload(
+    domain: str,
+    path: str,
+    line_ranges: Optional[list[str]] = None,
+    preserve_markdown: bool = False,
+    not_modified=None,
+) -> tuple[str, float, Optional[CachedPayload]]:
+    """/doc 的 (ETag, 修改时间, 响应)：JSON 编码与 gzip 结果按 (路径, mtime, 参数) 缓存。
+
+    not_modified(etag, last_modified) 为真时不生成响应、返回 None（条件请求命中）。
+    路径无效或文档不存在时抛 FileNotFoundError，读取失败抛 OSError/UnicodeError。
+    """
+    normalized, doc = _open_raw_doc(domain, path)
+    params = (tuple(line_ranges or ()), bool(preserve_markdown))
+    digest = hashlib.sha1(repr((list(params[0]), params[1])).encode("utf-8")).hexdigest()[:12]
+    base = doc.etag.strip('"')
+    etag = f'W/"{base}-{digest}"'
+    if not_modified is not None and not_modified(etag, doc.last_modified):
+        return etag, doc.last_modified, None
+
+    def _build() -> CachedPayload:
+        result = _build_doc_result(normalized, doc, line_ranges, preserve_markdown)
+        return CachedPayload.build(etag, encode_json(result), doc.last_modified, encodings=("gzip",))
+
+    return etag, doc.last_modified, doc.json_payload(params, _build)
@@ -0,0 +1,85 @@
+"""文档预压缩变体：构建索引时为每篇 Markdown 生成 gzip/br 文件，/doc/raw 直接读取返回"""
+
+import os
+from pathlib import Path
+
+from http_cache import MIN_COMPRESS_BYTES, compress_brotli, compress_gzip
+
+# 编码名 -> 变体文件后缀（追加在文档文件名之后，如 xxx.md.gz）
+VARIANT_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def _variant_path(base: Path, encoding: str) -> Path:
+    return base.with_name(base.name + VARIANT_SUFFIXES[encoding])
+
+
+def write_doc_variants(base: Path, body: bytes, mtime_ns: int) -> int:
+    """为响应体写入 base.gz / base.br，返回写入的字节数。
+
+    变体文件的 mtime 设为源文档的 mtime_ns，读取时据此判断是否仍对应当前文档。
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        remove_doc_variants(base)
+        return 0
+    base.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for encoding, data in (("gzip", compress_gzip(body)), ("br", compress_brotli(body))):
+        path = _variant_path(base, encoding)
+        if data is None:
+            path.unlink(missing_ok=True)
+            continue
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp_path, path)
+        written += len(data)
+    return written
+
+
+def load_doc_variants(base: Path, mtime_ns: int) -> dict[str, bytes]:
+    """读取与源文档 mtime 一致的变体；过期或缺失的变体忽略。"""
+    variants: dict[str, bytes] = {}
+    for encoding in VARIANT_SUFFIXES:
+        path = _variant_path(base, encoding)
+        try:
+            if path.stat().st_mtime_ns != mtime_ns:
+                continue
+            variants[encoding] = path.read_bytes()
+        except OSError:
+            continue
+    return variants
+
+
+def doc_variants_fresh(base: Path, mtime_ns: int, size: int) -> bool:
+    """增量构建判断复用文档的变体是否仍有效（小文档不生成变体，视为有效）。"""
+    if size < MIN_COMPRESS_BYTES:
+        return True
+    try:
+        return _variant_path(base, "gzip").stat().st_mtime_ns == mtime_ns
+    except OSError:
+        return False
+
+
+def remove_doc_variants(base: Path) -> None:
+    for encoding in VARIANT_SUFFIXES:
+        _variant_path(base, encoding).unlink(missing_ok=True)
+
+
+def prune_doc_variants(root: Path, keep: set[str]) -> int:
+    """删除不属于 keep（文档相对路径集合）的变体文件与残留临时文件，返回删除数。"""
+    if not root.exists():
+        return 0
+    suffixes = tuple(VARIANT_SUFFIXES.values())
+    removed = 0
+    for path in root.rglob("*"):
+        if not path.is_file():
+            continue
+        relative = path.relative_to(root).as_posix()
+        if relative.endswith(suffixes) and relative.rsplit(".", 1)[0] in keep:
+            continue
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            continue
+    return removed
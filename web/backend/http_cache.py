@@ -0,0 +1,238 @@
+"""HTTP 条件请求与压缩协商：ETag / Last-Modified / If-None-Match，以及预压缩的 gzip/brotli 变体"""
+
+import gzip
+import json
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli  # 可选依赖（pyproject 的 brotli extra）：未安装时只提供 gzip 变体
+except ImportError:  # pragma: no cover - 取决于部署环境
+    brotli = None
+
+BROTLI_AVAILABLE = brotli is not None
+
+# 小于该字节数的响应不压缩，压缩收益抵不过开销
+MIN_COMPRESS_BYTES = 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    """Range 请求的起点超出响应体长度。"""
+
+
+def compress_gzip(data: bytes) -> bytes:
+    # mtime=0 使同一内容的压缩结果稳定，便于与预压缩文件比对
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def compress_brotli(data: bytes) -> Optional[bytes]:
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=9)
+
+
+def encode_json(value) -> bytes:
+    # 与 FastAPI JSONResponse 的序列化方式保持一致（紧凑、保留非 ASCII 字符）
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass
+class CachedPayload:
+    """预序列化的响应体及其压缩变体。"""
+
+    etag: str
+    body: bytes
+    last_modified: Optional[float] = None
+    # 编码名（gzip/br）-> 压缩后的字节
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls,
+        etag: str,
+        body: bytes,
+        last_modified: Optional[float] = None,
+        encodings: tuple[str, ...] = ("gzip", "br"),
+    ) -> "CachedPayload":
+        """生成响应及压缩变体；按请求临时生成的响应可只传 ("gzip",)，省去较慢的 brotli。"""
+        payload = cls(etag=etag, body=body, last_modified=last_modified)
+        if len(body) >= MIN_COMPRESS_BYTES:
+            if "gzip" in encodings:
+                payload.variants["gzip"] = compress_gzip(body)
+            compressed = compress_brotli(body) if "br" in encodings else None
+            if compressed is not None:
+                payload.variants["br"] = compressed
+        return payload
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+
+def parse_accept_encoding(header: Optional[str]) -> set[str]:
+    """解析 Accept-Encoding，返回 q > 0 的编码名（小写）。"""
+    accepted: set[str] = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name)
+    return accepted
+
+
+def choose_encoding(request: Request, available: set[str]) -> Optional[str]:
+    """按 br > gzip 的优先级选择客户端接受且已有变体的编码。"""
+    accepted = parse_accept_encoding(request.headers.get("accept-encoding"))
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较，支持 * 与多个 ETag）。"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified_since(request: Request, last_modified: Optional[float]) -> bool:
+    """If-Modified-Since 判断；带 If-None-Match 时以 ETag 为准。"""
+    if last_modified is None or request.headers.get("if-none-match"):
+        return False
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= int(since)
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """解析单段 Range: bytes=...，返回闭区间 (start, end)。
+
+    语法不合法或为多段请求时返回 None（按规范忽略 Range，返回完整响应）；
+    起点超出长度时抛 RangeNotSatisfiable。
+    """
+    if not header:
+        return None
+    unit, _, spec = header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix < 0:
+                return None
+            if suffix == 0 or size == 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start < 0 or (last and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request: Request, etag: str, last_modified: Optional[float]) -> bool:
+    """If-Range 判断：ETag 须强匹配，日期须与 Last-Modified 完全一致；未携带时视为匹配。"""
+    header = request.headers.get("if-range")
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith("W/") or etag.startswith("W/"):
+        return False
+    if header.startswith('"'):
+        return header == etag
+    if last_modified is None:
+        return False
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) == int(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+def validator_headers(etag: str, last_modified: Optional[float]) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float]) -> bool:
+    return etag_matches(request, etag) or not_modified_since(request, last_modified)
+
+
+def payload_response(
+    request: Request,
+    payload: CachedPayload,
+    media_type: str,
+    headers: Optional[dict[str, str]] = None,
+    byte_ranges: bool = False,
+) -> Response:
+    """返回 304、206（byte_ranges=True 时的单段 Range）或按 Accept-Encoding 选择的预压缩变体。"""
+    headers = {**validator_headers(payload.etag, payload.last_modified), **(headers or {})}
+    if is_not_modified(request, payload.etag, payload.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    if byte_ranges:
+        headers["Accept-Ranges"] = "bytes"
+        range_header = request.headers.get("range")
+        if range_header and if_range_matches(request, payload.etag, payload.last_modified):
+            size = len(payload.body)
+            try:
+                selected = parse_byte_range(range_header, size)
+            except RangeNotSatisfiable:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+            if selected is not None:
+                # 范围按未压缩的原文计算，206 响应不再压缩
+                start, end = selected
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                return Response(
+                    content=payload.body[start:end + 1],
+                    status_code=206,
+                    media_type=media_type,
+                    headers=headers,
+                )
+
+    encoding = choose_encoding(request, set(payload.variants))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        if not payload.etag.startswith("W/"):
+            # 强 ETag 只标识未压缩原文，压缩变体改用同值的弱 ETag
+            headers["ETag"] = f"W/{payload.etag}"
+        return Response(content=payload.variants[encoding], media_type=media_type, headers=headers)
+    return Response(content=payload.body, media_type=media_type, headers=headers)
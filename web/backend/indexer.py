@@ -1,44 +1,106 @@
 #!/usr/bin/env python3
 """Tantivy 索引构建器：从 Markdown 文档构建全文搜索索引"""
 
+import argparse
+import codecs
+import hashlib
 import json
+import os
 import re
 import sys
 import logging
+import multiprocessing
 import shutil
+import threading
+import time
 import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
 
 import tantivy
 
 from config import (
+    INDEX_COMPACT_DELETED_RATIO,
+    INDEX_COMPACT_MAX_DOCS,
+    INDEX_COMPACT_SEGMENT_THRESHOLD,
+    INDEX_WORKERS,
+    DOC_PRECOMPRESS,
     SUPPORTED_DOMAINS,
+    get_doc_variants_dir,
     get_docs_dir,
     get_metadata_dir,
     get_index_dir,
+    get_index_manifest_path,
 )
+from content_store import (
+    CONTENT_STORE_DATA,
+    CONTENT_STORE_LINES,
+    CONTENT_STORE_META,
+    ContentStore,
+    ContentStoreWriter,
+    prepare_content_block,
+)
+from text_normalize import clean_markdown, normalize_search_text
+from doc_variants import doc_variants_fresh, prune_doc_variants, remove_doc_variants, write_doc_variants
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-def clean_markdown(text: str) -> str:
-    """清洗 Markdown，移除标记保留纯文本"""
-    if not text:
-        return ""
-    text = re.sub(r"<[^>]+>", "", text)
-    text = re.sub(r"#+\s?", "", text)
-    text = re.sub(r"(\*\*|__)(.*?)(\*\*|__)", r"\2", text)
-    text = re.sub(r"(\*|_)(.*?)(\*|_)", r"\2", text)
-    text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", text)
-    text = re.sub(r"!\[.*?\]\(.*?\)", "", text)
-    text = re.sub(r"```[\s\S]*?```", "", text)
-    text = re.sub(r"`([^`]+)`", r"\1", text)
-    text = re.sub(r"^[-*+]\s+", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^\d+\.\s+", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^>\s+", "", text, flags=re.MULTILINE)
-    text = re.sub(r"---+", "", text)
-    text = re.sub(r"\|", " ", text)
-    return text.strip()
+# index.json 条目中建索引用到的字段，其余字段解析后即丢弃
+_INDEX_ITEM_FIELDS = ("id", "name", "type", "category", "path")
+INDEX_JSON_CHUNK_SIZE = 1 << 20
+
+
+def iter_index_json(path: Path, digest=None, chunk_size: int = INDEX_JSON_CHUNK_SIZE):
+    """流式读取 index.json（顶层为数组），逐个产出元素。
+
+    按块读取并用 raw_decode 增量解析，内存占用只与单个条目大小相关；
+    digest（hashlib 对象）不为空时同时对原始字节做摘要。
+    """
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    started = False
+    eof = False
+    with open(path, "rb") as f:
+        while True:
+            # 跳过空白与分隔符
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,\ufeff":
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{path} 顶层不是 JSON 数组")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # 数字等标量可能恰好被块边界截断，确认其后还有分隔符
+                    if end < len(buffer) or eof:
+                        yield value
+                        pos = end
+                        continue
+            if eof:
+                if not started:
+                    raise ValueError(f"{path} 为空")
+                raise ValueError(f"{path} 数组未闭合")
+            chunk = f.read(chunk_size)
+            if digest is not None and chunk:
+                digest.update(chunk)
+            eof = not chunk
+            buffer = buffer[pos:] + reader.decode(chunk, final=eof)
+            pos = 0
 
 
 def get_physical_path(item: dict, domain: str) -> str | None:
@@ -52,6 +114,21 @@ def get_physical_path(item: dict, domain: str) -> str | None:
     return f"{relative_path}.md"
 
 
+# 每个预处理任务包含的文档数
+PREPARE_CHUNK_SIZE = 64
+
+# schema 或文档字段构造方式变化时递增，使增量构建退化为全量构建
+INDEX_SCHEMA_VERSION = 3
+# 名称前缀（edge n-gram）最多展开的字符数
+NAME_PREFIX_MAX_CHARS = 24
+# 名称子串（n-gram）最多展开的字符数；更长的查询按若干窗口共同命中判断前缀/包含
+NAME_INFIX_MAX_CHARS = 8
+# 代际目录内的文档清单：physical_path -> 元数据、文件状态、内容哈希、doc_id。
+# 未进入索引的文档（读取失败、清洗后为空）带 skipped 标记，已索引但未写入内容存储的带 unstored 标记，
+# 文件未变化时沿用记录，不会在每次增量构建中被反复重新索引
+DOCS_MANIFEST_NAME = "docs_manifest.json"
+
+
 def build_schema() -> tantivy.Schema:
     """构建 Tantivy schema"""
     builder = tantivy.SchemaBuilder()
@@ -60,6 +137,10 @@ def build_schema() -> tantivy.Schema:
     builder.add_text_field("name_cjk2", stored=False, tokenizer_name="default")
     builder.add_text_field("name_raw", stored=True, tokenizer_name="raw")
     builder.add_text_field("name_display", stored=True, tokenizer_name="raw")
+    # 名称匹配特征：规范化名称键与其全部前缀，供搜索侧直接以词项查询实现完全/前缀分层
+    builder.add_text_field("name_key", stored=False, tokenizer_name="raw")
+    builder.add_text_field("name_prefix", stored=False, tokenizer_name="raw")
+    builder.add_text_field("name_infix", stored=False, tokenizer_name="raw")
     builder.add_text_field("content", stored=False, tokenizer_name="default")
     builder.add_text_field("content_cjk2", stored=False, tokenizer_name="default")
     builder.add_text_field("path_terms", stored=False, tokenizer_name="default")
@@ -74,17 +155,7 @@ def build_schema() -> tantivy.Schema:
 
 def prepare_text_for_index(text: str) -> str:
     """索引前轻量规范化：不做人工分词，交给 Tantivy 原生 tokenizer。"""
-    normalized = str(text or "").strip()
-    if not normalized:
-        return ""
-    normalized = normalized.lower()
-    normalized = re.sub(
-        r"[\uff01-\uff5e]",
-        lambda ch: chr(ord(ch.group(0)) - 0xFEE0),
-        normalized,
-    )
-    normalized = normalized.replace("\u3000", " ")
-    return normalized
+    return normalize_search_text(text)
 
 
 def _iter_cjk2_tokens(text: str) -> list[str]:
@@ -120,6 +191,27 @@ def prepare_cjk2_text_for_index(text: str) -> str:
     """将文本转换为以空格连接的 CJK bigram token。"""
     return " ".join(_iter_cjk2_tokens(text))
 
+
+def prepare_name_key(name: str) -> str:
+    """名称匹配键：与搜索侧查询规范化一致（小写、全角转半角）。"""
+    return prepare_text_for_index(name).strip()
+
+
+def prepare_name_prefixes(name_key: str) -> list[str]:
+    """名称键的 edge n-gram（1..NAME_PREFIX_MAX_CHARS 个字符的前缀）。"""
+    return [name_key[:i] for i in range(1, min(len(name_key), NAME_PREFIX_MAX_CHARS) + 1)]
+
+
+def prepare_name_infixes(name_key: str) -> list[str]:
+    """名称键的全部子串（1..NAME_INFIX_MAX_CHARS 个字符，去重）。"""
+    grams = (
+        name_key[i:i + size]
+        for size in range(1, min(len(name_key), NAME_INFIX_MAX_CHARS) + 1)
+        for i in range(len(name_key) - size + 1)
+    )
+    return list(dict.fromkeys(grams))
+
+
 def prepare_path_terms_for_index(relative_path: str) -> str:
     """
     从 docs 相对路径提取路径词条文本：
@@ -137,139 +229,734 @@ def prepare_path_terms_for_index(relative_path: str) -> str:
     return prepare_text_for_index(" ".join(segments))
 
 
+def read_index_manifest(domain: str) -> dict:
+    """读取索引清单；不存在或损坏时返回空字典。"""
+    manifest_path = get_index_manifest_path(domain)
+    try:
+        payload = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"读取索引清单失败 {manifest_path}: {e}")
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _write_index_manifest(domain: str, payload: dict) -> None:
+    """原子写入索引清单（先写临时文件再替换），读方不会看到半写状态。"""
+    manifest_path = get_index_manifest_path(domain)
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+
+
 # 内容长度上限，避免超大文档导致 writer 线程崩溃
 MAX_CONTENT_LENGTH = 100_000
 
 
-def build_index_for_domain(domain: str) -> None:
-    """为指定域构建 Tantivy 索引"""
-    docs_dir = get_docs_dir(domain)
-    metadata_dir = get_metadata_dir(domain)
-    index_dir = get_index_dir(domain)
+# 保留的索引代际目录数量（当前 + 上一代，供重建瞬间仍在执行的查询使用）
+INDEX_KEEP_GENERATIONS = 2
+GENERATION_DIR_PREFIX = "gen-"
 
-    index_json_path = metadata_dir / "index.json"
-    if not index_json_path.exists():
-        logging.error(f"索引文件不存在: {index_json_path}")
-        return
+# 同一域的重建互斥，避免定时任务与调试命令并发分配同一代际
+_build_locks: dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
 
-    with open(index_json_path, "r", encoding="utf-8") as f:
-        index_data = json.load(f)
 
-    logging.info(f"[{domain.upper()}] 加载了 {len(index_data)} 个索引条目")
+def _generation_dir_name(generation: int) -> str:
+    return f"{GENERATION_DIR_PREFIX}{generation:06d}"
 
-    # 清理旧索引，重新创建目录
-    if index_dir.exists():
+
+def resolve_active_index_dir(domain: str, manifest: dict | None = None) -> Path | None:
+    """解析清单指向的当前索引目录；兼容旧版直接写在域目录下的索引。"""
+    index_dir = get_index_dir(domain)
+    if manifest is None:
+        manifest = read_index_manifest(domain)
+    directory = str(manifest.get("directory") or "")
+    if directory:
+        active_dir = index_dir / directory
+        return active_dir if active_dir.is_dir() else None
+    if (index_dir / "meta.json").exists():
+        return index_dir
+    return None
+
+
+def _remove_tree(path: Path) -> None:
+    """删除目录；权限问题时尝试改权限重试，仍失败仅记录日志（下次重建再回收）。"""
+    try:
+        shutil.rmtree(path)
+    except PermissionError:
+        def _on_error(func, target, exc_info):
+            try:
+                os.chmod(target, 0o700)
+                func(target)
+            except Exception as chmod_exc:
+                logging.error(f"无法修改权限并删除 {target}: {chmod_exc}")
         try:
-            shutil.rmtree(index_dir)
-        except PermissionError:
-            # Try to fix permissions and retry
-            def _on_error(func, path, exc_info):
-                import os
-                try:
-                    os.chmod(path, 0o700)
-                    func(path)
-                except Exception as chmod_exc:
-                    logging.error(f"无法修改权限并删除 {path}: {chmod_exc}")
+            shutil.rmtree(path, onerror=_on_error)
+        except Exception as retry_exc:
+            logging.error(f"重试删除索引目录失败: {retry_exc}")
+    except OSError as e:
+        logging.error(f"删除索引目录失败: {e}")
+
+
+def _collect_old_generations(domain: str, active_generation: int) -> None:
+    """回收过旧的代际目录，以及旧版原地布局遗留的索引文件。"""
+    index_dir = get_index_dir(domain)
+    manifest_name = get_index_manifest_path(domain).name
+    keep_from = active_generation - INDEX_KEEP_GENERATIONS + 1
+    for entry in index_dir.iterdir():
+        if entry.is_dir() and entry.name.startswith(GENERATION_DIR_PREFIX):
             try:
-                shutil.rmtree(index_dir, onerror=_on_error)
-            except Exception as retry_exc:
-                logging.error(f"重试删除索引目录失败: {retry_exc}")
-        except OSError as e:
-            logging.error(f"删除索引目录失败: {e}")
-    index_dir.mkdir(parents=True, exist_ok=True)
+                generation = int(entry.name[len(GENERATION_DIR_PREFIX):])
+            except ValueError:
+                continue
+            if generation < keep_from:
+                logging.info(f"[{domain.upper()}] 回收旧索引代际: {entry.name}")
+                _remove_tree(entry)
+        elif entry.is_file() and not entry.name.startswith(manifest_name):
+            try:
+                entry.unlink()
+            except OSError as e:
+                logging.debug(f"旧版索引文件暂无法删除 {entry}: {e}")
 
-    schema = build_schema()
-    index = tantivy.Index(schema, path=str(index_dir))
 
-    # 分配 256MB heap 给 writer
-    writer = index.writer(heap_size=256 * 1024 * 1024)
+def _validate_generation(build_dir: Path, expected_docs: int, sample_paths: list[str]) -> str | None:
+    """校验新代际：文档数一致、抽样文档可按路径检索、内容存储完整。返回失败原因或 None。"""
+    index = tantivy.Index(build_schema(), path=str(build_dir))
+    index.reload()
+    searcher = index.searcher()
+    if searcher.num_docs != expected_docs:
+        return f"文档数不一致: 索引 {searcher.num_docs}, 预期 {expected_docs}"
+
+    store = ContentStore.open(build_dir)
+    if expected_docs and store is None:
+        return "内容存储缺失"
+    for physical_path in sample_paths:
+        query = tantivy.Query.term_query(index.schema, "physical_path", physical_path)
+        if searcher.search(query, limit=1).count < 1:
+            return f"冒烟查询未命中: {physical_path}"
+        if store is not None and physical_path not in store:
+            return f"内容存储缺少文档: {physical_path}"
+    return None
+
+
+def _publish_generation(domain: str, build_dir: Path, generation: int, doc_count: int, mode: str) -> None:
+    """原子替换清单指针：只有校验通过的代际才会被发布给搜索服务，随后回收旧代际。"""
+    _write_index_manifest(domain, {
+        "generation": generation,
+        "directory": build_dir.name,
+        "builtAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "docCount": doc_count,
+        "mode": mode,
+    })
+    _collect_old_generations(domain, generation)
+
+
+def _item_meta_key(item: dict) -> list:
+    """index.json 条目中参与索引的元数据；任一变化都需要重新索引该文档。"""
+    return [item.get("id"), item.get("name", ""), item.get("type", ""), item.get("category", "")]
+
+
+def _content_hash(meta_key: list, raw_bytes: bytes) -> str:
+    digest = hashlib.sha1(json.dumps(meta_key, ensure_ascii=False).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(raw_bytes)
+    return digest.hexdigest()
+
+
+def _read_docs_manifest_payload(index_dir: Path) -> dict | None:
+    """读取代际目录内的文档清单原始内容；schema 版本不一致时视为不可复用。"""
+    try:
+        payload = json.loads((index_dir / DOCS_MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("schemaVersion") != INDEX_SCHEMA_VERSION:
+        return None
+    if not isinstance(payload.get("docs"), dict):
+        return None
+    return payload
 
-    indexed_count = 0
-    skipped_count = 0
-    error_count = 0
 
-    for item in index_data:
-        item_id = item.get("id")
-        item_name = item.get("name", "")
-        item_type = item.get("type", "")
-        item_category = item.get("category", "")
+def _read_docs_manifest(index_dir: Path) -> dict | None:
+    payload = _read_docs_manifest_payload(index_dir)
+    return payload["docs"] if payload is not None else None
 
-        relative_path = get_physical_path(item, domain)
-        if not relative_path:
-            skipped_count += 1
+
+def _indexed_doc_count(docs: dict) -> int:
+    """文档清单中实际写入索引的文档数（不含 skipped 记录）。"""
+    return sum(1 for record in docs.values() if not record.get("skipped"))
+
+
+def _validation_samples(docs: dict, count: int = 3) -> list[str]:
+    """冒烟校验的抽样路径：只取已写入索引与内容存储的文档。"""
+    samples = (path for path, record in docs.items() if not record.get("skipped") and not record.get("unstored"))
+    return list(islice(samples, count))
+
+
+def _write_docs_manifest(index_dir: Path, docs: dict, index_json_hash: str) -> None:
+    payload = {
+        "schemaVersion": INDEX_SCHEMA_VERSION,
+        "indexJsonHash": index_json_hash,
+        "docs": docs,
+    }
+    (index_dir / DOCS_MANIFEST_NAME).write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+
+def _clone_index_files(src_dir: Path, dst_dir: Path) -> None:
+    """以硬链接复制上一代的 Tantivy 段文件（段文件不可变，写入只会新建文件）。"""
+    skip = {CONTENT_STORE_DATA, CONTENT_STORE_LINES, CONTENT_STORE_META, DOCS_MANIFEST_NAME}
+    for entry in src_dir.iterdir():
+        if not entry.is_file() or entry.name in skip or entry.name.endswith((".lock", ".tmp")):
             continue
+        target = dst_dir / entry.name
+        try:
+            os.link(entry, target)
+        except OSError:
+            shutil.copy2(entry, target)
 
-        md_file = docs_dir / relative_path
-        if not md_file.exists():
-            skipped_count += 1
+
+def _prepare_document_fields(item: dict, relative_path: str, raw_content: str) -> dict | None:
+    """计算 Tantivy 文档的全部字段值（纯 Python，可在工作进程中执行）；清洗后为空时返回 None。"""
+    item_id = item.get("id")
+    item_name = item.get("name", "")
+    item_type = item.get("type", "")
+    item_category = item.get("category", "")
+
+    cleaned_content = clean_markdown(raw_content)
+    if not cleaned_content:
+        return None
+
+    # 截断过长内容
+    if len(cleaned_content) > MAX_CONTENT_LENGTH:
+        cleaned_content = cleaned_content[:MAX_CONTENT_LENGTH]
+
+    logical_path = relative_path
+    doc_id_fallback = False
+    try:
+        doc_id_val = int(item_id) if item_id is not None else 0
+    except (ValueError, TypeError):
+        # Generate unique fallback ID to avoid duplicates
+        doc_id_val = int(uuid.uuid4().int % (2**32))
+        doc_id_fallback = True
+
+    normalized_path_terms = prepare_path_terms_for_index(relative_path)
+    name_key = prepare_name_key(item_name)
+    return {
+        "name": prepare_text_for_index(item_name.replace("-", " ")),
+        "name_cjk2": prepare_cjk2_text_for_index(item_name.replace("-", " ")),
+        "name_raw": str(item_name or "").strip().lower(),
+        "name_display": str(item_name or "").strip(),
+        "name_key": name_key,
+        "name_prefix": prepare_name_prefixes(name_key),
+        "name_infix": prepare_name_infixes(name_key),
+        "content": prepare_text_for_index(cleaned_content),
+        "content_cjk2": prepare_cjk2_text_for_index(cleaned_content),
+        "path_terms": normalized_path_terms,
+        "path_terms_cjk2": prepare_cjk2_text_for_index(normalized_path_terms),
+        "path": logical_path,
+        "physical_path": relative_path,
+        "category": item_category,
+        "doc_type": item_type,
+        "doc_id": doc_id_val,
+        "_doc_id_fallback": doc_id_fallback,
+    }
+
+
+def _document_from_fields(fields: dict) -> tantivy.Document:
+    doc = tantivy.Document()
+    for field_name, value in fields.items():
+        if field_name.startswith("_"):
             continue
+        if field_name == "doc_id":
+            doc.add_unsigned(field_name, value)
+        elif isinstance(value, list):
+            for item in value:
+                doc.add_text(field_name, item)
+        else:
+            doc.add_text(field_name, value)
+    return doc
+
+
+def _decode_markdown(raw_bytes: bytes) -> str:
+    # 与 read_text 的通用换行处理保持一致
+    return raw_bytes.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _write_variants_for(variant_base: str, md_path: str, raw_content: str, mtime_ns: int) -> str | None:
+    """为文档写入预压缩变体，返回告警信息（失败不影响索引）。"""
+    try:
+        write_doc_variants(Path(variant_base), raw_content.encode("utf-8"), mtime_ns)
+    except OSError as e:
+        return f"写入预压缩变体失败 {md_path}: {e}"
+    return None
+
+
+def _prepare_document(task: tuple[dict, str, str, str | None]) -> dict:
+    """（工作进程）读取并预处理单篇文档：字段、内容存储块与内容哈希，并按需写入预压缩变体。"""
+    item, relative_path, md_path, variant_base = task
+    result: dict = {"path": relative_path, "bytes": 0}
+    try:
+        # 先取 mtime 再读取：读取期间文件被改写时变体会因 mtime 不符而被忽略
+        mtime_ns = os.stat(md_path).st_mtime_ns
+        raw_bytes = Path(md_path).read_bytes()
+        raw_content = _decode_markdown(raw_bytes)
+    except Exception as e:
+        result["error"] = f"读取文件失败 {md_path}: {e}"
+        return result
+    result["bytes"] = len(raw_bytes)
+    if variant_base is not None:
+        warning = _write_variants_for(variant_base, md_path, raw_content, mtime_ns)
+        if warning:
+            result["warning"] = warning
+    try:
+        result["hash"] = _content_hash(_item_meta_key(item), raw_bytes)
+        fields = _prepare_document_fields(item, relative_path, raw_content)
+        if fields is None:
+            return result
+        result["fields"] = fields
+        result["store"] = prepare_content_block(raw_content)
+    except Exception as e:
+        result.pop("fields", None)
+        result["error"] = f"预处理文档失败 {relative_path}: {e}"
+    return result
+
+
+def _prepare_chunk(tasks: list[tuple[dict, str, str, str | None]]) -> list[dict]:
+    return [_prepare_document(task) for task in tasks]
+
+
+def _iter_prepared_documents(tasks: list[tuple[dict, str, str, str | None]], workers: int):
+    """按输入顺序产出预处理结果。
+
+    多进程时分块提交，最多保留 workers * 2 个在途分块，主线程消费一个再补一个，
+    既让 writer 与预处理并行，又限制已完成未消费结果占用的内存。
+    """
+    if workers <= 1 or len(tasks) <= PREPARE_CHUNK_SIZE:
+        for task in tasks:
+            yield _prepare_document(task)
+        return
 
+    chunks = iter([tasks[i:i + PREPARE_CHUNK_SIZE] for i in range(0, len(tasks), PREPARE_CHUNK_SIZE)])
+    # spawn：后端在多线程的 uvicorn 进程内重建时，避免 fork 继承锁状态
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        in_flight = deque(pool.submit(_prepare_chunk, chunk) for chunk in islice(chunks, workers * 2))
+        while in_flight:
+            results = in_flight.popleft().result()
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                in_flight.append(pool.submit(_prepare_chunk, next_chunk))
+            yield from results
+
+
+def _sync_reused_variants(
+    domain: str,
+    docs_dir: Path,
+    variants_dir: Path,
+    planned: dict[str, tuple[dict, str, dict]],
+    removed_paths: list[str],
+) -> None:
+    """补齐复用文档缺失/过期的预压缩变体，删除已移除文档的变体。
+
+    重新索引的文档由预处理进程顺带生成变体；这里只处理不经过预处理的文档，
+    因此即便索引本身无变化，首次启用或变体目录被清空后也会补齐。
+    """
+    backfilled = 0
+    for relative_path, (_, action, record) in planned.items():
+        if action != "reuse" or record.get("skipped") == "error":
+            continue
+        base = variants_dir / relative_path
+        if doc_variants_fresh(base, record["mtimeNs"], record["size"]):
+            continue
+        md_path = str(docs_dir / relative_path)
         try:
-            raw_content = md_file.read_text(encoding="utf-8")
-        except Exception as e:
-            logging.warning(f"读取文件失败 {md_file}: {e}")
+            raw_content = _decode_markdown(Path(md_path).read_bytes())
+        except (OSError, UnicodeDecodeError) as e:
+            logging.warning(f"读取文件失败 {md_path}: {e}")
+            continue
+        warning = _write_variants_for(str(base), md_path, raw_content, record["mtimeNs"])
+        if warning:
+            logging.warning(warning)
+        else:
+            backfilled += 1
+    for relative_path in removed_paths:
+        remove_doc_variants(variants_dir / relative_path)
+    if backfilled:
+        logging.info(f"[{domain.upper()}] 补齐预压缩变体 {backfilled} 篇")
+
+
+def build_index_for_domain(domain: str, full: bool = False, workers: int | None = None) -> bool:
+    """为指定域构建 Tantivy 索引。
+
+    新索引写入独立的代际目录，校验通过后原子替换清单指针再回收旧代际，
+    重建期间搜索始终读取上一代完整索引。默认增量构建：仅重新索引内容或元数据
+    发生变化的文档；full=True 或无可复用清单时全量构建。workers 为文档预处理
+    进程数（默认取 INDEX_WORKERS）。返回是否发布了新代际。
+    """
+    if workers is None:
+        workers = INDEX_WORKERS
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(domain, threading.Lock())
+    with lock:
+        return _build_generation(domain, full, max(1, int(workers)))
+
+
+def _build_generation(domain: str, full: bool, workers: int) -> bool:
+    docs_dir = get_docs_dir(domain)
+    metadata_dir = get_metadata_dir(domain)
+    index_dir = get_index_dir(domain)
+
+    index_json_path = metadata_dir / "index.json"
+    if not index_json_path.exists():
+        logging.error(f"索引文件不存在: {index_json_path}")
+        return False
+
+    # 逐条流式解析 index.json，内存只保留参与索引的字段
+    index_json_digest = hashlib.sha1()
+    index_data = iter_index_json(index_json_path, index_json_digest)
+
+    previous_manifest = read_index_manifest(domain)
+    previous_generation = int(previous_manifest.get("generation", 0) or 0)
+    generation = previous_generation + 1
+
+    # 增量构建需要上一代的文档清单与内容存储
+    previous_dir = None if full else resolve_active_index_dir(domain, previous_manifest)
+    previous_docs = None
+    previous_store = None
+    if previous_dir is not None and previous_dir != index_dir:
+        previous_docs = _read_docs_manifest(previous_dir)
+        previous_store = ContentStore.open(previous_dir) if previous_docs is not None else None
+    if previous_store is None:
+        previous_docs = None
+        if not full:
+            logging.info(f"[{domain.upper()}] 无可复用的上一代索引，执行全量构建")
+    incremental = previous_docs is not None
+
+    # 第一阶段：对比文件状态与内容哈希，规划每篇文档是复用还是重新索引
+    planned: dict[str, tuple[dict, str, dict]] = {}
+    skipped_count = 0
+    entry_count = 0
+    for item in index_data:
+        entry_count += 1
+        item = {key: item[key] for key in _INDEX_ITEM_FIELDS if key in item}
+        relative_path = get_physical_path(item, domain)
+        if not relative_path or relative_path in planned:
             skipped_count += 1
             continue
 
-        cleaned_content = clean_markdown(raw_content)
-        if not cleaned_content:
+        md_file = docs_dir / relative_path
+        try:
+            st = md_file.stat()
+        except OSError:
             skipped_count += 1
             continue
 
-        # 截断过长内容
-        if len(cleaned_content) > MAX_CONTENT_LENGTH:
-            cleaned_content = cleaned_content[:MAX_CONTENT_LENGTH]
+        meta_key = _item_meta_key(item)
+        record = {"meta": meta_key, "size": st.st_size, "mtimeNs": st.st_mtime_ns}
+        previous = previous_docs.get(relative_path) if incremental else None
+        reusable = bool(previous) and (
+            relative_path in previous_store or bool(previous.get("skipped")) or bool(previous.get("unstored"))
+        )
+        if reusable and previous.get("meta") == meta_key:
+            if previous.get("size") == st.st_size and previous.get("mtimeNs") == st.st_mtime_ns:
+                planned[relative_path] = (item, "reuse", previous)
+                continue
+            try:
+                content_hash = _content_hash(meta_key, md_file.read_bytes())
+            except OSError as e:
+                logging.warning(f"读取文件失败 {md_file}: {e}")
+                skipped_count += 1
+                continue
+            if previous.get("hash") == content_hash:
+                # 仅 mtime 变化（例如爬虫重写了相同内容）
+                planned[relative_path] = (item, "reuse", {**previous, **record})
+                continue
+        planned[relative_path] = (item, "index", record)
+
+    index_json_hash = index_json_digest.hexdigest()
+    logging.info(f"[{domain.upper()}] 加载了 {entry_count} 个索引条目")
+
+    removed_paths = [path for path in (previous_docs or {}) if path not in planned]
+    variants_dir = get_doc_variants_dir(domain)
+    if DOC_PRECOMPRESS:
+        _sync_reused_variants(domain, docs_dir, variants_dir, planned, removed_paths)
+    changed_paths = [path for path, (_, action, _) in planned.items() if action == "index"]
+    if incremental and not changed_paths and not removed_paths:
+        logging.info(f"[{domain.upper()}] 文档无变化，沿用当前索引代际 {previous_generation}")
+        return False
+
+    # 新代际写入独立目录，当前索引保持可读
+    build_dir = index_dir / _generation_dir_name(generation)
+    if build_dir.exists():
+        # 上次构建中途失败遗留的目录
+        _remove_tree(build_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    if incremental:
+        _clone_index_files(previous_dir, build_dir)
+
+    schema = build_schema()
+    index = tantivy.Index(schema, path=str(build_dir))
 
-        logical_path = relative_path
-        try:
-            doc_id_val = int(item_id) if item_id is not None else 0
-        except (ValueError, TypeError):
-            # Generate unique fallback ID to avoid duplicates
-            doc_id_val = int(uuid.uuid4().int % (2**32))
-            logging.warning(f"无法解析 item_id '{item_id}'，使用回退 ID {doc_id_val} (文档: {relative_path})")
+    # 分配 256MB heap 给 writer
+    writer = index.writer(heap_size=256 * 1024 * 1024)
+    # 原文与行偏移表随索引一起落盘，供 search_docs 提取片段
+    store_writer = ContentStoreWriter(build_dir)
 
+    indexed_count = 0
+    reused_count = 0
+    error_count = 0
+    next_docs: dict[str, dict] = {}
+
+    # 第二阶段：删除变化/移除的文档，复制未变化文档的内容存储，重新索引变化文档
+    for relative_path in removed_paths:
+        writer.delete_documents("path", relative_path)
+
+    tasks: list[tuple[dict, str, str, str | None]] = []
+    for relative_path, (item, action, record) in planned.items():
+        if action == "reuse":
+            if relative_path in previous_store:
+                store_writer.copy_from(previous_store, relative_path)
+            next_docs[relative_path] = record
+            if record.get("skipped"):
+                skipped_count += 1
+            else:
+                reused_count += 1
+            continue
+        if incremental and relative_path in previous_docs:
+            writer.delete_documents("path", relative_path)
+        variant_base = str(variants_dir / relative_path) if DOC_PRECOMPRESS else None
+        tasks.append((item, relative_path, str(docs_dir / relative_path), variant_base))
+
+    # 工作进程并行完成读取/清洗/bigram，主线程按顺序把结果喂给 writer
+    started_at = time.perf_counter()
+    bytes_read = 0
+    for prepared in _iter_prepared_documents(tasks, workers):
+        relative_path = prepared["path"]
+        bytes_read += prepared["bytes"]
+        if "warning" in prepared:
+            logging.warning(prepared["warning"])
+        record = planned[relative_path][2]
+        if "error" in prepared:
+            logging.warning(prepared["error"])
+            error_count += 1
+            next_docs[relative_path] = {**record, "skipped": "error"}
+            continue
+        fields = prepared.get("fields")
+        if fields is None:
+            skipped_count += 1
+            next_docs[relative_path] = {**record, "hash": prepared["hash"], "skipped": "empty"}
+            continue
+        if fields["_doc_id_fallback"]:
+            logging.warning(
+                f"无法解析 item_id '{planned[relative_path][0].get('id')}'，"
+                f"使用回退 ID {fields['doc_id']} (文档: {relative_path})"
+            )
         try:
-            doc = tantivy.Document()
-            normalized_name = prepare_text_for_index(item_name.replace("-", " "))
-            normalized_content = prepare_text_for_index(cleaned_content)
-            normalized_name_cjk2 = prepare_cjk2_text_for_index(item_name.replace("-", " "))
-            normalized_content_cjk2 = prepare_cjk2_text_for_index(cleaned_content)
-            normalized_path_terms = prepare_path_terms_for_index(relative_path)
-            normalized_path_terms_cjk2 = prepare_cjk2_text_for_index(normalized_path_terms)
-            doc.add_text("name", normalized_name)
-            doc.add_text("name_cjk2", normalized_name_cjk2)
-            doc.add_text("name_raw", str(item_name or "").strip().lower())
-            doc.add_text("name_display", str(item_name or "").strip())
-            doc.add_text("content", normalized_content)
-            doc.add_text("content_cjk2", normalized_content_cjk2)
-            doc.add_text("path_terms", normalized_path_terms)
-            doc.add_text("path_terms_cjk2", normalized_path_terms_cjk2)
-            doc.add_text("path", logical_path)
-            doc.add_text("physical_path", relative_path)
-            doc.add_text("category", item_category)
-            doc.add_text("doc_type", item_type)
-            doc.add_unsigned("doc_id", doc_id_val)
-            writer.add_document(doc)
-            indexed_count += 1
+            writer.add_document(_document_from_fields(fields))
         except Exception as e:
             logging.warning(f"索引文档失败 {relative_path}: {e}")
             error_count += 1
+            next_docs[relative_path] = {**record, "hash": prepared["hash"], "skipped": "error"}
+            continue
+        if prepared["store"] is not None:
+            store_writer.add_prepared(relative_path, prepared["store"])
+        else:
+            logging.warning(f"内容存储跳过行数不一致的文档: {relative_path}")
+            record["unstored"] = True
+        record["hash"] = prepared["hash"]
+        record["docId"] = fields["doc_id"]
+        next_docs[relative_path] = record
+        indexed_count += 1
+    elapsed = max(time.perf_counter() - started_at, 1e-6)
 
     writer.commit()
-    index.reload()
+    writer.wait_merging_threads()
+    store_writer.close()
+    _write_docs_manifest(build_dir, next_docs, index_json_hash)
+
+    doc_count = _indexed_doc_count(next_docs)
+    failure = _validate_generation(build_dir, doc_count, _validation_samples(next_docs))
+    if failure is None and doc_count == 0 and int(previous_manifest.get("docCount", 0) or 0) > 0:
+        failure = "新索引为空，拒绝替换已有索引"
+    if failure:
+        logging.error(f"[{domain.upper()}] 新索引校验失败，保留当前索引: {failure}")
+        _remove_tree(build_dir)
+        return False
+
+    _publish_generation(domain, build_dir, generation, doc_count, "incremental" if incremental else "full")
+    if DOC_PRECOMPRESS and not incremental:
+        pruned = prune_doc_variants(variants_dir, set(next_docs))
+        if pruned:
+            logging.info(f"[{domain.upper()}] 清理过期预压缩变体 {pruned} 个")
 
     logging.info(
-        f"[{domain.upper()}] 索引构建完成: "
-        f"已索引 {indexed_count}, 跳过 {skipped_count}, 失败 {error_count}"
+        f"[{domain.upper()}] 索引构建完成（{'增量' if incremental else '全量'}）: "
+        f"已索引 {indexed_count}, 复用 {reused_count}, 删除 {len(removed_paths)}, "
+        f"跳过 {skipped_count}, 失败 {error_count}, 代际 {generation}"
+    )
+    logging.info(
+        f"[{domain.upper()}] 预处理吞吐（{workers} 进程）: {len(tasks)} 篇 / {elapsed:.2f}s = "
+        f"{len(tasks) / elapsed:.1f} docs/s, {bytes_read / elapsed / (1024 * 1024):.2f} MB/s"
     )
+    return True
+
+
+def read_segment_stats(index_dir: Path) -> dict:
+    """从 Tantivy meta.json 读取段统计：段数、文档数（含已删除）、已删除文档数与目录大小。"""
+    stats = {"segments": 0, "maxDoc": 0, "deletedDocs": 0, "sizeBytes": 0}
+    try:
+        meta = json.loads((index_dir / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return stats
+    for segment in meta.get("segments") or []:
+        stats["segments"] += 1
+        stats["maxDoc"] += int(segment.get("max_doc", 0) or 0)
+        deletes = segment.get("deletes") or {}
+        stats["deletedDocs"] += int(deletes.get("num_deleted_docs", 0) or 0)
+    stats["sizeBytes"] = sum(entry.stat().st_size for entry in index_dir.iterdir() if entry.is_file())
+    return stats
+
+
+def _needs_compaction(stats: dict) -> bool:
+    if stats["segments"] > INDEX_COMPACT_SEGMENT_THRESHOLD:
+        return True
+    return stats["maxDoc"] > 0 and stats["deletedDocs"] / stats["maxDoc"] > INDEX_COMPACT_DELETED_RATIO
+
+
+def compact_index_for_domain(domain: str, force: bool = False) -> dict:
+    """整理当前代际：段数超过阈值或已删除文档占比过高（或 force）时重写为新的紧凑代际。
+
+    这不是段合并：tantivy-py 未暴露合并接口，整理在当前线程内对每篇文档重新做一遍完整预处理
+    （清洗、bigram、名称特征），再用单个 writer 写入新代际并复制内容存储，代价与单进程全量构建的
+    预处理相当。原文只取自当前代际的内容存储，不读取磁盘上的 Markdown，因此不会把磁盘上的新内容
+    混入旧的清单记录；不在内容存储中的文档（unstored）从新代际中略去并移出清单，由下一次增量构建
+    按新文档重新索引。非 force 时文档数超过 INDEX_COMPACT_MAX_DOCS 不整理。
+    与构建共用域锁，发布流程与校验同构建一致。返回包含整理前后段数与大小的报告。
+    """
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(domain, threading.Lock())
+    with lock:
+        return _compact_generation(domain, force)
+
+
+def _compact_generation(domain: str, force: bool) -> dict:
+    manifest = read_index_manifest(domain)
+    active_dir = resolve_active_index_dir(domain, manifest)
+    report: dict = {"domain": domain, "compacted": False}
+    if active_dir is None:
+        report["message"] = "索引不存在"
+        return report
+
+    before = read_segment_stats(active_dir)
+    report["before"] = {"generation": int(manifest.get("generation", 0) or 0), **before}
+    if not force and not _needs_compaction(before):
+        report["message"] = "段数与已删除文档占比均未超过阈值，无需整理"
+        return report
+    doc_count_before = int(manifest.get("docCount", 0) or 0)
+    if not force and INDEX_COMPACT_MAX_DOCS and doc_count_before > INDEX_COMPACT_MAX_DOCS:
+        report["message"] = (
+            f"文档数 {doc_count_before} 超过 INDEX_COMPACT_MAX_DOCS={INDEX_COMPACT_MAX_DOCS}，"
+            "不自动整理；请手动执行 indexer.py --compact --full 或全量重建"
+        )
+        return report
+
+    payload = _read_docs_manifest_payload(active_dir)
+    store = ContentStore.open(active_dir) if payload is not None else None
+    if store is None:
+        report["message"] = "当前代际缺少文档清单或内容存储，请先执行一次全量重建"
+        return report
+
+    started_at = time.perf_counter()
+    generation = int(manifest.get("generation", 0) or 0) + 1
+    build_dir = get_index_dir(domain) / _generation_dir_name(generation)
+    if build_dir.exists():
+        _remove_tree(build_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+
+    index = tantivy.Index(build_schema(), path=str(build_dir))
+    writer = index.writer(heap_size=256 * 1024 * 1024)
+    store_writer = ContentStoreWriter(build_dir)
+    next_docs: dict[str, dict] = {}
+    dropped = 0
+    for relative_path, record in payload["docs"].items():
+        if record.get("skipped"):
+            # 未进入索引的文档只沿用清单记录
+            next_docs[relative_path] = record
+            continue
+        doc_id, name, doc_type, category = (list(record.get("meta") or []) + [None] * 4)[:4]
+        item = {"id": doc_id, "name": name or "", "type": doc_type or "", "category": category or ""}
+        if relative_path not in store:
+            # 原文不在内容存储中（极少见）：不读磁盘，略去并移出清单，下次增量构建重新索引
+            logging.warning(f"整理略去不在内容存储中的文档: {relative_path}")
+            dropped += 1
+            continue
+        try:
+            raw_content = store.read_text(relative_path)
+        except OSError as e:
+            logging.warning(f"读取内容存储失败 {relative_path}: {e}")
+            dropped += 1
+            continue
+        fields = _prepare_document_fields(item, relative_path, raw_content)
+        if fields is None:
+            dropped += 1
+            continue
+        if record.get("docId") is not None:
+            # 沿用原 doc_id（回退 ID 为随机值，不能重新生成）
+            fields["doc_id"] = int(record["docId"])
+        writer.add_document(_document_from_fields(fields))
+        store_writer.copy_from(store, relative_path)
+        next_docs[relative_path] = record
+    writer.commit()
+    writer.wait_merging_threads()
+    store_writer.close()
+    _write_docs_manifest(build_dir, next_docs, payload.get("indexJsonHash", ""))
+
+    doc_count = _indexed_doc_count(next_docs)
+    failure = _validate_generation(build_dir, doc_count, _validation_samples(next_docs))
+    if failure is None and "docCount" in manifest and doc_count + dropped != doc_count_before:
+        failure = f"文档数与当前代际不一致: {doc_count} + 略去 {dropped} != {doc_count_before}"
+    if failure:
+        logging.error(f"[{domain.upper()}] 整理后的索引校验失败，保留当前索引: {failure}")
+        _remove_tree(build_dir)
+        report["message"] = failure
+        return report
+
+    after = read_segment_stats(build_dir)
+    _publish_generation(domain, build_dir, generation, doc_count, "compact")
+    report.update({
+        "compacted": True,
+        "dropped": dropped,
+        "after": {"generation": generation, **after},
+        "seconds": round(time.perf_counter() - started_at, 3),
+    })
+    logging.info(
+        f"[{domain.upper()}] 索引整理完成: 段 {before['segments']} -> {after['segments']}, "
+        f"已删除文档 {before['deletedDocs']} -> {after['deletedDocs']}, "
+        f"大小 {before['sizeBytes'] / 1048576:.1f}MB -> {after['sizeBytes'] / 1048576:.1f}MB, 代际 {generation}"
+    )
+    return report
 
 
 def main():
-    domains = []
-    if len(sys.argv) > 1:
-        for arg in sys.argv[1:]:
-            if arg.lower() in SUPPORTED_DOMAINS:
-                domains.append(arg.lower())
+    parser = argparse.ArgumentParser(description="构建 Tantivy 搜索索引")
+    parser.add_argument("domains", nargs="*", help=f"要构建的域（默认全部）：{', '.join(SUPPORTED_DOMAINS)}")
+    parser.add_argument("--full", action="store_true", help="忽略上一代索引，全量重建")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=INDEX_WORKERS,
+        help=f"文档预处理进程数（默认 {INDEX_WORKERS}，1 表示单进程）",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="不重建，改为整理当前代际（单线程重新预处理全部文档，清除已删除文档）；与 --full 同用时表示强制整理",
+    )
+    args = parser.parse_args()
+
+    if args.domains:
+        domains = [arg.lower() for arg in args.domains if arg.lower() in SUPPORTED_DOMAINS]
     else:
         domains = list(SUPPORTED_DOMAINS)
 
@@ -277,13 +964,19 @@ def main():
         logging.error(f"未指定有效的域。可用: {', '.join(SUPPORTED_DOMAINS)}")
         sys.exit(1)
 
+    if args.compact:
+        for domain in domains:
+            report = compact_index_for_domain(domain, force=args.full)
+            logging.info(json.dumps(report, ensure_ascii=False))
+        return
+
     logging.info(f"将为以下域构建索引: {', '.join(d.upper() for d in domains)}")
 
     for domain in domains:
         logging.info(f"\n{'='*50}")
         logging.info(f"开始构建 {domain.upper()} 索引")
         logging.info(f"{'='*50}")
-        build_index_for_domain(domain)
+        build_index_for_domain(domain, full=args.full, workers=args.workers)
 
     logging.info("所有索引构建完成！")
 
@@ -1,35 +1,32 @@
 """链接匹配服务：根据文件标题返回最可能的 wiki 链接"""
 
+import heapq
 import json
 import logging
 import re
 import threading
+import time
+from array import array
 from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 from urllib.parse import unquote
 
 try:
-    from config import SUPPORTED_LINK_DOMAINS, get_link_dir
+    from config import LINK_RESCAN_INTERVAL, SUPPORTED_LINK_DOMAINS, get_link_dir
 except ImportError:  # pragma: no cover - 兼容包导入
-    from .config import SUPPORTED_LINK_DOMAINS, get_link_dir
+    from .config import LINK_RESCAN_INTERVAL, SUPPORTED_LINK_DOMAINS, get_link_dir
 
 logger = logging.getLogger(__name__)
 
 _link_cache: dict[str, dict[str, Any]] = {}
 _link_cache_lock = threading.RLock()
+_CATEGORIES_FILE = "categories.json"
 
-
-def _compute_dir_mtime(root_dir: Path) -> float:
-    latest = root_dir.stat().st_mtime
-    for entry in root_dir.rglob("*.json"):
-        try:
-            mtime = entry.stat().st_mtime
-        except FileNotFoundError:
-            continue
-        if mtime > latest:
-            latest = mtime
-    return latest
+# 得分上界（见 _score_forms）：query_plain 不是 name_plain 的子串时，前缀/包含/全等各项均不成立，
+# 最多拿到去括号后缀相等的 90 分与相似度的 20 分；连去括号后缀也不相等时只剩相似度的 20 分。
+_MAX_SCORE_WITHOUT_SUBSTRING = 90.0 + 20.0
+_MAX_SCORE_WITHOUT_MATCH = 20.0
 
 
 def _normalize_text(value: str) -> str:
@@ -76,15 +73,89 @@ def _extract_lookup_title(raw_title: str) -> str:
     return title.strip()
 
 
-def _build_domain_entries(domain: str) -> list[dict[str, str]]:
-    link_dir = get_link_dir(domain)
-    if not link_dir.exists():
-        logger.warning("链接目录不存在: %s", link_dir)
-        return []
-
-    entries: list[dict[str, str]] = []
+def _name_forms(value: str) -> tuple[str, str, str]:
+    """名称的三种比较形式：规范化、折叠（仅保留字词字符）、去括号后缀再折叠。"""
+    norm = _normalize_text(value)
+    return norm, _collapse_text(norm), _collapse_text(_strip_bracket_suffix(norm))
+
+
+def _iter_grams(plain: str) -> set[str]:
+    """折叠名称的单字与相邻二元组，用于子串候选召回。"""
+    grams = set(plain)
+    grams.update(plain[i:i + 2] for i in range(len(plain) - 1))
+    return grams
+
+
+class _LinkIndex:
+    """域内链接条目与候选索引。
+
+    条目以平行数组存放（id、名称、url 及名称的三种比较形式，均在加载时一次算好），
+    另建去括号后缀形式的精确映射与折叠形式的单字/二元组倒排表（倒排表为 array('I')）；
+    查询时先召回可能达到 min_score 的候选，再只对候选做完整打分（含 SequenceMatcher）。
+    """
+
+    __slots__ = ("ids", "names", "urls", "norms", "plains", "strippeds", "by_stripped", "grams")
+
+    def __init__(self, entries: Iterable[tuple[str, str, str]]) -> None:
+        self.ids: list[str] = []
+        self.names: list[str] = []
+        self.urls: list[str] = []
+        self.norms: list[str] = []
+        self.plains: list[str] = []
+        self.strippeds: list[str] = []
+        by_stripped: dict[str, list[int]] = {}
+        grams: dict[str, list[int]] = {}
+        for idx, (entry_id, name, url) in enumerate(entries):
+            norm, plain, stripped = _name_forms(name)
+            self.ids.append(entry_id)
+            self.names.append(name)
+            self.urls.append(url)
+            self.norms.append(norm)
+            self.plains.append(plain)
+            self.strippeds.append(stripped)
+            if stripped:
+                by_stripped.setdefault(stripped, []).append(idx)
+            for gram in _iter_grams(plain):
+                grams.setdefault(gram, []).append(idx)
+        self.by_stripped = {key: array("I", posting) for key, posting in by_stripped.items()}
+        self.grams = {key: array("I", posting) for key, posting in grams.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def forms(self, idx: int) -> tuple[str, str, str]:
+        return self.norms[idx], self.plains[idx], self.strippeds[idx]
+
+    def candidates(self, query_plain: str, query_stripped: str, min_score: float) -> list[int]:
+        """可能达到 min_score 的条目下标（升序）；阈值过低无法剪枝时返回全部条目。"""
+        if min_score <= _MAX_SCORE_WITHOUT_MATCH or not query_plain:
+            return list(range(len(self.ids)))
+
+        if len(query_plain) == 1:
+            found = set(self.grams.get(query_plain, ()))
+        else:
+            postings = sorted(
+                (self.grams.get(query_plain[i:i + 2], ()) for i in range(len(query_plain) - 1)),
+                key=len,
+            )
+            found = set(postings[0])
+            for posting in postings[1:]:
+                if not found:
+                    break
+                found.intersection_update(posting)
+            # 二元组全部命中不代表连续出现，按子串再确认一次
+            plains = self.plains
+            found = {idx for idx in found if query_plain in plains[idx]}
+
+        if min_score <= _MAX_SCORE_WITHOUT_SUBSTRING and query_stripped:
+            found.update(self.by_stripped.get(query_stripped, ()))
+        return sorted(found)
+
+
+def _iter_domain_entries(link_dir: Path) -> Iterator[tuple[str, str, str]]:
+    """逐条产出链接文件中的 (id, name, url)。"""
     for file_path in sorted(link_dir.glob("*.json")):
-        if file_path.name == "categories.json":
+        if file_path.name == _CATEGORIES_FILE:
             continue
         try:
             payload = json.loads(file_path.read_text(encoding="utf-8"))
@@ -102,49 +173,84 @@ def _build_domain_entries(domain: str) -> list[dict[str, str]]:
             url = str(item.get("url", "")).strip()
             if not name or not url:
                 continue
-            entries.append(
-                {
-                    "id": str(item.get("id", "")).strip(),
-                    "name": name,
-                    "url": url,
-                }
-            )
-    return entries
+            yield str(item.get("id", "")).strip(), name, url
+
+
+def _quick_signature(link_dir: Path) -> tuple:
+    """O(1) 的变更签名：目录自身的 mtime（文件增删/原子替换）与 categories.json 的状态。
+
+    generate_links 每轮最后写入 categories.json，可视作链接库的代际标记。
+    """
+    try:
+        categories = (link_dir / _CATEGORIES_FILE).stat()
+        categories_sig = (categories.st_mtime_ns, categories.st_size)
+    except OSError:
+        categories_sig = None
+    return link_dir.stat().st_mtime_ns, categories_sig
 
 
-def _get_domain_entries(domain: str) -> list[dict[str, str]]:
+def _full_signature(link_dir: Path) -> tuple:
+    """逐个 stat 链接文件的完整签名，用于发现原地改写单个文件（按 LINK_RESCAN_INTERVAL 节流）。"""
+    signature = []
+    for entry in sorted(link_dir.glob("*.json")):
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        signature.append((entry.name, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _get_domain_index(domain: str) -> _LinkIndex | None:
     link_dir = get_link_dir(domain)
-    if not link_dir.exists():
-        return []
+    try:
+        quick = _quick_signature(link_dir)
+    except OSError:
+        return None
 
-    current_mtime = _compute_dir_mtime(link_dir)
+    now = time.monotonic()
     with _link_cache_lock:
         cached = _link_cache.get(domain)
-        if cached:
-            cached_mtime = cached.get("mtime")
-            cached_entries = cached.get("entries")
-            if isinstance(cached_mtime, (int, float)) and cached_mtime >= current_mtime and isinstance(cached_entries, list):
-                return cached_entries
+        if cached and cached["quick"] == quick:
+            if LINK_RESCAN_INTERVAL <= 0 or now - cached["checked_at"] < LINK_RESCAN_INTERVAL:
+                return cached["index"]
+            full = _full_signature(link_dir)
+            cached["checked_at"] = now
+            if full == cached["full"]:
+                return cached["index"]
+        else:
+            full = _full_signature(link_dir)
+
+        started_at = time.perf_counter()
+        index = _LinkIndex(_iter_domain_entries(link_dir))
+        _link_cache[domain] = {"quick": quick, "full": full, "checked_at": now, "index": index}
+        logger.info(
+            "域 %s 链接库已加载: %d 条，倒排词条 %d，耗时 %.2fs",
+            domain,
+            len(index),
+            len(index.grams),
+            time.perf_counter() - started_at,
+        )
+        return index
 
-        entries = _build_domain_entries(domain)
-        _link_cache[domain] = {"mtime": current_mtime, "entries": entries}
-        return entries
+
+def invalidate_link_cache(domain: str | None = None) -> None:
+    """丢弃链接库缓存，下次解析时重新加载。"""
+    with _link_cache_lock:
+        if domain is None:
+            _link_cache.clear()
+        else:
+            _link_cache.pop(domain, None)
 
 
-def _score_candidate(query: str, entry_name: str) -> float:
-    query_norm = _normalize_text(query)
-    name_norm = _normalize_text(entry_name)
+def _score_forms(query_forms: tuple[str, str, str], name_forms: tuple[str, str, str]) -> float:
+    query_norm, query_plain, query_stripped = query_forms
+    name_norm, name_plain, name_stripped = name_forms
     if not query_norm or not name_norm:
         return -1.0
-
-    query_plain = _collapse_text(query_norm)
-    name_plain = _collapse_text(name_norm)
     if not query_plain or not name_plain:
         return -1.0
 
-    query_stripped = _collapse_text(_strip_bracket_suffix(query_norm))
-    name_stripped = _collapse_text(_strip_bracket_suffix(name_norm))
-
     score = 0.0
     if name_norm == query_norm:
         score += 100.0
@@ -189,8 +295,8 @@ def resolve_best_link(
             "message": "标题为空或无效",
         }
 
-    entries = _get_domain_entries(domain)
-    if not entries:
+    index = _get_domain_index(domain)
+    if not index:
         return {
             "found": False,
             "domain": domain,
@@ -202,21 +308,25 @@ def resolve_best_link(
     if top_k < 1:
         top_k = 1
 
-    ranked: list[dict[str, Any]] = []
-    for entry in entries:
-        score = _score_candidate(lookup_title, entry["name"])
-        ranked.append(
+    query_forms = _name_forms(lookup_title)
+    threshold = float(min_score)
+    # (-得分, 条目下标)：同分按条目原始顺序，与对全部条目稳定排序的结果一致
+    high_conf: list[tuple[float, int]] = []
+    for idx in index.candidates(query_forms[1], query_forms[2], threshold):
+        score = round(_score_forms(query_forms, index.forms(idx)), 3)
+        if score >= threshold:
+            high_conf.append((-score, idx))
+
+    selected = []
+    for neg_score, idx in heapq.nsmallest(top_k, high_conf):
+        selected.append(
             {
-                "id": entry.get("id", ""),
-                "name": entry.get("name", ""),
-                "url": entry.get("url", ""),
-                "score": round(score, 3),
+                "id": index.ids[idx],
+                "name": index.names[idx],
+                "url": index.urls[idx],
+                "score": -neg_score,
             }
         )
-
-    ranked.sort(key=lambda item: float(item.get("score", 0.0)), reverse=True)
-    high_conf = [item for item in ranked if float(item.get("score", 0.0)) >= float(min_score)]
-    selected = high_conf[:top_k]
     enough = len(selected) >= top_k
 
     if not selected:
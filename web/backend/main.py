@@ -8,28 +8,50 @@ import os
 from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager, suppress
 from typing import Optional
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from config import (
     CORS_ORIGINS,
     SUPPORTED_DOMAINS,
     SUPPORTED_LINK_DOMAINS,
-    get_metadata_dir,
-    get_index_dir,
+    INDEX_WATCH_INTERVAL,
+    INDEX_COMPACT_INTERVAL,
+    SEARCH_BATCH_MAX_QUERIES,
     get_docs_dir,
 )
-from search_service import search_catalog, search_docs, invalidate_index
-from doc_service import read_doc, read_raw_markdown
-from indexer import build_index_for_domain
+from search_service import (
+    search_catalog,
+    search_docs,
+    cached_search_catalog,
+    cached_search_docs,
+    stream_search_docs,
+    search_batch,
+    get_searcher_stats,
+    invalidate_index,
+    refresh_index,
+    start_index_watcher,
+    stop_index_watcher,
+)
+from search_executor import SearchOverloadedError, SearchTimeoutError, search_executor
+from search_cache import search_result_cache
+from doc_service import (
+    get_doc_cache_stats,
+    get_doc_payload,
+    get_raw_doc_lines,
+    get_raw_doc_payload,
+)
+from indexer import build_index_for_domain, compact_index_for_domain, resolve_active_index_dir
 from model_metadata_service import model_metadata_cache
 from world_tree_service import world_tree_memory_service
 from world_tree_graph_service import world_tree_graph_service
 from world_tree_query_service import world_tree_query_service
 from world_tree_import_service import process_import_payload
-from link_service import resolve_best_link
+from link_service import invalidate_link_cache, resolve_best_link
+from catalog_index_service import get_catalog_index_payload
+from http_cache import BROTLI_AVAILABLE, is_not_modified, payload_response, validator_headers
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -40,15 +62,14 @@ APP_TZ = timezone.utc
 def _ensure_indexes() -> None:
     """检查并自动构建缺失的 Tantivy 索引"""
     for domain in SUPPORTED_DOMAINS:
-        index_dir = get_index_dir(domain)
         docs_dir = get_docs_dir(domain)
 
         if not docs_dir.exists():
             logger.info(f"[{domain.upper()}] 文档目录不存在，跳过索引构建")
             continue
 
-        # 索引目录不存在或为空则构建
-        needs_build = not index_dir.exists() or not any(index_dir.iterdir())
+        # 清单未指向可用索引（含旧版原地布局）则构建
+        needs_build = resolve_active_index_dir(domain) is None
         if needs_build:
             logger.info(f"[{domain.upper()}] 索引不存在，开始自动构建...")
             build_index_for_domain(domain)
@@ -68,70 +89,76 @@ def _rebuild_all_domain_indexes() -> None:
     for domain in SUPPORTED_DOMAINS:
         try:
             logger.info(f"[SCHEDULED] 开始重建 {domain.upper()} 索引...")
-            build_index_for_domain(domain)
-            invalidate_index(domain)
-            logger.info(f"[SCHEDULED] {domain.upper()} 索引重建完成。")
+            if build_index_for_domain(domain):
+                refresh_index(domain)
+                logger.info(f"[SCHEDULED] {domain.upper()} 索引重建完成。")
+            else:
+                logger.info(f"[SCHEDULED] {domain.upper()} 文档无变化或新索引未通过校验，继续使用当前代际。")
         except Exception as exc:
             logger.error(f"[SCHEDULED] {domain.upper()} 索引重建失败: {exc}")
 
 
+def _compact_all_domain_indexes() -> None:
+    for domain in SUPPORTED_DOMAINS:
+        try:
+            report = compact_index_for_domain(domain)
+            if report.get("compacted"):
+                refresh_index(domain)
+                logger.info(
+                    f"[SCHEDULED] {domain.upper()} 索引整理完成: 段 "
+                    f"{report['before']['segments']} -> {report['after']['segments']}"
+                )
+        except Exception as exc:
+            logger.error(f"[SCHEDULED] {domain.upper()} 索引整理失败: {exc}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if not BROTLI_AVAILABLE:
+        logger.warning("未安装 brotli，压缩响应与预压缩变体只提供 gzip（安装：uv sync --extra brotli）")
     # 启动时自动构建索引
     _ensure_indexes()
-    world_tree_memory_service.rebuild_index()
-    world_tree_graph_service.rebuild_index()
+    start_index_watcher(INDEX_WATCH_INTERVAL)
 
     stop_event = asyncio.Event()
 
-    async def world_tree_memory_rebuild_loop() -> None:
-        while not stop_event.is_set():
-            try:
-                await asyncio.sleep(60 * 60)
-                world_tree_memory_service.rebuild_index()
-            except asyncio.CancelledError:
-                break
-            except Exception as exc:
-                logger.error("世界树记忆索引定时重建失败: %s", exc)
-
-    async def world_tree_graph_rebuild_loop() -> None:
+    async def docs_rebuild_loop() -> None:
         while not stop_event.is_set():
             try:
-                await asyncio.sleep(60 * 60)
-                world_tree_graph_service.rebuild_index()
+                wait_seconds = _seconds_until_next_4am()
+                await asyncio.sleep(wait_seconds)
+                await asyncio.to_thread(_rebuild_all_domain_indexes)
             except asyncio.CancelledError:
                 break
             except Exception as exc:
-                logger.error("世界树图谱索引定时重建失败: %s", exc)
+                logger.error("文档索引定时重建失败: %s", exc)
 
-    async def docs_rebuild_loop() -> None:
+    async def index_compact_loop() -> None:
         while not stop_event.is_set():
             try:
-                wait_seconds = _seconds_until_next_4am()
-                await asyncio.sleep(wait_seconds)
-                _rebuild_all_domain_indexes()
+                await asyncio.sleep(INDEX_COMPACT_INTERVAL)
+                await asyncio.to_thread(_compact_all_domain_indexes)
             except asyncio.CancelledError:
                 break
             except Exception as exc:
-                logger.error("文档索引定时重建失败: %s", exc)
+                logger.error("索引定时整理失败: %s", exc)
 
-    world_tree_memory_task = asyncio.create_task(world_tree_memory_rebuild_loop())
-    world_tree_graph_task = asyncio.create_task(world_tree_graph_rebuild_loop())
     docs_task = asyncio.create_task(docs_rebuild_loop())
+    compact_task = asyncio.create_task(index_compact_loop()) if INDEX_COMPACT_INTERVAL > 0 else None
 
     try:
         yield
     finally:
         stop_event.set()
-        world_tree_memory_task.cancel()
-        world_tree_graph_task.cancel()
+        stop_index_watcher()
+        search_executor.shutdown()
         docs_task.cancel()
-        with suppress(asyncio.CancelledError):
-            await world_tree_memory_task
-        with suppress(asyncio.CancelledError):
-            await world_tree_graph_task
         with suppress(asyncio.CancelledError):
             await docs_task
+        if compact_task is not None:
+            compact_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await compact_task
 
 
 app = FastAPI(title="Story Search API", version="1.0.0", lifespan=lifespan)
@@ -143,6 +170,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "Content-Range", "X-Total-Lines", "X-Line-Range"],
 )
 
 
@@ -157,8 +185,18 @@ def _require_localhost(request: Request) -> None:
         raise HTTPException(status_code=403, detail="调试命令仅允许本机访问")
 
 
+async def _dispatch(domain: str, func, *args, **kwargs):
+    """经搜索执行层在线程池中运行同步函数，过载返回 503，超时返回 504。"""
+    try:
+        return await search_executor.run(domain, func, *args, **kwargs)
+    except SearchOverloadedError as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+    except SearchTimeoutError as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+
+
 class LocalDebugCommand(BaseModel):
-    action: str = Field(..., description="search_catalog|search_docs|rebuild_index|invalidate_index|resolve_link")
+    action: str = Field(..., description="search_catalog|search_docs|rebuild_index|compact_index|invalidate_index|resolve_link")
     domain: str = Field(..., description="gi|hsr|zzz")
     query: Optional[str] = None
     path: Optional[str] = None
@@ -166,20 +204,34 @@ class LocalDebugCommand(BaseModel):
     generateSummary: bool = False
     topK: int = Field(default=3, ge=1, le=20)
     minScore: float = Field(default=100.0, ge=0.0, le=1000.0)
+    full: bool = Field(default=False, description="rebuild_index 时忽略上一代索引全量重建")
+    force: bool = Field(default=False, description="compact_index 时忽略阈值强制整理")
+
+
+class BatchSearchItem(BaseModel):
+    id: Optional[str] = Field(default=None, description="调用方自定义标识，原样回显")
+    mode: str = Field(default="catalog", pattern="^(catalog|docs)$")
+    query: str = Field(..., min_length=1)
+    path: Optional[str] = None
+    maxResults: int = Field(default=50, ge=1, le=200)
+    generateSummary: bool = True
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchSearchItem] = Field(..., min_length=1, max_length=SEARCH_BATCH_MAX_QUERIES)
+    cache: bool = Field(default=True, description="false 时跳过结果缓存")
 
 
 @app.get("/api/{domain}/index")
-async def get_index(domain: str):
-    """获取目录索引"""
+async def get_index(domain: str, request: Request):
+    """获取目录索引（预序列化缓存，支持 If-None-Match 与 gzip/br 压缩）"""
     _validate_domain(domain)
 
-    index_path = get_metadata_dir(domain) / "index.json"
-    if not index_path.exists():
+    try:
+        payload = await asyncio.to_thread(get_catalog_index_payload, domain)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="索引文件不存在")
-
-    with open(index_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return payload_response(request, payload, "application/json")
 
 
 @app.get("/api/{domain}/search")
@@ -190,6 +242,7 @@ async def api_search(
     maxResults: int = Query(50, ge=1, le=200),
     generateSummary: bool = Query(True),
     mode: str = Query("catalog", pattern="^(catalog|docs)$"),
+    cache: bool = Query(True, description="false 时跳过结果缓存，直接查询索引"),
 ):
     """搜索文档
 
@@ -199,51 +252,157 @@ async def api_search(
     _validate_domain(domain)
 
     if mode == "catalog":
-        results = search_catalog(domain, query, max_results=maxResults)
+        results = await _dispatch(
+            domain,
+            cached_search_catalog,
+            domain,
+            query,
+            max_results=maxResults,
+            use_cache=cache,
+        )
         return {"results": results, "total": len(results), "query": query}
     else:
-        result = search_docs(
+        result = await _dispatch(
+            domain,
+            cached_search_docs,
             domain,
             query,
             doc_path=path,
             max_results=maxResults,
             generate_summary=generateSummary,
+            use_cache=cache,
         )
         return result
 
 
+@app.post("/api/{domain}/search/batch")
+async def api_search_batch(domain: str, request: BatchSearchRequest):
+    """批量搜索：多条查询共享同一索引快照并行执行，结果按输入顺序返回。"""
+    _validate_domain(domain)
+    return await _dispatch(
+        domain,
+        search_batch,
+        domain,
+        [item.model_dump() for item in request.queries],
+        use_cache=request.cache,
+    )
+
+
+def _encode_stream_frame(frame: dict, fmt: str) -> str:
+    payload = json.dumps(frame, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {frame.get('type', 'message')}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@app.get("/api/{domain}/search/stream")
+async def api_search_stream(
+    domain: str,
+    query: str = Query(..., min_length=1),
+    path: Optional[str] = Query(None),
+    maxResults: int = Query(50, ge=1, le=200),
+    generateSummary: bool = Query(True),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+):
+    """流式深度文档搜索（docs 模式）
+
+    每个结果完成片段提取后立即输出一帧（type=result，检索顺序），
+    最后一帧 type=summary 携带 total、message 与最终排序 ranking。
+    format=ndjson 每行一个 JSON；format=sse 为 Server-Sent Events。
+    """
+    _validate_domain(domain)
+
+    frames = stream_search_docs(
+        domain,
+        query,
+        doc_path=path,
+        max_results=maxResults,
+        generate_summary=generateSummary,
+    )
+    done = object()
+    # 首帧经 _dispatch 取得：过载/超时仍以 503/504 响应，而不是开始一个空的流
+    first = await _dispatch(domain, next, frames, done)
+
+    async def _body():
+        frame = first
+        try:
+            while frame is not done:
+                yield _encode_stream_frame(frame, format)
+                # 每一帧都在搜索线程池中推进，受同样的并发与超时限制
+                frame = await search_executor.run(domain, next, frames, done)
+        except (SearchOverloadedError, SearchTimeoutError) as exc:
+            yield _encode_stream_frame({"type": "error", "message": str(exc)}, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/{domain}/doc")
 async def api_read_doc(
+    request: Request,
     domain: str,
     path: str = Query(...),
     line_range: list[str] = Query(default=[]),
     preserve_markdown: bool = Query(False),
 ):
-    """读取文档内容"""
+    """读取文档内容（带 ETag，文档未变化时返回 304；响应较大时按 Accept-Encoding 压缩）"""
     _validate_domain(domain)
 
-    line_ranges = line_range
-    result = read_doc(domain, path, line_ranges=line_ranges, preserve_markdown=preserve_markdown)
-
-    if "error" in result:
-        raise HTTPException(status_code=404, detail=result["error"])
+    # 一次进入执行层：先按文档 mtime/大小判断条件请求（命中时不生成内容），否则取缓存的已编码响应
+    try:
+        etag, last_modified, payload = await _dispatch(
+            domain,
+            get_doc_payload,
+            domain,
+            path,
+            line_range,
+            preserve_markdown,
+            lambda etag, last_modified: is_not_modified(request, etag, last_modified),
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (OSError, UnicodeError) as e:
+        logger.error("读取文档失败: domain=%s path=%s err=%s", domain, path, e)
+        raise HTTPException(status_code=404, detail="读取失败")
 
-    return result
+    if payload is None:
+        return Response(status_code=304, headers=validator_headers(etag, last_modified))
+    return payload_response(request, payload, "application/json")
 
 
 @app.get("/api/{domain}/doc/raw")
 async def api_read_raw_doc(
+    request: Request,
     domain: str,
     path: str = Query(...),
+    lines: Optional[str] = Query(None),
 ):
-    """读取原始 Markdown 内容"""
+    """读取原始 Markdown 内容
+
+    - 带 ETag/Last-Modified，If-None-Match 命中时返回 304
+    - 支持单段 `Range: bytes=...`（206）；`lines=起-止` 按行截取，响应头 X-Total-Lines 给出总行数
+    - 完整响应优先返回构建索引时生成的 gzip/br 预压缩变体
+    """
     _validate_domain(domain)
 
+    media_type = "text/markdown; charset=utf-8"
     try:
-        content = read_raw_markdown(domain, path)
-        return PlainTextResponse(content, media_type="text/markdown; charset=utf-8")
+        if lines is None:
+            payload = await _dispatch(domain, get_raw_doc_payload, domain, path)
+            return payload_response(request, payload, media_type, byte_ranges=True)
+        payload, headers = await _dispatch(domain, get_raw_doc_lines, domain, path, lines)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if payload is None:
+        return Response(status_code=416, headers=headers)
+    return payload_response(request, payload, media_type, headers=headers)
 
 
 @app.get("/health")
@@ -251,6 +410,27 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/debug/search-metrics")
+async def search_metrics(request: Request):
+    """搜索执行层指标：排队深度、等待耗时、拒绝与超时次数，以及各域常驻 searcher 状态。"""
+    _require_localhost(request)
+    return {**search_executor.stats(), "searchers": get_searcher_stats()}
+
+
+@app.get("/api/debug/search-cache")
+async def search_cache_stats(request: Request):
+    """搜索结果缓存指标：命中/未命中、条目数与占用字节。"""
+    _require_localhost(request)
+    return search_result_cache.stats()
+
+
+@app.get("/api/debug/doc-cache")
+async def doc_cache_stats(request: Request):
+    """文档读取缓存指标：条目数、占用字节与命中次数。"""
+    _require_localhost(request)
+    return get_doc_cache_stats()
+
+
 @app.post("/api/debug/local-command")
 async def local_debug_command(request: Request, cmd: LocalDebugCommand):
     """仅本机可调用的后端调试命令。"""
@@ -262,7 +442,9 @@ async def local_debug_command(request: Request, cmd: LocalDebugCommand):
     if action == "search_catalog":
         if not cmd.query:
             raise HTTPException(status_code=400, detail="search_catalog 需要 query")
-        results = search_catalog(
+        results = await _dispatch(
+            cmd.domain,
+            search_catalog,
             cmd.domain,
             cmd.query,
             max_results=cmd.maxResults,
@@ -272,7 +454,9 @@ async def local_debug_command(request: Request, cmd: LocalDebugCommand):
     if action == "search_docs":
         if not cmd.query:
             raise HTTPException(status_code=400, detail="search_docs 需要 query")
-        result = search_docs(
+        result = await _dispatch(
+            cmd.domain,
+            search_docs,
             cmd.domain,
             cmd.query,
             doc_path=cmd.path,
@@ -282,12 +466,23 @@ async def local_debug_command(request: Request, cmd: LocalDebugCommand):
         return {"ok": True, "action": action, "result": result}
 
     if action == "rebuild_index":
-        build_index_for_domain(cmd.domain)
-        invalidate_index(cmd.domain)
+        # 重建耗时较长，放到独立线程执行，不占用搜索线程池
+        published = await asyncio.to_thread(build_index_for_domain, cmd.domain, cmd.full)
+        if not published:
+            return {"ok": True, "action": action, "message": f"{cmd.domain} 文档无变化或新索引未通过校验，继续使用当前索引"}
+        await asyncio.to_thread(refresh_index, cmd.domain)
         return {"ok": True, "action": action, "message": f"{cmd.domain} 索引已重建并刷新缓存"}
 
+    if action == "compact_index":
+        # 与重建一样在独立线程执行，返回整理前后的段数与大小
+        report = await asyncio.to_thread(compact_index_for_domain, cmd.domain, cmd.force)
+        if report.get("compacted"):
+            await asyncio.to_thread(refresh_index, cmd.domain)
+        return {"ok": True, "action": action, "result": report}
+
     if action == "invalidate_index":
         invalidate_index(cmd.domain)
+        invalidate_link_cache(cmd.domain)
         return {"ok": True, "action": action, "message": f"{cmd.domain} 缓存已失效"}
 
     if action == "resolve_link":
@@ -295,7 +490,9 @@ async def local_debug_command(request: Request, cmd: LocalDebugCommand):
             raise HTTPException(status_code=400, detail="resolve_link 需要 query（文件标题）")
         if cmd.domain not in SUPPORTED_LINK_DOMAINS:
             raise HTTPException(status_code=400, detail=f"resolve_link 仅支持 {', '.join(SUPPORTED_LINK_DOMAINS)}")
-        result = resolve_best_link(
+        result = await _dispatch(
+            cmd.domain,
+            resolve_best_link,
             cmd.domain,
             cmd.query,
             top_k=cmd.topK,
@@ -315,7 +512,7 @@ async def api_resolve_link(
 ):
     if domain not in SUPPORTED_LINK_DOMAINS:
         raise HTTPException(status_code=404, detail=f"链接解析仅支持 {', '.join(SUPPORTED_LINK_DOMAINS)}")
-    return resolve_best_link(domain, title, top_k=k, min_score=minScore)
+    return await _dispatch(domain, resolve_best_link, domain, title, top_k=k, min_score=minScore)
 
 
 class ModelMetadataRequest(BaseModel):
@@ -0,0 +1,179 @@
+"""世界树召回的 SQLite FTS5 后端：由触发器维护的全文表，查询在 SQLite 内完成，无需预热
+
+全文表只有一列 terms，内容是 recall_terms 切出的召回词项（空格分隔，含中文双字切片），
+与内存引擎的切分完全一致；FTS5 分词器只按空格切开（下划线视为词内字符、不去变音符），
+不再二次切分。全文表的 rowid 与记录表的 rowid 对应，记录表与标签关联表上的触发器在写入、
+改写标签与删除时同步更新对应行；触发器通过每个连接注册的 SQL 函数 wt_recall_terms 计算词项。
+打分使用 FTS5 内置 bm25()（k1=1.2，b=0.75），同分按 updated_at 升序。
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+from recall_index import recall_terms
+
+logger = logging.getLogger(__name__)
+
+TERMS_FUNCTION = "wt_recall_terms"
+_TOKENIZE = "unicode61 remove_diacritics 0 tokenchars '_'"
+
+BACKEND_MEMORY = "memory"
+BACKEND_FTS5 = "fts5"
+
+_fts5_available: Optional[bool] = None
+
+
+class FtsSpec(NamedTuple):
+    """一组记录表/标签表对应的全文表命名。"""
+
+    fts_table: str
+    record_table: str
+    map_table: str
+    map_id_column: str
+    tag_table: str
+
+
+def _terms_function(judgment: Optional[str], keywords: Optional[str]) -> str:
+    text = f"{(judgment or '').strip()} {keywords or ''}".strip()
+    return " ".join(recall_terms(text))
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """注册触发器使用的 SQL 函数；启用 FTS5 后端时，每个写连接都必须先注册。"""
+    conn.create_function(TERMS_FUNCTION, 2, _terms_function, deterministic=True)
+
+
+def fts5_available() -> bool:
+    global _fts5_available
+    if _fts5_available is None:
+        try:
+            conn = sqlite3.connect(":memory:")
+            try:
+                conn.execute("CREATE VIRTUAL TABLE probe USING fts5(x)")
+                _fts5_available = True
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            _fts5_available = False
+    return _fts5_available
+
+
+def resolve_backend(configured: str) -> str:
+    """解析召回后端配置；未知取值或当前 SQLite 未编译 FTS5 时退回内存引擎。"""
+    backend = (configured or BACKEND_MEMORY).strip().lower()
+    if backend == BACKEND_FTS5:
+        if fts5_available():
+            return BACKEND_FTS5
+        logger.warning("[WORLD_TREE] 当前 SQLite 不支持 FTS5，召回退回内存引擎")
+    elif backend != BACKEND_MEMORY:
+        logger.warning("[WORLD_TREE] 未知召回后端 %r，使用内存引擎", configured)
+    return BACKEND_MEMORY
+
+
+def _trigger_names(spec: FtsSpec) -> List[str]:
+    return [f"{spec.fts_table}_{suffix}" for suffix in ("ai", "au", "ad", "map_ai", "map_ad")]
+
+
+def _terms_sql(spec: FtsSpec, id_expr: str) -> str:
+    """按记录 id 现查正文与标签计算词项的 SQL 表达式。"""
+    return (
+        f"{TERMS_FUNCTION}("
+        f"(SELECT judgment FROM {spec.record_table} WHERE id = {id_expr}), "
+        f"(SELECT group_concat(t.name, ' ') FROM {spec.map_table} mt "
+        f"JOIN {spec.tag_table} t ON t.id = mt.tag_id WHERE mt.{spec.map_id_column} = {id_expr}))"
+    )
+
+
+def _fts_exists(conn: sqlite3.Connection, spec: FtsSpec) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (spec.fts_table,)).fetchone()
+    return row is not None
+
+
+def rebuild(conn: sqlite3.Connection, spec: FtsSpec) -> int:
+    """清空并按记录表全量重建全文表（首次启用，或 VACUUM 改变了 rowid 之后），返回行数。"""
+    conn.execute(f"DELETE FROM {spec.fts_table}")
+    conn.execute(
+        f"""
+        INSERT INTO {spec.fts_table}(rowid, terms)
+        SELECT r.rowid, {TERMS_FUNCTION}(r.judgment, group_concat(t.name, ' '))
+        FROM {spec.record_table} r
+        LEFT JOIN {spec.map_table} mt ON mt.{spec.map_id_column} = r.id
+        LEFT JOIN {spec.tag_table} t ON t.id = mt.tag_id
+        GROUP BY r.rowid
+        """
+    )
+    row = conn.execute(f"SELECT COUNT(1) FROM {spec.fts_table}").fetchone()
+    return int(row[0]) if row else 0
+
+
+def ensure(conn: sqlite3.Connection, spec: FtsSpec) -> None:
+    """创建全文表与触发器；全文表是新建的则从记录表全量填充。"""
+    created = not _fts_exists(conn, spec)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {spec.fts_table} USING fts5(terms, tokenize = \"{_TOKENIZE}\")")
+    rowid_of = f"(SELECT rowid FROM {spec.record_table} WHERE id = {{}})"
+    statements = [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_ai AFTER INSERT ON {spec.record_table} BEGIN
+            INSERT INTO {spec.fts_table}(rowid, terms) VALUES (new.rowid, {_terms_sql(spec, "new.id")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_au AFTER UPDATE OF judgment ON {spec.record_table} BEGIN
+            UPDATE {spec.fts_table} SET terms = {_terms_sql(spec, "new.id")} WHERE rowid = new.rowid;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_ad AFTER DELETE ON {spec.record_table} BEGIN
+            DELETE FROM {spec.fts_table} WHERE rowid = old.rowid;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_map_ai AFTER INSERT ON {spec.map_table} BEGIN
+            UPDATE {spec.fts_table} SET terms = {_terms_sql(spec, f"new.{spec.map_id_column}")}
+            WHERE rowid = {rowid_of.format(f"new.{spec.map_id_column}")};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_map_ad AFTER DELETE ON {spec.map_table} BEGIN
+            UPDATE {spec.fts_table} SET terms = {_terms_sql(spec, f"old.{spec.map_id_column}")}
+            WHERE rowid = {rowid_of.format(f"old.{spec.map_id_column}")};
+        END
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+    if created:
+        count = rebuild(conn, spec)
+        logger.info("[WORLD_TREE] 全文表 %s 已创建并填充: %s 条记录", spec.fts_table, count)
+
+
+def drop(conn: sqlite3.Connection, spec: FtsSpec) -> None:
+    """切回内存引擎时删除触发器与全文表，之后再启用会重新全量填充，不会读到过期内容。"""
+    for name in _trigger_names(spec):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(f"DROP TABLE IF EXISTS {spec.fts_table}")
+
+
+def search(conn: sqlite3.Connection, spec: FtsSpec, query_terms: List[str], top_k: int) -> List[str]:
+    """按 bm25 返回前 top_k 个记录 id（同分按 updated_at 升序）。"""
+    terms = list(dict.fromkeys(term for term in query_terms if term))
+    if not terms or top_k <= 0:
+        return []
+    # 每个词项作为带引号的短语，OR 连接；词项只含词字符，不会破坏查询语法
+    match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    rows = conn.execute(
+        f"""
+        SELECT r.id
+        FROM {spec.fts_table}
+        JOIN {spec.record_table} r ON r.rowid = {spec.fts_table}.rowid
+        WHERE {spec.fts_table} MATCH ?
+        ORDER BY bm25({spec.fts_table}), r.updated_at ASC
+        LIMIT ?
+        """,
+        (match, int(top_k)),
+    ).fetchall()
+    return [str(row[0]) for row in rows]
+
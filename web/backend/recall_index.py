@@ -0,0 +1,187 @@
+"""世界树召回引擎：稠密整数文档号 + array('I') 倒排表的 BM25 检索，记忆与图谱服务共用
+
+记录按写入顺序分配递增的文档号，倒排表只追加，天然有序；更新与删除把旧文档号标记为墓碑
+（文档频率与总长度即时扣减，倒排表中的残留项在打分时跳过），墓碑占比过高时整体压缩重编号。
+每个文档保存自己的词项与词频，增删只触及该文档的词项，不随词表大小增长。
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SPLIT_RE = re.compile(r"[^\w\u4e00-\u9fff]+")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+
+# 墓碑数超过该值且占全部文档号的四分之一以上时压缩
+_COMPACT_MIN_TOMBSTONES = 256
+
+
+def recall_terms(text: str) -> List[str]:
+    """切分召回词项（保留重复，用于词频）：按非词字符切分并小写，中文片段追加连续双字切片。"""
+    normalized = str(text or "").strip()
+    if not normalized:
+        return []
+    out: List[str] = []
+    for token in _SPLIT_RE.split(normalized.lower()):
+        if not token:
+            continue
+        out.append(token)
+        # 不超过两个字的片段，其双字切片就是自身，不重复计数
+        if len(token) > 2 and _CJK_RE.search(token):
+            out.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return out
+
+
+class RecallIndex:
+    """BM25 倒排索引；非线程安全，由调用方的锁保护。"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}  # 词项 -> (文档号, 词频)
+        self._df: Dict[str, int] = {}  # 只计存活文档
+        self._doc_of: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []  # 文档号 -> 记录 id（墓碑为 None）
+        self._order: List[str] = []  # 同分时的次序键
+        self._lengths = array("I")
+        self._doc_terms: List[Optional[Tuple[str, ...]]] = []
+        self._doc_tfs: List[Optional[array]] = []
+        self._live = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._doc_of
+
+    def vocabulary_size(self) -> int:
+        return len(self._df)
+
+    def upsert(self, key: str, terms: Iterable[str], order: str = "") -> None:
+        """写入或替换一条记录；terms 保留重复（词频），order 为同分时的升序次序键。"""
+        self._discard(key)
+        counts = Counter(terms)
+        doc = len(self._keys)
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = (array("I"), array("I"))
+            posting[0].append(doc)
+            posting[1].append(tf)
+            self._df[term] = self._df.get(term, 0) + 1
+        length = sum(counts.values())
+        self._keys.append(key)
+        self._order.append(order)
+        self._lengths.append(length)
+        self._doc_terms.append(tuple(counts))
+        self._doc_tfs.append(array("I", counts.values()))
+        self._doc_of[key] = doc
+        self._live += 1
+        self._total_length += length
+        self._maybe_compact()
+
+    def remove(self, key: str) -> bool:
+        removed = self._discard(key)
+        if removed:
+            self._maybe_compact()
+        return removed
+
+    def _discard(self, key: str) -> bool:
+        doc = self._doc_of.pop(key, None)
+        if doc is None:
+            return False
+        for term in self._doc_terms[doc] or ():
+            df = self._df[term] - 1
+            if df:
+                self._df[term] = df
+            else:
+                # 该词项已无存活文档，残留的墓碑项随倒排表一并丢弃
+                del self._df[term]
+                del self._postings[term]
+        self._keys[doc] = None
+        self._doc_terms[doc] = None
+        self._doc_tfs[doc] = None
+        self._live -= 1
+        self._total_length -= self._lengths[doc]
+        return True
+
+    def _maybe_compact(self) -> None:
+        tombstones = len(self._keys) - self._live
+        if tombstones >= _COMPACT_MIN_TOMBSTONES and tombstones * 4 > len(self._keys):
+            self._compact()
+
+    def _compact(self) -> None:
+        """按原顺序为存活文档重新编号并重建倒排表，清除全部墓碑。"""
+        live_docs = [doc for doc, key in enumerate(self._keys) if key is not None]
+        keys, order, lengths = self._keys, self._order, self._lengths
+        doc_terms, doc_tfs = self._doc_terms, self._doc_tfs
+        self._postings = {}
+        self._doc_of = {}
+        self._keys = []
+        self._order = []
+        self._lengths = array("I")
+        self._doc_terms = []
+        self._doc_tfs = []
+        for new_doc, old_doc in enumerate(live_docs):
+            terms, tfs = doc_terms[old_doc] or (), doc_tfs[old_doc]
+            for term, tf in zip(terms, tfs or ()):
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = (array("I"), array("I"))
+                posting[0].append(new_doc)
+                posting[1].append(tf)
+            self._keys.append(keys[old_doc])
+            self._order.append(order[old_doc])
+            self._lengths.append(lengths[old_doc])
+            self._doc_terms.append(terms)
+            self._doc_tfs.append(tfs)
+            self._doc_of[keys[old_doc]] = new_doc
+
+    def search(self, query_terms: Iterable[str], top_k: int) -> List[str]:
+        """BM25 打分，返回得分最高的 top_k 个记录 id（同分按次序键升序）。"""
+        live = self._live
+        if not live or top_k <= 0:
+            return []
+        k1 = self.k1
+        norm_base = k1 * (1 - self.b)
+        norm_per_length = k1 * self.b * live / self._total_length if self._total_length else 0.0
+        keys, lengths = self._keys, self._lengths
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for term in dict.fromkeys(query_terms):
+            df = self._df.get(term)
+            if not df:
+                continue
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            scale = idf * (k1 + 1)
+            docs, tfs = self._postings[term]
+            for doc, tf in zip(docs, tfs):
+                if keys[doc] is None:
+                    continue
+                scores[doc] = get(doc, 0.0) + scale * tf / (tf + norm_base + norm_per_length * lengths[doc])
+        if not scores:
+            return []
+        order = self._order
+        best = heapq.nsmallest(top_k, scores, key=lambda doc: (-scores[doc], order[doc]))
+        return [keys[doc] for doc in best]
+
+    def stats(self) -> dict:
+        postings = 0
+        posting_bytes = 0
+        for docs, tfs in self._postings.values():
+            postings += len(docs)
+            posting_bytes += (len(docs) + len(tfs)) * docs.itemsize
+        return {
+            "docs": self._live,
+            "tombstones": len(self._keys) - self._live,
+            "terms": len(self._df),
+            "postings": postings,
+            "postingBytes": posting_bytes,
+            "avgDocLength": round(self._total_length / self._live, 2) if self._live else 0.0,
+        }
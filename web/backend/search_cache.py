@@ -0,0 +1,155 @@
+"""搜索结果缓存：LRU + TTL，按字节预算淘汰，索引代际变化时自动失效"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from config import SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_MAX_ENTRY_BYTES, SEARCH_CACHE_TTL
+
+
+def _estimate_size(value: Any) -> int:
+    """以 JSON 序列化后的字节数近似结果占用。"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class SearchResultCache:
+    """线程安全的 LRU + TTL 缓存。
+
+    键首项为域、次项为索引 generation；某域 generation 变化时整域条目立即清除，
+    旧代际的结果不会再被命中。缓存的结果对象由所有命中方共享，调用方不得原地修改。
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_entry_bytes: int) -> None:
+        self._max_bytes = max(0, int(max_bytes))
+        self._ttl = float(ttl) if ttl and ttl > 0 else None
+        self._max_entry_bytes = max(0, int(max_entry_bytes)) or self._max_bytes
+        self._lock = threading.Lock()
+        # 键 -> (过期时间, 字节数, 结果)
+        self._entries: "OrderedDict[tuple, tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._generations: dict[str, int] = {}
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "oversized": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    def _drop(self, key: tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _sync_generation(self, domain: str, generation: int) -> bool:
+        """（持锁调用）域 generation 前进时清除该域全部条目；调用方持有的是旧代际时返回 False。"""
+        known = self._generations.get(domain)
+        if known == generation:
+            return True
+        if known is not None and generation < known:
+            return False
+        self._generations[domain] = generation
+        if known is None:
+            return True
+        stale = [key for key in self._entries if key[0] == domain]
+        for key in stale:
+            self._drop(key)
+        self._counters["invalidations"] += len(stale)
+        return True
+
+    def get(self, domain: str, generation: int, key: Hashable) -> tuple[bool, Any]:
+        full_key = (domain, generation, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(full_key) if self._sync_generation(domain, generation) else None
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+            expires_at, _, value = entry
+            if self._ttl is not None and expires_at <= now:
+                self._drop(full_key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(full_key)
+            self._counters["hits"] += 1
+            return True, value
+
+    def put(self, domain: str, generation: int, key: Hashable, value: Any) -> None:
+        size = _estimate_size(value)
+        if size <= 0 or size > self._max_entry_bytes:
+            with self._lock:
+                self._counters["oversized"] += 1
+            return
+        full_key = (domain, generation, key)
+        expires_at = time.monotonic() + self._ttl if self._ttl is not None else float("inf")
+        with self._lock:
+            if not self._sync_generation(domain, generation):
+                return
+            if full_key in self._entries:
+                self._drop(full_key)
+            self._entries[full_key] = (expires_at, size, value)
+            self._bytes += size
+            self._counters["stores"] += 1
+            while self._bytes > self._max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def get_or_compute(
+        self,
+        domain: str,
+        generation: int,
+        key: Hashable,
+        compute: Callable[[], Any],
+        use_cache: bool = True,
+    ) -> Any:
+        """命中则返回缓存结果，否则计算并写入；use_cache=False 时直接计算且不写入。"""
+        if not use_cache or not self.enabled:
+            with self._lock:
+                self._counters["bypassed"] += 1
+            return compute()
+        hit, value = self.get(domain, generation, key)
+        if hit:
+            return value
+        value = compute()
+        self.put(domain, generation, key, value)
+        return value
+
+    def clear(self, domain: Optional[str] = None) -> None:
+        with self._lock:
+            keys = [key for key in self._entries if domain is None or key[0] == domain]
+            for key in keys:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            domains: dict[str, int] = {}
+            for key in self._entries:
+                domains[key[0]] = domains.get(key[0], 0) + 1
+            return {
+                "enabled": self.enabled,
+                "maxBytes": self._max_bytes,
+                "maxEntryBytes": self._max_entry_bytes,
+                "ttlSeconds": self._ttl,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "domains": domains,
+                "generations": dict(self._generations),
+                **self._counters,
+                "hitRate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+search_result_cache = SearchResultCache(SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRY_BYTES)
@@ -0,0 +1,147 @@
+"""搜索执行层：把同步的 Tantivy 检索/文档读取放到有界线程池，避免阻塞事件循环"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import SEARCH_QUEUE_LIMIT, SEARCH_TIMEOUT, SEARCH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class SearchOverloadedError(RuntimeError):
+    """域内排队请求数已达上限。"""
+
+
+class SearchTimeoutError(TimeoutError):
+    """请求在超时时间内未完成。"""
+
+
+class SearchExecutor:
+    """有界线程池 + 按域排队上限 + 超时控制，并记录排队深度与等待耗时。"""
+
+    def __init__(self, max_workers: int, queue_limit: int, timeout: float) -> None:
+        self._max_workers = max(1, int(max_workers))
+        self._queue_limit = max(1, int(queue_limit))
+        self._timeout = float(timeout) if timeout and timeout > 0 else None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 域 -> 已受理未完成（排队 + 执行中）数量
+        self._pending: dict[str, int] = {}
+        # 域 -> 排队未开始数量
+        self._queued: dict[str, int] = {}
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="search",
+                )
+            return self._pool
+
+    async def run(self, domain: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在线程池中执行 func；超过排队上限抛 SearchOverloadedError，超时抛 SearchTimeoutError。"""
+        with self._lock:
+            pending = self._pending.get(domain, 0)
+            if pending >= self._queue_limit:
+                self._counters["rejected"] += 1
+                raise SearchOverloadedError(f"域 {domain} 搜索请求过多，请稍后重试")
+            self._pending[domain] = pending + 1
+            self._queued[domain] = self._queued.get(domain, 0) + 1
+            self._counters["submitted"] += 1
+        submitted_at = time.perf_counter()
+
+        def _task() -> Any:
+            started_at = time.perf_counter()
+            wait = started_at - submitted_at
+            with self._lock:
+                self._queued[domain] -= 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._pending[domain] -= 1
+                    self._counters["completed" if ok else "failed"] += 1
+                    self._run_total += time.perf_counter() - started_at
+
+        def _on_done(task_future: Future) -> None:
+            # shutdown(cancel_futures=True) 取消的排队任务不会运行 _task，在这里回收计数
+            if task_future.cancelled():
+                with self._lock:
+                    self._queued[domain] -= 1
+                    self._pending[domain] -= 1
+                    self._counters["cancelled"] += 1
+
+        try:
+            task_future = self._get_pool().submit(_task)
+        except RuntimeError:
+            # 线程池已关闭（shutdown 与提交并发）：撤销受理计数
+            with self._lock:
+                self._queued[domain] -= 1
+                self._pending[domain] -= 1
+                self._counters["cancelled"] += 1
+            raise
+        task_future.add_done_callback(_on_done)
+        future = asyncio.wrap_future(task_future)
+        try:
+            # shield：超时或客户端断开时不取消底层任务，保证计数在任务结束时正确回收
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise SearchTimeoutError(f"域 {domain} 搜索超时（>{self._timeout:.0f}s）") from None
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self._counters["completed"] + self._counters["failed"]
+            started = max(1, self._counters["submitted"] - sum(self._queued.values()))
+            domains = {
+                domain: {
+                    "pending": pending,
+                    "queued": self._queued.get(domain, 0),
+                    "running": pending - self._queued.get(domain, 0),
+                }
+                for domain, pending in self._pending.items()
+            }
+            return {
+                "maxWorkers": self._max_workers,
+                "queueLimitPerDomain": self._queue_limit,
+                "timeoutSeconds": self._timeout,
+                "queueDepth": sum(self._queued.values()),
+                "domains": domains,
+                **self._counters,
+                "avgWaitMs": round(self._wait_total / started * 1000, 3),
+                "maxWaitMs": round(self._wait_max * 1000, 3),
+                "avgRunMs": round(self._run_total / max(1, finished) * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        """关闭线程池并取消排队任务（其计数由完成回调回收）；之后再提交会新建线程池。"""
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+search_executor = SearchExecutor(SEARCH_WORKERS, SEARCH_QUEUE_LIMIT, SEARCH_TIMEOUT)
@@ -3,35 +3,117 @@
 import re
 import logging
 import threading
-from pathlib import Path
-from typing import Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, Optional
 
 import tantivy
 
-from config import get_index_dir, get_docs_dir, SUPPORTED_DOMAINS
+from content_store import ContentStore
+from search_cache import search_result_cache
+from text_normalize import normalize_search_text
+from config import (
+    get_index_dir,
+    get_index_manifest_path,
+    get_docs_dir,
+    SEARCH_BATCH_WORKERS,
+    SUPPORTED_DOMAINS,
+)
 
 logger = logging.getLogger(__name__)
 
-# 域 -> {"index": Index, "mtime": float} 的缓存
+# 域 -> {"index", "searcher", "generation", "directory", "content_store", "opened_at"} 的缓存，
+# 同一代际的 Index/Searcher/内容存储绑定在一起，代际变化时整体替换
 _index_cache: dict[str, dict[str, object]] = {}
 _index_cache_lock = threading.RLock()
+# 串行化慢速的索引打开，避免并发请求重复打开同一代际
+_index_open_lock = threading.Lock()
+
+# 域 -> (清单文件 stat 签名, generation)，清单未变化时无需重新解析
+_marker_state: dict[str, tuple[tuple[int, int, int], int]] = {}
+
+# 后台轮询线程维护的域 -> generation；线程运行时查询路径不触碰文件系统
+_watched_generations: dict[str, int] = {}
+_watcher_thread: Optional[threading.Thread] = None
+_watcher_stop = threading.Event()
 
 # 双通道融合权重（可按线上效果调整）
 FUSION_WEIGHT_EXACT = 1.0
 FUSION_WEIGHT_CJK2 = 1.0
 
 
-def _compute_index_mtime(index_dir: Path) -> float:
-    """计算索引目录及其内容的最新 mtime，用于缓存失效。"""
-    latest = index_dir.stat().st_mtime
-    for entry in index_dir.rglob("*"):
-        try:
-            mtime = entry.stat().st_mtime
-        except FileNotFoundError:
-            continue
-        if mtime > latest:
-            latest = mtime
-    return latest
+def _read_marker_generation(domain: str) -> int:
+    """通过单次 stat 检查索引清单，返回已发布的 generation（无清单时为 0）。"""
+    from indexer import read_index_manifest
+
+    manifest_path = get_index_manifest_path(domain)
+    try:
+        st = manifest_path.stat()
+    except FileNotFoundError:
+        with _index_cache_lock:
+            _marker_state.pop(domain, None)
+        return 0
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _index_cache_lock:
+        known = _marker_state.get(domain)
+        if known and known[0] == signature:
+            return known[1]
+
+    try:
+        generation = int(read_index_manifest(domain).get("generation", 0) or 0)
+    except (TypeError, ValueError):
+        generation = 0
+    with _index_cache_lock:
+        _marker_state[domain] = (signature, generation)
+    return generation
+
+
+def get_index_generation(domain: str) -> int:
+    """返回指定域当前发布的索引 generation。"""
+    if _watcher_thread is not None:
+        with _index_cache_lock:
+            if domain in _watched_generations:
+                return _watched_generations[domain]
+    return _read_marker_generation(domain)
+
+
+def _poll_index_markers() -> None:
+    for domain in SUPPORTED_DOMAINS:
+        generation = _read_marker_generation(domain)
+        with _index_cache_lock:
+            _watched_generations[domain] = generation
+
+
+def start_index_watcher(interval: float) -> None:
+    """启动后台线程定期轮询索引清单；查询路径改为只读内存中的 generation。"""
+    global _watcher_thread
+    if interval <= 0 or _watcher_thread is not None:
+        return
+    _watcher_stop.clear()
+    _poll_index_markers()
+
+    def _loop() -> None:
+        while not _watcher_stop.wait(interval):
+            try:
+                _poll_index_markers()
+            except Exception as exc:
+                logger.error("索引清单轮询失败: %s", exc)
+
+    _watcher_thread = threading.Thread(target=_loop, name="index-watcher", daemon=True)
+    _watcher_thread.start()
+    logger.info("索引新鲜度轮询已启动，间隔 %.1f 秒", interval)
+
+
+def stop_index_watcher() -> None:
+    global _watcher_thread
+    thread = _watcher_thread
+    if thread is None:
+        return
+    _watcher_stop.set()
+    thread.join(timeout=5)
+    _watcher_thread = None
+    with _index_cache_lock:
+        _watched_generations.clear()
 
 
 def invalidate_index(domain: Optional[str] = None) -> None:
@@ -39,55 +121,147 @@ def invalidate_index(domain: Optional[str] = None) -> None:
     with _index_cache_lock:
         if domain is None:
             _index_cache.clear()
-            return
-        _index_cache.pop(domain, None)
+            _marker_state.clear()
+        else:
+            _index_cache.pop(domain, None)
+            _marker_state.pop(domain, None)
+    search_result_cache.clear(domain)
+    # 同进程重建后立即刷新轮询结果，无需等待下一个周期
+    if _watcher_thread is not None:
+        _poll_index_markers()
+
+
+def _open_index_entry(domain: str, allow_rebuild: bool = True) -> dict[str, object]:
+    """按清单打开当前代际的 Index 与内容存储（不持有缓存锁，慢操作不阻塞其它域）。"""
+    from indexer import build_schema, build_index_for_domain, read_index_manifest, resolve_active_index_dir
 
+    manifest = read_index_manifest(domain)
+    index_dir = resolve_active_index_dir(domain, manifest)
+    if index_dir is None:
+        raise FileNotFoundError(f"索引目录不存在: {get_index_dir(domain)}，请先运行 indexer.py")
+
+    try:
+        index = tantivy.Index(build_schema(), path=str(index_dir))
+    except ValueError as exc:
+        # 典型场景：代码升级后 schema 变化，但磁盘仍是旧索引。
+        if not allow_rebuild or "schema does not match" not in str(exc).lower():
+            raise
+        logger.warning("域 %s 索引 schema 不匹配，尝试自动重建索引", domain)
+        build_index_for_domain(domain, full=True)
+        with _index_cache_lock:
+            _marker_state.pop(domain, None)
+        return _open_index_entry(domain, allow_rebuild=False)
+    index.reload()
+    return {
+        "index": index,
+        # 代际目录发布后只读，searcher 可在整个代际内跨请求、跨线程复用
+        "searcher": index.searcher(),
+        "generation": int(manifest.get("generation", 0) or 0),
+        "directory": str(index_dir),
+        "content_store": ContentStore.open(index_dir),
+        "opened_at": time.time(),
+    }
 
-def _get_index(domain: str) -> tantivy.Index:
-    """获取或创建指定域的 Tantivy Index 实例（带缓存）"""
-    index_dir = get_index_dir(domain)
-    if not index_dir.exists():
-        raise FileNotFoundError(f"索引目录不存在: {index_dir}，请先运行 indexer.py")
-    current_mtime = _compute_index_mtime(index_dir)
+
+def _publish_entry(domain: str, entry: dict[str, object]) -> None:
+    with _index_cache_lock:
+        _index_cache[domain] = entry
+        if _watcher_thread is not None:
+            _watched_generations[domain] = int(entry["generation"])
+
+
+def _get_index_entry(domain: str) -> dict[str, object]:
+    """获取或创建指定域的索引缓存条目（Index 与内容存储同代际绑定）"""
+    generation = get_index_generation(domain)
 
     with _index_cache_lock:
         cached = _index_cache.get(domain)
-        if cached:
-            cached_mtime = cached.get("mtime")
-            if isinstance(cached_mtime, (int, float)) and cached_mtime >= current_mtime:
-                cached_index = cached.get("index")
-                if isinstance(cached_index, tantivy.Index):
-                    return cached_index
-
-        from indexer import build_schema, build_index_for_domain
-        schema = build_schema()
+        if cached and cached.get("generation") == generation:
+            return cached
+
+    with _index_open_lock:
+        # 等锁期间可能已有其它线程完成打开
+        with _index_cache_lock:
+            cached = _index_cache.get(domain)
+            if cached and cached.get("generation") == get_index_generation(domain):
+                return cached
+        entry = _open_index_entry(domain)
+        _publish_entry(domain, entry)
+        return entry
+
+
+def get_searcher_stats() -> dict[str, dict]:
+    """各域常驻 searcher 的状态：代际、目录、打开时长、段数与文档数。"""
+    with _index_cache_lock:
+        entries = dict(_index_cache)
+    now = time.time()
+    stats: dict[str, dict] = {}
+    for domain, entry in entries.items():
+        searcher: tantivy.Searcher = entry["searcher"]
+        stats[domain] = {
+            "generation": entry["generation"],
+            "directory": entry["directory"],
+            "ageSeconds": round(now - float(entry["opened_at"]), 1),
+            "numSegments": searcher.num_segments,
+            "numDocs": searcher.num_docs,
+            "contentStore": entry.get("content_store") is not None,
+        }
+    return stats
+
+
+def refresh_index(domain: str) -> None:
+    """重建完成后预热新代际并原子替换缓存条目；进行中的查询继续使用旧条目直至结束。"""
+    with _index_cache_lock:
+        _marker_state.pop(domain, None)
+    with _index_open_lock:
         try:
-            index = tantivy.Index(schema, path=str(index_dir))
-        except ValueError as exc:
-            # 典型场景：代码升级后 schema 变化，但磁盘仍是旧索引。
-            if "schema does not match" not in str(exc).lower():
-                raise
-            logger.warning("域 %s 索引 schema 不匹配，尝试自动重建索引", domain)
-            build_index_for_domain(domain)
-            current_mtime = _compute_index_mtime(index_dir)
-            index = tantivy.Index(schema, path=str(index_dir))
-        index.reload()
-        _index_cache[domain] = {"index": index, "mtime": current_mtime}
-        return index
+            entry = _open_index_entry(domain, allow_rebuild=False)
+        except FileNotFoundError:
+            invalidate_index(domain)
+            return
+        _publish_entry(domain, entry)
+    logger.info("域 %s 已切换到索引代际 %s", domain, entry["generation"])
+
+
+class _SearchSnapshot:
+    """一次（或一批）查询共享的检索快照：同一代际的 Index、Searcher 与内容存储。
+
+    share_docs=True 时按文档地址缓存已加载的存储文档，批量查询之间不重复加载。
+    """
+
+    def __init__(self, entry: dict[str, object], share_docs: bool = False) -> None:
+        self.index: tantivy.Index = entry["index"]
+        self.content_store = entry.get("content_store")
+        self.generation = int(entry.get("generation", 0) or 0)
+        self.searcher: tantivy.Searcher = entry["searcher"]
+        self._docs: Optional[dict[tuple[int, int], tantivy.Document]] = {} if share_docs else None
+        self._docs_lock = threading.Lock()
+        self.doc_loads = 0
+        self.doc_reuses = 0
+
+    def doc(self, address: tantivy.DocAddress) -> tantivy.Document:
+        if self._docs is None:
+            return self.searcher.doc(address)
+        key = (address.segment_ord, address.doc)
+        with self._docs_lock:
+            doc = self._docs.get(key)
+            if doc is not None:
+                self.doc_reuses += 1
+                return doc
+        doc = self.searcher.doc(address)
+        with self._docs_lock:
+            if key not in self._docs:
+                self._docs[key] = doc
+                self.doc_loads += 1
+        return doc
 
 
 def _normalize_query(query: str) -> str:
     """规范化搜索查询"""
     if not isinstance(query, str):
         return ""
-    result = query.strip().lower()
-    # 全角转半角
-    result = re.sub(
-        r"[\uff01-\uff5e]",
-        lambda ch: chr(ord(ch.group(0)) - 0xFEE0),
-        result,
-    )
-    result = result.replace("\u3000", " ")  # 全角空格
+    # 小写、全角转半角（含全角空格）
+    result = normalize_search_text(query)
     result = re.sub(r'["\u201c\u201d\u2018\u2019]', '"', result)
     result = re.sub(r'^"+|"+$', "", result)
     return result.strip()
@@ -154,89 +328,157 @@ def _tokenize_query_cjk2(query: str) -> str:
     return " ".join(tokens)
 
 
-def _name_match_bonus(name_raw: str, normalized_query: str) -> float:
-    name = str(name_raw or "").lower()
-    query = str(normalized_query or "").lower()
-    if not name or not query:
-        return 0.0
-    bonus = 0.0
-    if name == query:
-        bonus += 2.0
-    if name.startswith(query):
-        bonus += 1.0
-    if query in name:
-        bonus += 0.6
-    return bonus
+# 名称加权：完全匹配 / 前缀匹配 / 包含匹配（可叠加）
+NAME_BONUS_EXACT = 2.0
+NAME_BONUS_PREFIX = 1.0
+NAME_BONUS_CONTAINS = 0.6
 
 
-def _build_fused_candidates(index: tantivy.Index, query: str, hit_limit: int) -> list[dict]:
-    """并行融合 exact 与 cjk2 两个通道的召回结果。"""
-    normalized = _normalize_query(query)
-    tokenized_exact = _tokenize_query_native(normalized)
-    tokenized_cjk2 = _tokenize_query_cjk2(normalized)
-    if not tokenized_exact and not tokenized_cjk2:
-        return []
+def _name_windows(normalized: str, size: int) -> list[str]:
+    """覆盖整个查询的若干长度为 size 的窗口（首尾对齐，可重叠）。"""
+    starts = list(range(0, len(normalized) - size + 1, size))
+    if starts[-1] != len(normalized) - size:
+        starts.append(len(normalized) - size)
+    return [normalized[i:i + size] for i in starts]
 
-    searcher = index.searcher()
-    merged: dict[str, dict] = {}
 
-    def _upsert_channel_hits(hits, channel: str) -> None:
-        for score, doc_address in hits:
-            doc = searcher.doc(doc_address)
-            path = str(_doc_first(doc, "path", "") or "")
-            if not path:
-                continue
-            item = merged.get(path)
-            if item is None:
-                item = {
-                    "path": path,
-                    "doc": doc,
-                    "exact_score": 0.0,
-                    "cjk2_score": 0.0,
-                    "final_score": 0.0,
-                }
-                merged[path] = item
-            if channel == "exact":
-                item["exact_score"] = max(float(item["exact_score"]), float(score))
-            else:
-                item["cjk2_score"] = max(float(item["cjk2_score"]), float(score))
+def _build_name_tier_queries(index: tantivy.Index, normalized: str) -> list[tuple[tantivy.Query, float]]:
+    """名称分层查询（完全 / 前缀 / 包含）及对应加权，均为 name_key/name_prefix/name_infix 上的词项查询。
+
+    查询不超过 n-gram 长度时前缀与包含都是精确匹配；更长的查询以覆盖全句的各窗口同时命中
+    name_infix 近似判断（前缀层另要求 name_prefix 命中开头部分），不扫描词典。
+    """
+    from indexer import NAME_INFIX_MAX_CHARS, NAME_PREFIX_MAX_CHARS
+
+    schema = index.schema
 
+    def _term(field: str, value: str) -> tantivy.Query:
+        return tantivy.Query.term_query(schema, field, value)
+
+    if len(normalized) <= NAME_INFIX_MAX_CHARS:
+        contains_query = _term("name_infix", normalized)
+    else:
+        windows = _name_windows(normalized, NAME_INFIX_MAX_CHARS)
+        contains_query = tantivy.Query.boolean_query(
+            [(tantivy.Occur.Must, _term("name_infix", window)) for window in windows]
+        )
+    if len(normalized) <= NAME_PREFIX_MAX_CHARS:
+        prefix_query = _term("name_prefix", normalized)
+    else:
+        prefix_query = tantivy.Query.boolean_query(
+            [
+                (tantivy.Occur.Must, _term("name_prefix", normalized[:NAME_PREFIX_MAX_CHARS])),
+                (tantivy.Occur.Must, contains_query),
+            ]
+        )
+    return [
+        (_term("name_key", normalized), NAME_BONUS_EXACT),
+        (prefix_query, NAME_BONUS_PREFIX),
+        (contains_query, NAME_BONUS_CONTAINS),
+    ]
+
+
+def _build_fused_query(
+    index: tantivy.Index,
+    normalized: str,
+    name_tiers: Optional[list[tuple[tantivy.Query, float]]] = None,
+) -> Optional[tantivy.Query]:
+    """构建单次执行的融合查询。
+
+    exact 与 cjk2 两个通道作为 Should 子句按权重加权求和，至少命中其一；
+    名称加权作为附加的常数分 Should 子句，只影响打分不影响召回。
+    """
+    tokenized_exact = _tokenize_query_native(normalized)
+    tokenized_cjk2 = _tokenize_query_cjk2(normalized)
+    channels: list[tuple[tantivy.Occur, tantivy.Query]] = []
     if tokenized_exact:
         parsed_exact = index.parse_query(
             _build_all_terms_query(tokenized_exact),
             ["name", "content", "path_terms"],
         )
-        search_result_exact = searcher.search(parsed_exact, limit=hit_limit)
-        _upsert_channel_hits(search_result_exact.hits, "exact")
-
+        channels.append((tantivy.Occur.Should, tantivy.Query.boost_query(parsed_exact, FUSION_WEIGHT_EXACT)))
     if tokenized_cjk2:
         parsed_cjk2 = index.parse_query(
             _build_any_terms_query(tokenized_cjk2),
             ["name_cjk2", "content_cjk2", "path_terms_cjk2"],
         )
-        search_result_cjk2 = searcher.search(parsed_cjk2, limit=hit_limit)
-        _upsert_channel_hits(search_result_cjk2.hits, "cjk2")
+        channels.append((tantivy.Occur.Should, tantivy.Query.boost_query(parsed_cjk2, FUSION_WEIGHT_CJK2)))
+    if not channels:
+        return None
+
+    if name_tiers is None:
+        name_tiers = _build_name_tier_queries(index, normalized)
+    clauses = [(tantivy.Occur.Must, tantivy.Query.boolean_query(channels))]
+    for tier_query, bonus in name_tiers:
+        clauses.append((tantivy.Occur.Should, tantivy.Query.const_score_query(tier_query, bonus)))
+    return tantivy.Query.boolean_query(clauses)
+
+
+def _iter_query_candidates(
+    snapshot: _SearchSnapshot,
+    query: tantivy.Query,
+    hit_limit: int,
+    seen_paths: set[str],
+) -> Iterator[dict]:
+    """一次取回前 hit_limit 个命中并逐个产出候选，存储文档在产出时才加载；跳过 seen_paths 中已有的 path。
+
+    命中只是文档地址，一次取全不比分页多花存储读取；分页则每页都要重新执行整个布尔查询。
+    """
+    if hit_limit <= 0:
+        return
+    hits = snapshot.searcher.search(query, limit=hit_limit, count=False).hits
+    for score, doc_address in hits:
+        doc = snapshot.doc(doc_address)
+        path = str(_doc_first(doc, "path", "") or "")
+        if not path or path in seen_paths:
+            continue
+        seen_paths.add(path)
+        yield {"path": path, "doc": doc, "final_score": float(score)}
 
-    for item in merged.values():
-        doc = item["doc"]
-        name_raw = str(_doc_first(doc, "name_raw", "") or "")
-        bonus = _name_match_bonus(name_raw, normalized)
-        item["final_score"] = (
-            float(item["exact_score"]) * FUSION_WEIGHT_EXACT
-            + float(item["cjk2_score"]) * FUSION_WEIGHT_CJK2
-            + bonus
-        )
 
-    candidates = list(merged.values())
-    candidates.sort(
-        key=lambda item: (
-            float(item.get("final_score", 0.0)),
-            float(item.get("exact_score", 0.0)),
-            float(item.get("cjk2_score", 0.0)),
-        ),
-        reverse=True,
-    )
-    return candidates
+def _build_fused_candidates(snapshot: _SearchSnapshot, query: str, hit_limit: int) -> Iterator[dict]:
+    """单次融合查询按最终得分降序逐个产出候选（同 path 只保留首个）。
+
+    调用方停止迭代即提前终止，不再拉取后续命中与存储文档。
+    """
+    normalized = _normalize_query(query)
+    fused_query = _build_fused_query(snapshot.index, normalized) if normalized else None
+    if fused_query is None:
+        return
+    yield from _iter_query_candidates(snapshot, fused_query, hit_limit, set())
+
+
+def _build_tiered_candidates(snapshot: _SearchSnapshot, query: str, limit: int) -> Iterator[dict]:
+    """按名称分层（完全 > 前缀 > 包含 > 其它）依次执行融合查询，层内按得分降序。
+
+    每层查询限定在本层且排除更高层，分层判断完全在索引侧完成，覆盖全部命中文档；
+    凑满 limit 后不再执行后续层。
+    """
+    normalized = _normalize_query(query)
+    if not normalized:
+        return
+    name_tiers = _build_name_tier_queries(snapshot.index, normalized)
+    fused_query = _build_fused_query(snapshot.index, normalized, name_tiers)
+    if fused_query is None:
+        return
+
+    seen_paths: set[str] = set()
+    # 更高层的条件以 MustNot 排除，保证各层互不重叠
+    tier_filters: list[tuple[tantivy.Occur, tantivy.Query]] = []
+    remaining = limit
+    for tier_query, _ in name_tiers + [(None, 0.0)]:
+        clauses = [(tantivy.Occur.Must, fused_query), *tier_filters]
+        if tier_query is not None:
+            # 常数 0 分：只做过滤，不改变融合得分
+            clauses.append((tantivy.Occur.Must, tantivy.Query.const_score_query(tier_query, 0.0)))
+            tier_filters.append((tantivy.Occur.MustNot, tier_query))
+        for candidate in _iter_query_candidates(
+            snapshot, tantivy.Query.boolean_query(clauses), remaining, seen_paths
+        ):
+            yield candidate
+            remaining -= 1
+        if remaining <= 0:
+            return
 
 
 def _extract_snippets(
@@ -259,6 +501,35 @@ def _extract_snippets(
     return snippets
 
 
+def _read_snippets_from_file(domain: str, md_file, snippet_terms: list[str]) -> tuple[int, int, list[dict]]:
+    """回退路径：索引缺少内容存储时读取原文件提取片段。"""
+    total_lines = 0
+    total_tokens = 0
+    hits: list[dict] = []
+    if not md_file.exists():
+        return total_lines, total_tokens, hits
+    try:
+        content = md_file.read_text(encoding="utf-8")
+        lines = content.split("\n")
+        total_lines = len(lines)
+        total_tokens = len(content) // 2  # 粗略估算
+
+        for term in snippet_terms:
+            hits.extend(_extract_snippets(content, term))
+        # 去重
+        seen = set()
+        unique_hits = []
+        for h in hits:
+            key = h["line"]
+            if key not in seen:
+                seen.add(key)
+                unique_hits.append(h)
+        hits = unique_hits[:3]
+    except Exception as e:
+        logger.exception("读取搜索命中文档失败: domain=%s file=%s err=%s", domain, md_file, e)
+    return total_lines, total_tokens, hits
+
+
 def _doc_first(doc: tantivy.Document, field: str, default: object = ""):
     """安全读取 Tantivy Document 字段的第一个值。"""
     try:
@@ -274,6 +545,7 @@ def search_catalog(
     domain: str,
     query: str,
     max_results: int = 100,
+    snapshot: Optional[_SearchSnapshot] = None,
 ) -> list[dict]:
     """目录搜索：返回匹配的目录条目（用于 SearchView UI）"""
     if domain not in SUPPORTED_DOMAINS:
@@ -287,97 +559,63 @@ def search_catalog(
     if not tokenized_query and not tokenized_cjk2:
         return []
 
-    try:
-        index = _get_index(domain)
-    except FileNotFoundError:
-        logger.error(f"域 {domain} 的索引未构建")
-        return []
-
-    candidates = _build_fused_candidates(index, query, hit_limit=max_results * 8)
+    if snapshot is None:
+        try:
+            snapshot = _SearchSnapshot(_get_index_entry(domain))
+        except FileNotFoundError:
+            logger.error(f"域 {domain} 的索引未构建")
+            return []
 
     results = []
-    for candidate in candidates:
+    for candidate in _build_tiered_candidates(snapshot, query, max_results):
         doc = candidate["doc"]
-        name_raw = _doc_first(doc, "name_raw", "")
         display_name = _doc_first(doc, "name_display", "") or _doc_first(doc, "name", "")
-        path = _doc_first(doc, "path", "")
-
-        exact_name = str(name_raw or "").lower() == query.lower()
-        prefix_name = str(name_raw or "").lower().startswith(query.lower())
-        contains_name = query.lower() in str(name_raw or "").lower()
         results.append({
             "id": _doc_first(doc, "doc_id", 0),
             "name": display_name,
             "type": _doc_first(doc, "doc_type", ""),
-            "path": path,
+            "path": candidate["path"],
             "category": _doc_first(doc, "category", ""),
             "score": float(candidate.get("final_score", 0.0)),
-            "_exact_name": exact_name,
-            "_prefix_name": prefix_name,
-            "_contains_name": contains_name,
         })
+    return results
 
-    results.sort(
-        key=lambda item: (
-            item.get("_exact_name", False),
-            item.get("_prefix_name", False),
-            item.get("_contains_name", False),
-            float(item.get("score", 0.0)),
-        ),
-        reverse=True,
-    )
-    trimmed = results[:max_results]
-    for item in trimmed:
-        item.pop("_exact_name", None)
-        item.pop("_prefix_name", None)
-        item.pop("_contains_name", None)
-    return trimmed
 
+class _DocsSearchError(Exception):
+    """深度文档搜索无法进行（域不支持、查询为空、索引未构建），消息直接返回给调用方。"""
 
-def search_docs(
+
+def _iter_docs_results(
     domain: str,
     query: str,
-    doc_path: Optional[str] = None,
-    max_results: int = 50,
-    generate_summary: bool = False,
-) -> dict:
-    """深度文档搜索：返回匹配的文档及代码片段（用于 Agent 工具）"""
+    doc_path: Optional[str],
+    max_results: int,
+    snapshot: Optional[_SearchSnapshot] = None,
+) -> Iterator[dict]:
+    """按检索顺序逐个产出深度文档搜索的分组结果（每个结果完成片段提取后立即产出）。"""
     if domain not in SUPPORTED_DOMAINS:
-        return {
-            "tool": "search_docs",
-            "query": query,
-            "message": f"不支持的域: {domain}",
-        }
+        raise _DocsSearchError(f"不支持的域: {domain}")
 
     normalized = _normalize_query(query)
     if not normalized:
-        return {
-            "tool": "search_docs",
-            "query": query,
-            "message": "请输入有效的查询词",
-        }
+        raise _DocsSearchError("请输入有效的查询词")
     tokenized_query = _tokenize_query_native(normalized)
     tokenized_cjk2 = _tokenize_query_cjk2(normalized)
     if not tokenized_query and not tokenized_cjk2:
-        return {
-            "tool": "search_docs",
-            "query": query,
-            "message": "请输入有效的查询词",
-        }
+        raise _DocsSearchError("请输入有效的查询词")
 
-    try:
-        index = _get_index(domain)
-    except FileNotFoundError:
-        return {
-            "tool": "search_docs",
-            "query": query,
-            "message": f"域 {domain} 的索引未构建",
-        }
+    if snapshot is None:
+        try:
+            snapshot = _SearchSnapshot(_get_index_entry(domain))
+        except FileNotFoundError:
+            raise _DocsSearchError(f"域 {domain} 的索引未构建") from None
 
-    candidates = _build_fused_candidates(index, normalized, hit_limit=max_results * 10)
+    content_store = snapshot.content_store
+    candidates = _build_fused_candidates(snapshot, normalized, hit_limit=max_results * 10)
 
     docs_dir = get_docs_dir(domain)
-    grouped: dict[str, dict] = {}
+    seen_paths: set[str] = set()
+    produced = 0
 
     snippet_terms: list[str] = []
     if normalized:
@@ -400,36 +638,22 @@ def search_docs(
             if filter_lower not in path.lower():
                 continue
 
-        if path in grouped:
+        if path in seen_paths:
             continue
 
-        # 读取原文件提取 snippets
-        md_file = docs_dir / physical_path
         total_lines = 0
         total_tokens = 0
         hits = []
-        content = ""
 
-        if md_file.exists():
-            try:
-                content = md_file.read_text(encoding="utf-8")
-                lines = content.split("\n")
-                total_lines = len(lines)
-                total_tokens = len(content) // 2  # 粗略估算
-
-                for term in snippet_terms:
-                    hits.extend(_extract_snippets(content, term))
-                # 去重
-                seen = set()
-                unique_hits = []
-                for h in hits:
-                    key = h["line"]
-                    if key not in seen:
-                        seen.add(key)
-                        unique_hits.append(h)
-                hits = unique_hits[:3]
-            except Exception as e:
-                logger.exception("读取搜索命中文档失败: domain=%s file=%s err=%s", domain, md_file, e)
+        if isinstance(content_store, ContentStore) and physical_path in content_store:
+            # 内容存储命中：直接在内存映射的小写缓冲区中定位片段，无需打开文件
+            total_lines, total_chars = content_store.doc_stats(physical_path)
+            total_tokens = total_chars // 2  # 粗略估算
+            hits = content_store.find_snippets(physical_path, snippet_terms)
+        else:
+            total_lines, total_tokens, hits = _read_snippets_from_file(
+                domain, docs_dir / physical_path, snippet_terms
+            )
 
         hit_count = len(hits)
         contains_in_path = normalized in path.lower()
@@ -437,7 +661,8 @@ def search_docs(
         if not hits and not contains_in_path and not contains_in_name:
             continue
 
-        grouped[path] = {
+        seen_paths.add(path)
+        yield {
             "path": path,
             "totalLines": total_lines,
             "totalTokens": total_tokens,
@@ -446,11 +671,18 @@ def search_docs(
             "score": float(candidate.get("final_score", 0.0)),
         }
 
-        if len(grouped) >= max_results:
+        produced += 1
+        if produced >= max_results:
             break
 
-    results = list(grouped.values())
-    # 先按 hitCount，再按融合分
+
+def _build_docs_response(
+    query: str,
+    results: list[dict],
+    doc_path: Optional[str],
+    generate_summary: bool,
+) -> dict:
+    """对分组结果排序（先 hitCount，再融合分）并组装 search_docs 响应。"""
     results.sort(key=lambda r: (r["hitCount"], float(r.get("score", 0.0))), reverse=True)
 
     response: dict = {
@@ -473,3 +705,210 @@ def search_docs(
         response["message"] = "在指定路径中未找到相关内容" if doc_path else "未找到相关文档"
 
     return response
+
+
+def search_docs(
+    domain: str,
+    query: str,
+    doc_path: Optional[str] = None,
+    max_results: int = 50,
+    generate_summary: bool = False,
+    snapshot: Optional[_SearchSnapshot] = None,
+) -> dict:
+    """深度文档搜索：返回匹配的文档及代码片段（用于 Agent 工具）"""
+    try:
+        results = list(_iter_docs_results(domain, query, doc_path, max_results, snapshot))
+    except _DocsSearchError as exc:
+        return {
+            "tool": "search_docs",
+            "query": query,
+            "message": str(exc),
+        }
+    return _build_docs_response(query, results, doc_path, generate_summary)
+
+
+def stream_search_docs(
+    domain: str,
+    query: str,
+    doc_path: Optional[str] = None,
+    max_results: int = 50,
+    generate_summary: bool = False,
+) -> Iterator[dict]:
+    """流式深度文档搜索：每个结果完成片段提取即产出 {"type": "result", ...}。
+
+    结果按检索顺序产出；最后一帧为 {"type": "summary", ...}，携带总数、摘要消息，
+    以及与 search_docs 一致的最终排序（ranking，path 列表）。
+    """
+    results: list[dict] = []
+    try:
+        for result in _iter_docs_results(domain, query, doc_path, max_results):
+            results.append(result)
+            yield {"type": "result", **result}
+    except _DocsSearchError as exc:
+        yield {
+            "type": "summary",
+            "tool": "search_docs",
+            "query": query,
+            "total": 0,
+            "message": str(exc),
+        }
+        return
+
+    summary = _build_docs_response(query, results, doc_path, generate_summary)
+    ranked = summary.pop("results")
+    yield {
+        "type": "summary",
+        **summary,
+        "total": len(ranked),
+        "ranking": [r["path"] for r in ranked],
+    }
+
+
+def _result_cache_key(
+    mode: str,
+    normalized: str,
+    doc_path: Optional[str],
+    max_results: int,
+    generate_summary: bool,
+) -> tuple:
+    return (mode, normalized, doc_path if mode == "docs" else None, max_results, mode == "docs" and bool(generate_summary))
+
+
+def cached_search_catalog(
+    domain: str,
+    query: str,
+    max_results: int = 100,
+    use_cache: bool = True,
+) -> list[dict]:
+    """带结果缓存的目录搜索，键为 (规范化查询, max_results)，随索引代际失效。"""
+    normalized = _normalize_query(query)
+    if domain not in SUPPORTED_DOMAINS or not normalized:
+        return search_catalog(domain, query, max_results=max_results)
+    return search_result_cache.get_or_compute(
+        domain,
+        get_index_generation(domain),
+        _result_cache_key("catalog", normalized, None, max_results, False),
+        lambda: search_catalog(domain, query, max_results=max_results),
+        use_cache=use_cache,
+    )
+
+
+def cached_search_docs(
+    domain: str,
+    query: str,
+    doc_path: Optional[str] = None,
+    max_results: int = 50,
+    generate_summary: bool = False,
+    use_cache: bool = True,
+) -> dict:
+    """带结果缓存的深度文档搜索，键为 (规范化查询, doc_path, max_results, generate_summary)。"""
+    normalized = _normalize_query(query)
+    if domain not in SUPPORTED_DOMAINS or not normalized:
+        return search_docs(domain, query, doc_path=doc_path, max_results=max_results, generate_summary=generate_summary)
+    result = search_result_cache.get_or_compute(
+        domain,
+        get_index_generation(domain),
+        _result_cache_key("docs", normalized, doc_path, max_results, generate_summary),
+        lambda: search_docs(
+            domain,
+            query,
+            doc_path=doc_path,
+            max_results=max_results,
+            generate_summary=generate_summary,
+        ),
+        use_cache=use_cache,
+    )
+    # 规范化后相同的查询共享结果，回显本次请求的原始查询词
+    return {**result, "query": query}
+
+
+_batch_pool: Optional[ThreadPoolExecutor] = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool() -> ThreadPoolExecutor:
+    # 独立于搜索执行层的线程池：批量请求本身占用执行层的一个线程，避免嵌套提交造成死锁
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(max_workers=SEARCH_BATCH_WORKERS, thread_name_prefix="search-batch")
+        return _batch_pool
+
+
+def search_batch(domain: str, queries: list[dict], use_cache: bool = True) -> dict:
+    """批量搜索：所有查询共享同一代际的 Searcher 快照，并行执行。
+
+    queries 每项含 mode（catalog|docs）、query、path、maxResults、generateSummary，可带 id 原样回显。
+    规范化后相同的查询只执行一次；存储文档按地址在查询间去重加载；结果按输入顺序返回。
+    """
+    started_at = time.perf_counter()
+    try:
+        snapshot: Optional[_SearchSnapshot] = _SearchSnapshot(_get_index_entry(domain), share_docs=True)
+    except FileNotFoundError:
+        # 交由单查询函数给出“索引未构建”的标准响应
+        snapshot = None
+
+    def _execute(item: dict) -> list[dict] | dict:
+        query = str(item.get("query") or "")
+        max_results = int(item.get("maxResults", 50))
+        if item.get("mode") == "docs":
+            return search_docs(
+                domain,
+                query,
+                doc_path=item.get("path"),
+                max_results=max_results,
+                generate_summary=bool(item.get("generateSummary", True)),
+                snapshot=snapshot,
+            )
+        return search_catalog(domain, query, max_results=max_results, snapshot=snapshot)
+
+    def _execute_cached(item: dict, key: tuple) -> list[dict] | dict:
+        # 缓存值与单查询接口一致（目录模式为结果列表，文档模式为响应字典），两条路径共用缓存条目
+        if snapshot is None:
+            return _execute(item)
+        return search_result_cache.get_or_compute(
+            domain, snapshot.generation, key, lambda: _execute(item), use_cache=use_cache
+        )
+
+    futures: dict[tuple, Future] = {}
+    planned: list[tuple[dict, Future]] = []
+    pool = _get_batch_pool()
+    for item in queries:
+        mode = "docs" if item.get("mode") == "docs" else "catalog"
+        key = _result_cache_key(
+            mode,
+            _normalize_query(str(item.get("query") or "")),
+            item.get("path"),
+            int(item.get("maxResults", 50)),
+            bool(item.get("generateSummary", True)),
+        )
+        future = futures.get(key)
+        if future is None:
+            future = pool.submit(_execute_cached, item, key)
+            futures[key] = future
+        planned.append((item, future))
+
+    responses = []
+    for item, future in planned:
+        mode = "docs" if item.get("mode") == "docs" else "catalog"
+        result = future.result()
+        if mode == "catalog":
+            result = {"results": result, "total": len(result)}
+        # 重复查询共享结果对象，回显各自的原始查询词
+        response = {"mode": mode, **result, "query": item.get("query")}
+        if item.get("id") is not None:
+            response["id"] = item["id"]
+        responses.append(response)
+
+    return {
+        "domain": domain,
+        "generation": snapshot.generation if snapshot is not None else None,
+        "results": responses,
+        "stats": {
+            "queries": len(queries),
+            "executed": len(futures),
+            "docLoads": snapshot.doc_loads if snapshot is not None else 0,
+            "docLoadsShared": snapshot.doc_reuses if snapshot is not None else 0,
+            "elapsedMs": round((time.perf_counter() - started_at) * 1000, 3),
+        },
+    }
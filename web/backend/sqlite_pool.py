@@ -0,0 +1,62 @@
+"""SQLite 连接池：每个线程复用一条长连接（WAL 日志、调优 pragma、语句缓存），供世界树存储共用"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from config import WORLD_TREE_SQLITE_CACHE_KB, WORLD_TREE_SQLITE_MMAP_MB
+
+# 每个连接缓存的预编译语句数（sqlite3 模块按 SQL 文本复用）
+_CACHED_STATEMENTS = 256
+# 写锁被其它进程占用时的等待秒数
+_BUSY_TIMEOUT = 30.0
+
+
+class SQLiteConnectionPool:
+    """按线程分配连接：同一线程反复取到同一条连接，线程结束时连接随线程局部存储释放。
+
+    连接以 WAL 模式打开，读不阻塞写、写不阻塞读；synchronous=NORMAL 在 WAL 下仍保证崩溃一致，
+    只是断电时可能丢失最后几个事务。连接不跨线程共享（sqlite3 默认的 check_same_thread 保持开启）。
+    """
+
+    def __init__(self, db_path: Path, setup: Optional[Callable[[sqlite3.Connection], None]] = None) -> None:
+        self._db_path = db_path
+        self._setup = setup
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """关闭当前线程的连接（下次取用时重新打开）。"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._db_path), timeout=_BUSY_TIMEOUT, cached_statements=_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if WORLD_TREE_SQLITE_CACHE_KB:
+            conn.execute(f"PRAGMA cache_size = -{int(WORLD_TREE_SQLITE_CACHE_KB)}")
+        conn.execute(f"PRAGMA mmap_size = {int(WORLD_TREE_SQLITE_MMAP_MB) * 1024 * 1024}")
+        if self._setup is not None:
+            self._setup(conn)
+        return conn
+
+
+def begin_snapshot(conn: sqlite3.Connection) -> None:
+    """开启读事务：同一 with 块内的多条查询看到同一快照（WAL 下不阻塞写入），退出 with 时结束。"""
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
@@ -0,0 +1,8 @@
+"""后端测试公共夹具：后端模块以顶层模块方式互相导入，测试时把 web/backend 加入导入路径。"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
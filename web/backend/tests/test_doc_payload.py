@@ -0,0 +1,61 @@
+"""/doc 响应缓存：同一文档与参数复用已编码的响应，文档变化或参数不同时重新生成。"""
+
+import json
+import os
+
+import pytest
+
+import config
+import doc_service
+
+DOMAIN = "gi"
+
+
+@pytest.fixture
+def doc_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DOCS_ROOT", tmp_path / "domains")
+    md_file = config.get_docs_dir(DOMAIN) / "角色" / "派蒙.md"
+    md_file.parent.mkdir(parents=True)
+    md_file.write_text("# 派蒙\n\n**派蒙**是旅行者的向导。\n" * 100, encoding="utf-8")
+    return md_file
+
+
+def test_payload_is_reused_until_the_doc_changes(doc_file):
+    etag, last_modified, payload = doc_service.get_doc_payload(DOMAIN, "角色/派蒙")
+    again = doc_service.get_doc_payload(DOMAIN, "角色/派蒙")
+    assert again == (etag, last_modified, payload)
+    assert again[2] is payload
+    assert "gzip" in payload.variants
+    assert json.loads(payload.body) == doc_service.read_doc(DOMAIN, "角色/派蒙")
+
+    ranged = doc_service.get_doc_payload(DOMAIN, "角色/派蒙", line_ranges=["1-2"])
+    assert ranged[0] != etag
+    assert json.loads(ranged[2].body)["lineRange"] == "1-2"
+
+    doc_file.write_text("# 派蒙\n\n新的内容。\n", encoding="utf-8")
+    stat = doc_file.stat()
+    os.utime(doc_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed = doc_service.get_doc_payload(DOMAIN, "角色/派蒙")
+    assert changed[0] != etag
+    assert json.loads(changed[2].body)["content"] == doc_service.read_doc(DOMAIN, "角色/派蒙")["content"]
+
+
+def test_not_modified_skips_building_the_payload(doc_file):
+    etag, last_modified, _ = doc_service.get_doc_payload(DOMAIN, "角色/派蒙", preserve_markdown=True)
+    seen = []
+
+    def _not_modified(candidate, modified):
+        seen.append((candidate, modified))
+        return candidate == etag
+
+    assert doc_service.get_doc_payload(DOMAIN, "角色/派蒙", preserve_markdown=True, not_modified=_not_modified) == (
+        etag,
+        last_modified,
+        None,
+    )
+    assert seen == [(etag, last_modified)]
+
+
+def test_missing_doc_raises_file_not_found(doc_file):
+    with pytest.raises(FileNotFoundError):
+        doc_service.get_doc_payload(DOMAIN, "角色/不存在")
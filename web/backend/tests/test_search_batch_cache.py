@@ -0,0 +1,84 @@
+"""批量搜索与单查询接口共用结果缓存：同一缓存键下两条路径写入的值形状一致，调用顺序不影响结果。"""
+
+import json
+
+import pytest
+
+import config
+import indexer
+import search_service
+from search_cache import search_result_cache
+
+DOMAIN = "gi"
+QUERY = "派蒙"
+
+_DOCS = [
+    ("角色/派蒙", "派蒙", "角色", "派蒙是旅行者的向导。"),
+    ("角色/派蒙的日记", "派蒙的日记", "角色", "记录派蒙一路上的见闻。"),
+    ("任务/与派蒙同行", "与派蒙同行", "任务", "和派蒙一起出发。"),
+    ("书籍/蒙德游记", "蒙德游记", "书籍", "派蒙在蒙德城吃了很多甜甜花酿鸡。"),
+    ("地区/璃月", "璃月", "地区", "璃月港是提瓦特最繁华的港口。"),
+]
+
+
+@pytest.fixture
+def search_domain(tmp_path, monkeypatch):
+    """在临时目录建一个小型域并构建索引，测试结束后清空进程内的索引与结果缓存。"""
+    monkeypatch.setattr(config, "DOCS_ROOT", tmp_path / "domains")
+    monkeypatch.setattr(config, "INDEX_ROOT", tmp_path / "tantivy_index")
+    docs_dir = config.get_docs_dir(DOMAIN)
+    items = []
+    for doc_id, (relative, name, category, body) in enumerate(_DOCS, start=1):
+        md_file = docs_dir / f"{relative}.md"
+        md_file.parent.mkdir(parents=True, exist_ok=True)
+        md_file.write_text(f"# {name}\n\n{body}\n", encoding="utf-8")
+        items.append({
+            "id": doc_id,
+            "name": name,
+            "type": category,
+            "category": category,
+            "path": f"/v2/{DOMAIN}/category/{relative}",
+        })
+    metadata_dir = config.get_metadata_dir(DOMAIN)
+    metadata_dir.mkdir(parents=True, exist_ok=True)
+    (metadata_dir / "index.json").write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+    assert indexer.build_index_for_domain(DOMAIN, full=True, workers=1)
+    search_service.invalidate_index(DOMAIN)
+    yield
+    search_service.invalidate_index(DOMAIN)
+
+
+def _cached_catalog_value():
+    key = search_service._result_cache_key("catalog", search_service._normalize_query(QUERY), None, 20, False)
+    generation = search_service.get_index_generation(DOMAIN)
+    hit, value = search_result_cache.get(DOMAIN, generation, key)
+    assert hit
+    return value
+
+
+def _batch_catalog():
+    response = search_service.search_batch(DOMAIN, [{"mode": "catalog", "query": QUERY, "maxResults": 20}])
+    return response["results"][0]
+
+
+@pytest.mark.skipif(not search_result_cache.enabled, reason="结果缓存未启用")
+@pytest.mark.parametrize("batch_first", [False, True], ids=["single-then-batch", "batch-then-single"])
+def test_batch_and_single_catalog_share_cache_entries(search_domain, batch_first):
+    expected = search_service.search_catalog(DOMAIN, QUERY, max_results=20)
+    assert expected
+
+    if batch_first:
+        batch = _batch_catalog()
+        single = search_service.cached_search_catalog(DOMAIN, QUERY, max_results=20)
+    else:
+        single = search_service.cached_search_catalog(DOMAIN, QUERY, max_results=20)
+        batch = _batch_catalog()
+
+    # 缓存里存的是目录搜索的结果列表，无论由哪条路径写入
+    assert _cached_catalog_value() == expected
+    assert single == expected
+    assert batch["mode"] == "catalog"
+    assert batch["query"] == QUERY
+    assert batch["results"] == expected
+    assert batch["total"] == len(expected)
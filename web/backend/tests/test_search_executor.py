@@ -0,0 +1,47 @@
+"""搜索执行层：shutdown 取消的排队任务也要回收按域计数，复用的执行层统计与准入保持正确。"""
+
+import asyncio
+import threading
+
+import pytest
+
+from search_executor import SearchExecutor, SearchOverloadedError
+
+
+def test_shutdown_releases_counters_of_cancelled_tasks():
+    executor = SearchExecutor(max_workers=1, queue_limit=2, timeout=5)
+    release = threading.Event()
+    started = threading.Event()
+
+    def _blocking() -> str:
+        started.set()
+        release.wait(5)
+        return "done"
+
+    async def _scenario() -> None:
+        running = asyncio.ensure_future(executor.run("gi", _blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        queued = asyncio.ensure_future(executor.run("gi", lambda: "never"))
+        await asyncio.sleep(0)
+        assert executor.stats()["domains"]["gi"] == {"pending": 2, "queued": 1, "running": 1}
+        with pytest.raises(SearchOverloadedError):
+            await executor.run("gi", lambda: None)
+
+        executor.shutdown()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        assert await running == "done"
+
+        stats = executor.stats()
+        assert stats["domains"]["gi"] == {"pending": 0, "queued": 0, "running": 0}
+        assert stats["queueDepth"] == 0
+        assert stats["cancelled"] == 1
+        assert stats["completed"] == 1
+
+        # 关闭后复用：新建线程池，准入按回收后的计数判断
+        assert await executor.run("gi", lambda: 1) == 1
+        assert await executor.run("gi", lambda: 2) == 2
+        executor.shutdown()
+
+    asyncio.run(_scenario())
@@ -0,0 +1,108 @@
+"""文本规范化：Markdown 剥离、全角转半角与小写，供索引、文档读取与目录/缓存脚本共用
+
+各函数的输出与原先分散在 indexer、doc_service、目录脚本和数据解析器中的正则级联逐字符一致：
+正则全部预编译，文本中不含某步骤的触发字符时直接跳过该步骤（大多数中文正文只含少量标记），
+字符级替换改用 str.translate 一次完成。对照实现、一致性校验与基准见 bench_text_normalize.py。
+"""
+
+import re
+
+# 全角 ASCII（U+FF01..U+FF5E）转半角，全角空格转普通空格
+_WIDTH_FOLD_TABLE = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+_WIDTH_FOLD_TABLE[0x3000] = 0x20
+_PIPE_TABLE = {ord("|"): " "}
+_FULL_WIDTH_RE = re.compile(r"[\uff01-\uff5e\u3000]")
+
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_HEADING_RE = re.compile(r"#+\s?")
+_BOLD_RE = re.compile(r"(\*\*|__)(.*?)(\*\*|__)")
+_ITALIC_RE = re.compile(r"(\*|_)(.*?)(\*|_)")
+_LINK_RE = re.compile(r"\[(.*?)\]\(.*?\)")
+_IMAGE_RE = re.compile(r"!\[.*?\]\(.*?\)")
+_CODE_BLOCK_RE = re.compile(r"```[\s\S]*?```")
+_INLINE_CODE_RE = re.compile(r"`([^`]+)`")
+_LIST_MARKER_RE = re.compile(r"^[-*+]\s+", re.MULTILINE)
+_ORDERED_MARKER_RE = re.compile(r"^\d+\.\s+", re.MULTILINE)
+_QUOTE_MARKER_RE = re.compile(r"^>\s+", re.MULTILINE)
+_RULE_RE = re.compile(r"---+")
+# 搜索文本只保留中日韩文字、英文与数字（空白一并去除）
+_NON_SEARCH_CHAR_RE = re.compile(r"[^\u4e00-\u9fa5\u3040-\u30ff\uac00-\ud7a3a-zA-Z0-9]+")
+
+
+def _has_line_start(text: str, chars: str) -> bool:
+    """是否有某行以 chars 中的字符开头（MULTILINE 的 ^ 只在文本开头与换行符之后匹配）。"""
+    return text[:1] in chars or any(f"\n{ch}" in text for ch in chars)
+
+
+def _strip_inline_markup(text: str, images: bool = True) -> str:
+    """HTML 标签、标题符号、粗体/斜体、链接与图片：各剥离函数共同的前几步（images=False 时不删图片）。"""
+    if "<" in text:
+        text = _HTML_TAG_RE.sub("", text)
+    if "#" in text:
+        text = _HEADING_RE.sub("", text)
+    if "**" in text or "__" in text:
+        text = _BOLD_RE.sub(r"\2", text)
+    if "*" in text or "_" in text:
+        text = _ITALIC_RE.sub(r"\2", text)
+    if "](" in text:
+        text = _LINK_RE.sub(r"\1", text)
+        if images and "![" in text:
+            # 链接替换后才可能拼出新的图片语法（如 [![图](src)](link)），必须在其后执行
+            text = _IMAGE_RE.sub("", text)
+    return text
+
+
+def strip_markdown(text: str) -> str:
+    """简单的 Markdown 剥离（文档阅读用，保留代码块与列表标记）"""
+    text = _strip_inline_markup(text)
+    if "`" in text:
+        text = _INLINE_CODE_RE.sub(r"\1", text)
+    return text
+
+
+def clean_markdown(text: str) -> str:
+    """清洗 Markdown，移除标记保留纯文本（建索引用）"""
+    if not text:
+        return ""
+    text = _strip_inline_markup(text)
+    if "```" in text:
+        text = _CODE_BLOCK_RE.sub("", text)
+    if "`" in text:
+        text = _INLINE_CODE_RE.sub(r"\1", text)
+    if _has_line_start(text, "-*+"):
+        text = _LIST_MARKER_RE.sub("", text)
+    if "." in text:
+        text = _ORDERED_MARKER_RE.sub("", text)
+    if _has_line_start(text, ">"):
+        text = _QUOTE_MARKER_RE.sub("", text)
+    if "---" in text:
+        text = _RULE_RE.sub("", text)
+    if "|" in text:
+        text = text.translate(_PIPE_TABLE)
+    return text.strip()
+
+
+def clean_text_for_search(text: str) -> str:
+    """清洗文本，移除标点符号、特殊字符与空白，并转换为小写（目录搜索索引用）
+
+    粗体/斜体步骤不能省略：它们可能删掉夹在 ] 与 ( 之间的标记（如 [a]*(b)*），拼出新的链接语法。
+    """
+    if not text:
+        return ""
+    return _NON_SEARCH_CHAR_RE.sub("", _strip_inline_markup(text, images=False)).lower()
+
+
+def fold_width(text: str) -> str:
+    """全角 ASCII 转半角，全角空格转普通空格。"""
+    if not _FULL_WIDTH_RE.search(text):
+        return text
+    return text.translate(_WIDTH_FOLD_TABLE)
+
+
+def normalize_search_text(text: str) -> str:
+    """去首尾空白、全角转半角并转小写（索引文本与查询共用的规范化）。"""
+    normalized = str(text or "").strip()
+    if not normalized:
+        return ""
+    # translate 逐字符查表较慢，fold_width 仅在确有全角字符时执行
+    return fold_width(normalized).lower()
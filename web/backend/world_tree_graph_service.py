@@ -9,11 +9,19 @@ import sqlite3
 import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Optional, Set
+
+import recall_fts
+from config import WORLD_TREE_RECALL_BACKEND
+from recall_index import RecallIndex, recall_terms
+from sqlite_pool import SQLiteConnectionPool, begin_snapshot
 
 logger = logging.getLogger(__name__)
 
 WORLD_TREE_GRAPH_DB = Path(__file__).parent / "world_tree_graph.db"
+# 单条 IN 查询的参数上限（低于旧版 SQLite 的 999 限制）
+_IN_CHUNK_SIZE = 500
+_FTS_SPEC = recall_fts.FtsSpec("world_tree_graph_fts", "world_tree_graph", "world_tree_graph_tag_map", "graph_id", "world_tree_graph_tag")
 
 
 def _utc_now_iso() -> str:
@@ -62,29 +70,22 @@ def _atomicize_keywords(raw_keywords: object) -> List[str]:
     return result
 
 
-def _fallback_split(text: str) -> List[str]:
-    return [token for token in re.split(r"[^\w\u4e00-\u9fff]+", text.lower()) if token]
-
-
-def _cjk_bigrams(token: str) -> List[str]:
-    if len(token) <= 1:
-        return [token]
-    return [token[i:i + 2] for i in range(len(token) - 1)]
-
-
 class WorldTreeGraphService:
-    def __init__(self) -> None:
+    def __init__(self, db_path: Path = WORLD_TREE_GRAPH_DB, recall_backend: Optional[str] = None) -> None:
+        self._db_path = db_path
+        self._use_fts = recall_fts.resolve_backend(recall_backend or WORLD_TREE_RECALL_BACKEND) == recall_fts.BACKEND_FTS5
+        self._pool = SQLiteConnectionPool(db_path, recall_fts.register_functions)
+        # 串行化写入（数据库写与内存索引更新）；读操作不取该锁
         self._lock = threading.RLock()
-        self._inverted_index: Dict[str, Set[str]] = {}
-        self._index_dirty = False
+        # BM25 召回索引，同分按 updated_at 升序；_index_lock 只在读写索引本身时短暂持有
+        self._index = RecallIndex()
+        self._index_lock = threading.Lock()
         self._ensure_db()
-        self.rebuild_index()
+        if not self._use_fts:
+            self.rebuild_index()
 
     def _get_conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(WORLD_TREE_GRAPH_DB))
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        return self._pool.connection()
 
     def _ensure_db(self) -> None:
         with self._get_conn() as conn:
@@ -123,28 +124,14 @@ class WorldTreeGraphService:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_world_tree_graph_updated_at ON world_tree_graph(updated_at)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_world_tree_graph_tag_map_graph_id ON world_tree_graph_tag_map(graph_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_world_tree_graph_tag_map_tag_id ON world_tree_graph_tag_map(tag_id)")
+            if self._use_fts:
+                recall_fts.ensure(conn, _FTS_SPEC)
+            else:
+                recall_fts.drop(conn, _FTS_SPEC)
             conn.commit()
 
     def _tokenize(self, text: str) -> List[str]:
-        normalized = _safe_text(text)
-        if not normalized:
-            return []
-        base_tokens = _fallback_split(normalized)
-        if not base_tokens:
-            return []
-
-        out: List[str] = []
-        seen: Set[str] = set()
-        for token in base_tokens:
-            if token not in seen:
-                seen.add(token)
-                out.append(token)
-            if re.search(r"[\u4e00-\u9fff]", token):
-                for bg in _cjk_bigrams(token):
-                    if bg and bg not in seen:
-                        seen.add(bg)
-                        out.append(bg)
-        return out
+        return list(dict.fromkeys(recall_terms(text)))
 
     def _normalize_record(self, record: dict) -> dict:
         now = _utc_now_iso()
@@ -205,19 +192,88 @@ class WorldTreeGraphService:
             mapping.setdefault(graph_id, []).append(tag_name)
         return mapping
 
+    def _get_keywords_for(self, conn: sqlite3.Connection, graph_ids: List[str]) -> Dict[str, List[str]]:
+        """只取指定记录的标签（召回 top-k 用），顺序与 _get_keywords_map 一致。"""
+        mapping: Dict[str, List[str]] = {}
+        for start in range(0, len(graph_ids), _IN_CHUNK_SIZE):
+            chunk = graph_ids[start:start + _IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"""
+                SELECT m.graph_id AS graph_id, t.name AS tag_name
+                FROM world_tree_graph_tag_map m
+                JOIN world_tree_graph_tag t ON t.id = m.tag_id
+                WHERE m.graph_id IN ({placeholders})
+                ORDER BY m.graph_id ASC, t.name ASC
+                """,
+                chunk,
+            ).fetchall()
+            for row in rows:
+                mapping.setdefault(str(row["graph_id"]), []).append(str(row["tag_name"]))
+        return mapping
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row, keywords: List[str]) -> dict:
+        metadata_raw = str(row["metadata_json"] or "{}")
+        try:
+            metadata = json.loads(metadata_raw)
+            if not isinstance(metadata, dict):
+                metadata = {}
+        except Exception:
+            metadata = {}
+
+        return {
+            "id": str(row["id"]),
+            "judgment": str(row["judgment"]),
+            "keywords": keywords,
+            "memoryType": "world_tree_graph",
+            "reasoning": str(row["reasoning"] or ""),
+            "createdAt": str(row["created_at"]),
+            "updatedAt": str(row["updated_at"]),
+            "metadata": metadata,
+        }
+
+    def _fetch_records(self, graph_ids: Iterable[str]) -> List[dict]:
+        """按给定顺序读取指定记录（参数化 IN 查询），不存在的 id 直接跳过。"""
+        ids = list(graph_ids)
+        if not ids:
+            return []
+        rows_by_id: Dict[str, sqlite3.Row] = {}
+        with self._get_conn() as conn:
+            begin_snapshot(conn)
+            for start in range(0, len(ids), _IN_CHUNK_SIZE):
+                chunk = ids[start:start + _IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"""
+                    SELECT id, judgment, graph_type, reasoning, created_at, updated_at, metadata_json
+                    FROM world_tree_graph
+                    WHERE id IN ({placeholders})
+                    """,
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    rows_by_id[str(row["id"])] = row
+            keywords_map = self._get_keywords_for(conn, list(rows_by_id))
+        return [
+            self._row_to_record(rows_by_id[graph_id], keywords_map.get(graph_id, []))
+            for graph_id in ids
+            if graph_id in rows_by_id
+        ]
+
+    @staticmethod
+    def _record_index_text(record: dict) -> str:
+        return f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
+
     def _update_index_for_record(self, record: dict) -> None:
+        """增量更新索引：添加/更新单条记录到倒排索引"""
         record_id = str(record.get("id", ""))
-        if not record_id:
+        if not record_id or self._use_fts:
+            # FTS5 后端由触发器在同一事务内维护全文表
             return
-        for token, id_set in list(self._inverted_index.items()):
-            id_set.discard(record_id)
-            if not id_set:
-                del self._inverted_index[token]
-
-        raw_text = f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
-        tokens = self._tokenize(raw_text)
-        for token in tokens:
-            self._inverted_index.setdefault(token, set()).add(record_id)
+        terms = recall_terms(self._record_index_text(record))
+        with self._index_lock:
+            self._index.upsert(record_id, terms, str(record.get("updatedAt", "")))
 
     def upsert(self, record: dict) -> dict:
         normalized = self._normalize_record(record)
@@ -252,10 +308,9 @@ class WorldTreeGraphService:
                 self._upsert_tags(conn, normalized["id"], normalized["keywords"])
                 conn.commit()
 
-            self._update_index_for_record(normalized)
-            self._index_dirty = True
             normalized["createdAt"] = created_at
             normalized["updatedAt"] = updated_at
+            self._update_index_for_record(normalized)
             return normalized
 
     def remove(self, record_id: str) -> bool:
@@ -270,64 +325,50 @@ class WorldTreeGraphService:
                 conn.execute("DELETE FROM world_tree_graph_tag_map WHERE graph_id = ?", (key,))
                 conn.execute("DELETE FROM world_tree_graph WHERE id = ?", (key,))
                 conn.commit()
-            for token, id_set in list(self._inverted_index.items()):
-                id_set.discard(key)
-                if not id_set:
-                    del self._inverted_index[token]
-            self._index_dirty = True
+            with self._index_lock:
+                self._index.remove(key)
             return True
 
     def list_records(self) -> List[dict]:
-        with self._lock:
-            with self._get_conn() as conn:
-                rows = conn.execute(
-                    """
-                    SELECT id, judgment, graph_type, reasoning, created_at, updated_at, metadata_json
-                    FROM world_tree_graph
-                    ORDER BY updated_at DESC
-                    """
-                ).fetchall()
-                keywords_map = self._get_keywords_map(conn)
-
-        out: List[dict] = []
-        for row in rows:
-            metadata_raw = str(row["metadata_json"] or "{}")
-            try:
-                metadata = json.loads(metadata_raw)
-                if not isinstance(metadata, dict):
-                    metadata = {}
-            except Exception:
-                metadata = {}
+        with self._get_conn() as conn:
+            begin_snapshot(conn)
+            rows = conn.execute(
+                """
+                SELECT id, judgment, graph_type, reasoning, created_at, updated_at, metadata_json
+                FROM world_tree_graph
+                ORDER BY updated_at DESC
+                """
+            ).fetchall()
+            keywords_map = self._get_keywords_map(conn)
 
-            graph_id = str(row["id"])
-            out.append(
-                {
-                    "id": graph_id,
-                    "judgment": str(row["judgment"]),
-                    "keywords": keywords_map.get(graph_id, []),
-                    "memoryType": "world_tree_graph",
-                    "reasoning": str(row["reasoning"] or ""),
-                    "createdAt": str(row["created_at"]),
-                    "updatedAt": str(row["updated_at"]),
-                    "metadata": metadata,
-                }
-            )
-        return out
+        return [
+            self._row_to_record(row, keywords_map.get(str(row["id"]), []))
+            for row in rows
+        ]
 
     def rebuild_index(self) -> None:
+        if self._use_fts:
+            with self._lock:
+                with self._get_conn() as conn:
+                    count = recall_fts.rebuild(conn, _FTS_SPEC)
+                    conn.commit()
+            logger.info("[WORLD_TREE_GRAPH] 全文表重建完成: %s 条记录", count)
+            return
         with self._lock:
             records = self.list_records()
-            next_index: Dict[str, Set[str]] = {}
+            next_index = RecallIndex()
             for record in records:
-                raw_text = f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
-                tokens = self._tokenize(raw_text)
-                for token in tokens:
-                    next_index.setdefault(token, set()).add(str(record["id"]))
-            self._inverted_index = next_index
+                next_index.upsert(
+                    str(record["id"]),
+                    recall_terms(self._record_index_text(record)),
+                    str(record.get("updatedAt", "")),
+                )
+            with self._index_lock:
+                self._index = next_index
             logger.info(
                 "[WORLD_TREE_GRAPH] 索引重建完成: %s 条记录, %s 个 token",
                 len(records),
-                len(self._inverted_index),
+                next_index.vocabulary_size(),
             )
 
     def recall(self, query: str, top_k: int = 5) -> List[dict]:
@@ -338,27 +379,13 @@ class WorldTreeGraphService:
         if not q_tokens:
             return []
 
-        with self._lock:
-            records = self.list_records()
-            by_id = {str(record["id"]): record for record in records}
-            scores: Dict[str, float] = {}
-            total_docs = max(1, len(by_id))
-
-            for token in q_tokens:
-                hits = self._inverted_index.get(token, set())
-                if not hits:
-                    continue
-                df = len(hits)
-                idf = max(0.1, (total_docs / (1 + df)))
-                for rid in hits:
-                    scores[rid] = scores.get(rid, 0.0) + idf
-
-            ranked = sorted(
-                scores.keys(),
-                key=lambda rid: (-scores[rid], str(by_id.get(rid, {}).get("updatedAt", ""))),
-            )[: max(1, int(top_k))]
-
-            return [by_id[rid] for rid in ranked if rid in by_id]
+        if self._use_fts:
+            with self._get_conn() as conn:
+                ranked = recall_fts.search(conn, _FTS_SPEC, q_tokens, max(1, int(top_k)))
+        else:
+            with self._index_lock:
+                ranked = self._index.search(q_tokens, max(1, int(top_k)))
+        return self._fetch_records(ranked)
 
     def stats(self) -> dict:
         records = self.list_records()
@@ -386,14 +413,15 @@ class WorldTreeGraphService:
                 chunk_ids.add(chunk_id)
 
         return {
-            "db_path": str(WORLD_TREE_GRAPH_DB),
+            "db_path": str(self._db_path),
             "record_count": len(records),
             "entity_total": entity_total,
             "relation_total": relation_total,
             "event_total": event_total,
             "file_count": len(file_paths),
             "chunk_count": len(chunk_ids),
-            "token_count": len(self._inverted_index),
+            "token_count": self._index.vocabulary_size(),
+            "recall_backend": recall_fts.BACKEND_FTS5 if self._use_fts else recall_fts.BACKEND_MEMORY,
         }
 
     def recent(self, limit: int = 20) -> list[dict]:
@@ -9,12 +9,20 @@ import sqlite3
 import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Optional, Set
+
+import recall_fts
+from config import WORLD_TREE_RECALL_BACKEND
+from recall_index import RecallIndex, recall_terms
+from sqlite_pool import SQLiteConnectionPool, begin_snapshot
 
 logger = logging.getLogger(__name__)
 
 WORLD_TREE_DB = Path(__file__).parent / "world_tree.db"
 WORLD_TREE_LEGACY_JSON = Path(__file__).parent / "world_tree_records.json"
+# 单条 IN 查询的参数上限（低于旧版 SQLite 的 999 限制）
+_IN_CHUNK_SIZE = 500
+_FTS_SPEC = recall_fts.FtsSpec("world_tree_memory_fts", "world_tree_memory", "world_tree_memory_tag", "memory_id", "world_tree_tag")
 
 
 def _utc_now_iso() -> str:
@@ -63,31 +71,29 @@ def _atomicize_keywords(raw_keywords: object) -> List[str]:
     return result
 
 
-def _fallback_split(text: str) -> List[str]:
-    return [token for token in re.split(r"[^\w\u4e00-\u9fff]+", text.lower()) if token]
-
-
-def _cjk_bigrams(token: str) -> List[str]:
-    """为中文 token 生成连续双字切片，增强无分词器场景下召回。"""
-    if len(token) <= 1:
-        return [token]
-    return [token[i:i + 2] for i in range(len(token) - 1)]
-
-
 class WorldTreeMemoryService:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        db_path: Path = WORLD_TREE_DB,
+        legacy_json: Optional[Path] = WORLD_TREE_LEGACY_JSON,
+        recall_backend: Optional[str] = None,
+    ) -> None:
+        self._db_path = db_path
+        self._legacy_json = legacy_json
+        self._use_fts = recall_fts.resolve_backend(recall_backend or WORLD_TREE_RECALL_BACKEND) == recall_fts.BACKEND_FTS5
+        self._pool = SQLiteConnectionPool(db_path, recall_fts.register_functions)
+        # 串行化写入（数据库写与内存索引更新）；读操作不取该锁
         self._lock = threading.RLock()
-        self._inverted_index: Dict[str, Set[str]] = {}
-        self._index_dirty = False
+        # BM25 召回索引，同分按 updated_at 升序；_index_lock 只在读写索引本身时短暂持有
+        self._index = RecallIndex()
+        self._index_lock = threading.Lock()
         self._ensure_db()
         self._migrate_legacy_json_if_needed()
-        self.rebuild_index()
+        if not self._use_fts:
+            self.rebuild_index()
 
     def _get_conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(str(WORLD_TREE_DB))
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        return self._pool.connection()
 
     def _ensure_db(self) -> None:
         with self._get_conn() as conn:
@@ -126,10 +132,14 @@ class WorldTreeMemoryService:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_world_tree_memory_updated_at ON world_tree_memory(updated_at)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_world_tree_memory_tag_memory_id ON world_tree_memory_tag(memory_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_world_tree_memory_tag_tag_id ON world_tree_memory_tag(tag_id)")
+            if self._use_fts:
+                recall_fts.ensure(conn, _FTS_SPEC)
+            else:
+                recall_fts.drop(conn, _FTS_SPEC)
             conn.commit()
 
     def _migrate_legacy_json_if_needed(self) -> None:
-        if not WORLD_TREE_LEGACY_JSON.exists():
+        if self._legacy_json is None or not self._legacy_json.exists():
             return
 
         with self._get_conn() as conn:
@@ -139,7 +149,7 @@ class WorldTreeMemoryService:
                 return
 
         try:
-            payload = json.loads(WORLD_TREE_LEGACY_JSON.read_text(encoding="utf-8"))
+            payload = json.loads(self._legacy_json.read_text(encoding="utf-8"))
             rows = payload if isinstance(payload, list) else []
             for item in rows:
                 if not isinstance(item, dict):
@@ -154,47 +164,21 @@ class WorldTreeMemoryService:
             logger.warning("[WORLD_TREE] legacy JSON 迁移失败: %s", exc)
 
     def _tokenize(self, text: str) -> List[str]:
-        normalized = _safe_text(text)
-        if not normalized:
-            return []
-        base_tokens = _fallback_split(normalized)
-        if not base_tokens:
-            return []
+        return list(dict.fromkeys(recall_terms(text)))
 
-        out: List[str] = []
-        seen: Set[str] = set()
-        for token in base_tokens:
-            if token not in seen:
-                seen.add(token)
-                out.append(token)
-            if re.search(r"[\u4e00-\u9fff]", token):
-                for bg in _cjk_bigrams(token):
-                    if bg and bg not in seen:
-                        seen.add(bg)
-                        out.append(bg)
-        return out
+    @staticmethod
+    def _record_index_text(record: dict) -> str:
+        return f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
 
     def _update_index_for_record(self, record: dict) -> None:
         """增量更新索引：添加/更新单条记录到倒排索引"""
         record_id = str(record.get("id", ""))
-        if not record_id:
+        if not record_id or self._use_fts:
+            # FTS5 后端由触发器在同一事务内维护全文表
             return
-        # 先移除旧索引项（如果存在）
-        for token, id_set in list(self._inverted_index.items()):
-            id_set.discard(record_id)
-            if not id_set:
-                del self._inverted_index[token]
-        # 添加新索引项
-        raw_text = f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
-        tokens = self._tokenize(raw_text)
-        for token in tokens:
-            self._inverted_index.setdefault(token, set()).add(record_id)
-
-    def periodic_rebuild_index(self) -> None:
-        """定时重建索引（如果标记为脏）"""
-        if self._index_dirty:
-            self.rebuild_index()
-            self._index_dirty = False
+        terms = recall_terms(self._record_index_text(record))
+        with self._index_lock:
+            self._index.upsert(record_id, terms, str(record.get("updatedAt", "")))
 
     def _normalize_record(self, record: dict) -> dict:
         now = _utc_now_iso()
@@ -256,6 +240,75 @@ class WorldTreeMemoryService:
             mapping.setdefault(memory_id, []).append(tag_name)
         return mapping
 
+    def _get_keywords_for(self, conn: sqlite3.Connection, memory_ids: List[str]) -> Dict[str, List[str]]:
+        """只取指定记录的标签（召回 top-k 用），顺序与 _get_keywords_map 一致。"""
+        mapping: Dict[str, List[str]] = {}
+        for start in range(0, len(memory_ids), _IN_CHUNK_SIZE):
+            chunk = memory_ids[start:start + _IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"""
+                SELECT mt.memory_id AS memory_id, t.name AS tag_name
+                FROM world_tree_memory_tag mt
+                JOIN world_tree_tag t ON t.id = mt.tag_id
+                WHERE mt.memory_id IN ({placeholders})
+                ORDER BY mt.memory_id ASC, t.name ASC
+                """,
+                chunk,
+            ).fetchall()
+            for row in rows:
+                mapping.setdefault(str(row["memory_id"]), []).append(str(row["tag_name"]))
+        return mapping
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row, keywords: List[str]) -> dict:
+        metadata_raw = str(row["metadata_json"] or "{}")
+        try:
+            metadata = json.loads(metadata_raw)
+            if not isinstance(metadata, dict):
+                metadata = {}
+        except Exception:
+            metadata = {}
+
+        return {
+            "id": str(row["id"]),
+            "judgment": str(row["judgment"]),
+            "keywords": keywords,
+            "memoryType": "world_tree",
+            "reasoning": str(row["reasoning"] or ""),
+            "createdAt": str(row["created_at"]),
+            "updatedAt": str(row["updated_at"]),
+            "metadata": metadata,
+        }
+
+    def _fetch_records(self, memory_ids: Iterable[str]) -> List[dict]:
+        """按给定顺序读取指定记录（参数化 IN 查询），不存在的 id 直接跳过。"""
+        ids = list(memory_ids)
+        if not ids:
+            return []
+        rows_by_id: Dict[str, sqlite3.Row] = {}
+        with self._get_conn() as conn:
+            begin_snapshot(conn)
+            for start in range(0, len(ids), _IN_CHUNK_SIZE):
+                chunk = ids[start:start + _IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"""
+                    SELECT id, judgment, memory_type, reasoning, created_at, updated_at, metadata_json
+                    FROM world_tree_memory
+                    WHERE id IN ({placeholders})
+                    """,
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    rows_by_id[str(row["id"])] = row
+            keywords_map = self._get_keywords_for(conn, list(rows_by_id))
+        return [
+            self._row_to_record(rows_by_id[memory_id], keywords_map.get(memory_id, []))
+            for memory_id in ids
+            if memory_id in rows_by_id
+        ]
+
     def upsert(self, record: dict) -> dict:
         normalized = self._normalize_record(record)
         with self._lock:
@@ -289,12 +342,10 @@ class WorldTreeMemoryService:
                 self._upsert_tags(conn, normalized["id"], normalized["keywords"])
                 conn.commit()
 
-            # 增量更新索引，标记为脏状态等待定时重建
-            self._update_index_for_record(normalized)
-            self._index_dirty = True
-
             normalized["createdAt"] = created_at
             normalized["updatedAt"] = updated_at
+            # 增量更新索引
+            self._update_index_for_record(normalized)
             return normalized
 
     def remove(self, record_id: str) -> bool:
@@ -309,29 +360,24 @@ class WorldTreeMemoryService:
                 conn.execute("DELETE FROM world_tree_memory_tag WHERE memory_id = ?", (key,))
                 conn.execute("DELETE FROM world_tree_memory WHERE id = ?", (key,))
                 conn.commit()
-            # 增量更新索引：移除相关倒排索引项
-            for token, id_set in list(self._inverted_index.items()):
-                id_set.discard(key)
-                if not id_set:
-                    del self._inverted_index[token]
-            self._index_dirty = True
+            with self._index_lock:
+                self._index.remove(key)
             return True
 
     def list_tags(self) -> List[dict]:
-        with self._lock:
-            with self._get_conn() as conn:
-                rows = conn.execute(
-                    """
-                    SELECT
-                        t.id AS id,
-                        t.name AS name,
-                        COUNT(mt.memory_id) AS ref_count
-                    FROM world_tree_tag t
-                    LEFT JOIN world_tree_memory_tag mt ON mt.tag_id = t.id
-                    GROUP BY t.id, t.name
-                    ORDER BY ref_count DESC, t.name ASC
-                    """
-                ).fetchall()
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT
+                    t.id AS id,
+                    t.name AS name,
+                    COUNT(mt.memory_id) AS ref_count
+                FROM world_tree_tag t
+                LEFT JOIN world_tree_memory_tag mt ON mt.tag_id = t.id
+                GROUP BY t.id, t.name
+                ORDER BY ref_count DESC, t.name ASC
+                """
+            ).fetchall()
 
         return [
             {
@@ -343,56 +389,45 @@ class WorldTreeMemoryService:
         ]
 
     def list_records(self) -> List[dict]:
-        with self._lock:
-            with self._get_conn() as conn:
-                rows = conn.execute(
-                    """
-                    SELECT id, judgment, memory_type, reasoning, created_at, updated_at, metadata_json
-                    FROM world_tree_memory
-                    ORDER BY updated_at DESC
-                    """
-                ).fetchall()
-                keywords_map = self._get_keywords_map(conn)
+        with self._get_conn() as conn:
+            begin_snapshot(conn)
+            rows = conn.execute(
+                """
+                SELECT id, judgment, memory_type, reasoning, created_at, updated_at, metadata_json
+                FROM world_tree_memory
+                ORDER BY updated_at DESC
+                """
+            ).fetchall()
+            keywords_map = self._get_keywords_map(conn)
 
-            out: List[dict] = []
-            for row in rows:
-                metadata_raw = str(row["metadata_json"] or "{}")
-                try:
-                    metadata = json.loads(metadata_raw)
-                    if not isinstance(metadata, dict):
-                        metadata = {}
-                except Exception:
-                    metadata = {}
-
-                memory_id = str(row["id"])
-                out.append(
-                    {
-                        "id": memory_id,
-                        "judgment": str(row["judgment"]),
-                        "keywords": keywords_map.get(memory_id, []),
-                        "memoryType": "world_tree",
-                        "reasoning": str(row["reasoning"] or ""),
-                        "createdAt": str(row["created_at"]),
-                        "updatedAt": str(row["updated_at"]),
-                        "metadata": metadata,
-                    }
-                )
-            return out
+        return [
+            self._row_to_record(row, keywords_map.get(str(row["id"]), []))
+            for row in rows
+        ]
 
     def rebuild_index(self) -> None:
+        if self._use_fts:
+            with self._lock:
+                with self._get_conn() as conn:
+                    count = recall_fts.rebuild(conn, _FTS_SPEC)
+                    conn.commit()
+            logger.info("[WORLD_TREE] 全文表重建完成: %s 条记录", count)
+            return
         with self._lock:
             records = self.list_records()
-            next_index: Dict[str, Set[str]] = {}
+            next_index = RecallIndex()
             for record in records:
-                raw_text = f"{record.get('judgment', '').strip()} {' '.join(record.get('keywords', []))}".strip()
-                tokens = self._tokenize(raw_text)
-                for token in tokens:
-                    next_index.setdefault(token, set()).add(str(record["id"]))
-            self._inverted_index = next_index
+                next_index.upsert(
+                    str(record["id"]),
+                    recall_terms(self._record_index_text(record)),
+                    str(record.get("updatedAt", "")),
+                )
+            with self._index_lock:
+                self._index = next_index
             logger.info(
                 "[WORLD_TREE] 索引重建完成: %s 条记录, %s 个 token",
                 len(records),
-                len(self._inverted_index),
+                next_index.vocabulary_size(),
             )
 
     def recall(self, query: str, top_k: int = 5) -> List[dict]:
@@ -403,27 +438,15 @@ class WorldTreeMemoryService:
         if not q_tokens:
             return []
 
-        with self._lock:
-            records = self.list_records()
-            by_id = {str(record["id"]): record for record in records}
-            scores: Dict[str, float] = {}
-            total_docs = max(1, len(by_id))
-
-            for token in q_tokens:
-                hits = self._inverted_index.get(token, set())
-                if not hits:
-                    continue
-                df = len(hits)
-                idf = max(0.1, (total_docs / (1 + df)))
-                for rid in hits:
-                    scores[rid] = scores.get(rid, 0.0) + idf
-
-            ranked = sorted(
-                scores.keys(),
-                key=lambda rid: (-scores[rid], str(by_id.get(rid, {}).get("updatedAt", ""))),
-            )[: max(1, int(top_k))]
-
-            return [by_id[rid] for rid in ranked if rid in by_id]
+        # 在内存索引上按 BM25 取前 top_k 个 id，再用 IN 查询读取这几条记录，
+        # 召回开销取决于命中数与 top_k，而不是记忆总数
+        if self._use_fts:
+            with self._get_conn() as conn:
+                ranked = recall_fts.search(conn, _FTS_SPEC, q_tokens, max(1, int(top_k)))
+        else:
+            with self._index_lock:
+                ranked = self._index.search(q_tokens, max(1, int(top_k)))
+        return self._fetch_records(ranked)
 
 
 world_tree_memory_service = WorldTreeMemoryService()